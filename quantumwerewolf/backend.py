@@ -1,14 +1,40 @@
 """The Module's docstring"""
 
-from itertools import permutations
-from random import shuffle, choice
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import wraps
-from typing import Callable, List, Tuple, Union
-from math import factorial
+from time import perf_counter
+import inspect
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+import json
 import logging
+import random
+import struct
+
+from quantumwerewolf.combinatorics import multinomial, multiset_permutations, multiset_unrank
+from quantumwerewolf.rng import make_rng
+from quantumwerewolf.sampler import FenwickSampler
 
 logger = logging.getLogger(__name__)
 
+# start of the binary format of Game.dump() and its version
+dump_magic = b'QWWG'
+dump_version = 1
+
+
+def _pack_bits(flags: List[bool]) -> bytes:
+    """Return flags packed into bits, the first flag in the highest bit of the first byte as in numpy.packbits()."""
+    bits = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bits[i >> 3] |= 0x80 >> (i & 7)
+    return bytes(bits)
+
+
+def _unpack_bits(bits: memoryview, count: int) -> List[bool]:
+    """Return the first count flags packed by _pack_bits()."""
+    return [bool(bits[i >> 3] & (0x80 >> (i & 7))) for i in range(count)]
+
 
 class Player:
 
@@ -30,14 +56,33 @@ class Game:
             'cupid': 0,
             }
 
-    def __init__(self):
+    # whether the engine generates the game states when it starts, so its cost grows with Game._max_permutations()
+    enumerates = True
+
+    def __init__(self, rng: Union[int, random.Random, object] = None):
+        """Create a game without players.
+
+        Arguments:
+            rng: Union[int, random.Random, numpy.random.Generator] -- seed or generator of all random choices of
+                the game, see rng.make_rng(). Games with the same seed and actions play out the same. (default: None)
+        """
         self.players = []
         self.deck = Game.default_deck.copy()
         self.started = False
         self.logger = logging.getLogger(__name__)
+        self.rng = make_rng(rng)
         # optional rules
         self.werewolf_cannot_eat_werewolf = False
         self.start_with_subset = True
+        # cache of simulated win rates written by `quantumwerewolf sweep`, see Game.set_suggested_deck()
+        self.balance_table = None
+        # per method statistics, see Game.stats()
+        self.stats_enabled = False
+        self._stats = {}
+        self._stats_active = set()
+        # number of journal entries between snapshots, see Game.rewind()
+        self.snapshot_interval = 16
+        self._journaling = False
 
     @property
     def player_count(self):
@@ -54,13 +99,108 @@ class Game:
         def decorator(function: Callable) -> Callable:
             @wraps(function)
             def wrapper(self, *args: object, **kwargs: object) -> object:
-                if self.started == value:
-                    return function(self, *args, **kwargs)
-                else:
+                if self.started != value:
                     raise ValueError(f'Game.started equal {self.started} when it should be {value}')
+                if not self.stats_enabled or function.__name__ in self._stats_active:
+                    return function(self, *args, **kwargs)
+                return self._measure(function, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def cached(maxsize: int = None) -> Callable:
+        """Return decorator that return decorated function that reuses its results until Game.version changes.
+        Cached results are shared between callers and must not be modified.
+
+        Arguments:
+            maxsize: int -- maximum number of cached results of the function,
+                least recently used are evicted first (default: None)
+        """
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(self, *args: object, **kwargs: object) -> object:
+                if self._cache_version != self.version:
+                    self._cache = {}
+                    self._cache_version = self.version
+                cache = self._cache.setdefault(function.__qualname__, OrderedDict())
+                key = (args, tuple(sorted(kwargs.items())))
+                if key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+                result = function(self, *args, **kwargs)
+                cache[key] = result
+                if maxsize is not None and len(cache) > maxsize:
+                    cache.popitem(last=False)
+                return result
             return wrapper
         return decorator
 
+    def journaled(function: Callable) -> Callable:
+        """Return decorated action that appends its name and arguments to Game.journal, with the outcome it returns
+        as the target_role argument, and snapshots the game every Game.snapshot_interval entries.
+        Actions called by a recorded action are not recorded separately.
+        """
+        signature = inspect.signature(function)
+
+        @wraps(function)
+        def wrapper(self, *args: object, **kwargs: object) -> object:
+            if self._journaling:
+                return function(self, *args, **kwargs)
+            self._journaling = True
+            try:
+                result = function(self, *args, **kwargs)
+            finally:
+                self._journaling = False
+            arguments = signature.bind(self, *args, **kwargs).arguments
+            del arguments['self']
+            # a seer action that is not projected leaves the game unchanged
+            if arguments.get('project', True):
+                if 'target_role' in signature.parameters:
+                    arguments['target_role'] = result
+                self.journal.append((function.__name__, dict(arguments)))
+                if len(self.journal) % self.snapshot_interval == 0:
+                    self._snapshot()
+            return result
+        return wrapper
+
+    def _measure(self, function: Callable, *args: object, **kwargs: object) -> object:
+        """Call a method and record its duration and the game states it went through in Game.stats().
+        Calls of the same method nested inside it are not recorded separately.
+        """
+        name = function.__name__
+        self._stats_active.add(name)
+        states = self._state_count() if self.started else 0
+        start = perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            duration = perf_counter() - start
+            self._stats_active.discard(name)
+            if self.started:
+                states = max(states, self._state_count())
+            stats = self._stats.setdefault(name, {'calls': 0, 'total_time': 0.0, 'max_time': 0.0, 'permutations': 0})
+            stats['calls'] += 1
+            stats['total_time'] += duration
+            stats['max_time'] = max(stats['max_time'], duration)
+            stats['permutations'] += states
+
+    def stats(self) -> Dict[str, dict]:
+        """Return per method the number of calls, the total and maximum time in seconds
+        and the total number of valid game states at the time of the calls.
+        Only calls made while Game.stats_enabled is True are recorded.
+        """
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+    @contextmanager
+    def stats_turn(self) -> Iterator[None]:
+        """Return context manager that records Game.stats() from scratch while inside it, e.g. for a single turn."""
+        enabled = self.stats_enabled
+        self._stats = {}
+        self.stats_enabled = True
+        try:
+            yield
+        finally:
+            self.stats_enabled = enabled
+
     def _id(self, player_name: str) -> int:
         """Return index of a player name.
 
@@ -81,15 +221,15 @@ class Game:
 
     @started(False)
     def add_player(self, name: str) -> None:
-        self.logger.debug(f"running add_players({name})")
+        self.logger.debug("running add_players(%s)", name)
         # Add names from input and input lists
         assert isinstance(name, str)
         if name in self.players:
-            self.logger.debug(f"Player {name} already in self.players. Returning 'False'.")
+            self.logger.debug("Player %s already in self.players. Returning 'False'.", name)
             return False
         else:
             self.players.append(name)
-            self.logger.debug(f"Added player {name} to self.players. Returning 'True'.")
+            self.logger.debug("Added player %s to self.players. Returning 'True'.", name)
             return True
 
     @started(False)
@@ -99,17 +239,17 @@ class Game:
         Arguments:
             names: str | List[str] -- names of players or lists of names of players.
         """
-        self.logger.debug(f"running add_players({names})")
+        self.logger.debug("running add_players(%s)", names)
         # Add names from input and input lists
         for name in names:
             if isinstance(name, str):
                 # Check if name is not already taken
                 if name in self.players:
                     # TODO: check if logging is applicatble
-                    self.logger.warning("Player {} already exists!".format(name))
+                    self.logger.warning("Player %s already exists!", name)
                 else:
                     self.players.append(name)
-                    self.logger.info(f"Adding player {name}")
+                    self.logger.info("Adding player %s", name)
             elif isinstance(name, list):
                 # unwrap list and pass to add_players again
                 self.add_players(*name)
@@ -120,7 +260,7 @@ class Game:
 
     @started(False)
     def set_deck(self, deck: dict) -> bool:
-        self.logger.debug(f"running set_deck({deck})")
+        self.logger.debug("running set_deck(%s)", deck)
         if self._valid_deck(deck):
             self.deck = deck
             self.logger.debug("Deck set. Returning True")
@@ -130,18 +270,19 @@ class Game:
 
     @started(False)
     def _valid_deck(self, deck: dict) -> bool:
-        self.logger.debug(f"running _valid_deck({deck})")
+        self.logger.debug("running _valid_deck(%s)", deck)
         thief_extra_cards = 2 if 'thief' in deck else 0
         deck_size = self.player_count + thief_extra_cards
         if 'villager' in deck:
             role_count = sum([count for role, count in deck.items()])
             if role_count != deck_size:
-                self.logger.debug(f"{role_count=} does not equal {deck_size=}. Returning False.")
+                self.logger.debug("role_count=%r does not equal deck_size=%r. Returning False.", role_count, deck_size)
                 return False
         else:
             nonvillager_count = sum([count for role, count in deck.items() if role != 'villager'])
             if nonvillager_count > deck_size:
-                self.logger.debug(f"{nonvillager_count=} is larger than {deck_size=}. Returning False.")
+                self.logger.debug("nonvillager_count=%r is larger than deck_size=%r. Returning False.",
+                                  nonvillager_count, deck_size)
                 return False
             deck['villager'] = deck_size - nonvillager_count
         self.logger.debug("Deck is valid. Returning True.")
@@ -149,11 +290,20 @@ class Game:
 
     @started(False)
     def set_suggested_deck(self) -> None:
+        """Set a deck with one seer and the number of werewolves for which the villagers win about half of the
+        simulated games in Game.balance_table, or one werewolf per five players without a table.
+        """
         self.logger.debug("running set_suggested_deck()")
         if self.player_count < 8:
             self.logger.warning("It is recommended to play with at least 8 players.")
-        werewolf_count = max(round(self.player_count / 5), 1)
-        self.logger.debug(f"Suggested werewolf count is {werewolf_count}")
+        werewolf_count = None
+        if self.balance_table is not None:
+            from quantumwerewolf.balance import balanced_werewolf_count
+            werewolf_count = balanced_werewolf_count(self.player_count, self.werewolf_cannot_eat_werewolf,
+                                                     self.start_with_subset, self.balance_table)
+        if werewolf_count is None:
+            werewolf_count = max(round(self.player_count / 5), 1)
+        self.logger.debug("Suggested werewolf count is %s", werewolf_count)
 
         suggested_deck = self.default_deck.copy()
         suggested_deck['werewolf'] = werewolf_count
@@ -166,28 +316,94 @@ class Game:
     def generate_all_permutations(self):
         self.logger.info('Generating all role permutations')
         roles = [role for role, count in self.deck.items() for _ in range(count)]
-        self.logger.debug(f'role frequencies: {roles}')
-        self.permutations = {p: True for p in permutations(roles)}
+        self.logger.debug('role frequencies: %s', roles)
+        self.permutations = {p: True for p in multiset_permutations(roles)}
+        self._count_roles()
 
-    def _max_permutations(self):
-        number = factorial(self.player_count)
-        for n in self.deck.values():
-            number /= factorial(n)
-        return number
+    def _max_permutations(self) -> int:
+        return multinomial(self.deck.values())
 
-    def _subset_size(self):
+    def _subset_size(self) -> int:
         max_subset_size = self._max_permutations()
         return min(self.player_count + 2, max_subset_size)
 
     def generate_subset_permutations(self):
         self.logger.info('Generating subset of role permutations')
         roles = [role for role, count in self.deck.items() for _ in range(count)]
-        self.logger.debug(f'role frequencies: {roles}')
-        n_permutations = self._subset_size()
-        self.permutations = {}
-        while len(self.permutations) < n_permutations:
-            shuffle(roles)
-            self.permutations[tuple(roles)] = True
+        self.logger.debug('role frequencies: %s', roles)
+        # draw distinct permutation indices and decode them directly
+        ranks = self.rng.sample(range(self._max_permutations()), self._subset_size())
+        self.permutations = {multiset_unrank(rank, roles): True for rank in ranks}
+        self._count_roles()
+
+    def _count_roles(self) -> None:
+        """Count the valid permutations in total (Game.valid_count) and per player per role (Game.role_counts)."""
+        self.valid_count = 0
+        self.role_counts = [dict.fromkeys(self.deck, 0) for _ in range(self.player_count)]
+        for p, valid in self.permutations.items():
+            if valid:
+                self.valid_count += 1
+                for counts, role in zip(self.role_counts, p):
+                    counts[role] += 1
+        self._index_rows()
+
+    def _index_rows(self) -> None:
+        """Index the stored permutations by position and weight for Game._sample_permutation()."""
+        self.rows = list(self.permutations)
+        self.row_index = {p: i for i, p in enumerate(self.rows)}
+        self.sampler = FenwickSampler(self.permutations.values(), self.rng)
+
+    def _invalidate(self, permutation: Tuple[str, ...]) -> None:
+        """Mark a permutation as no longer possible and remove it from the role counts.
+
+        Arguments:
+            permutation: Tuple[str, ...] -- permutation in Game.permutations.
+        """
+        if self.permutations[permutation]:
+            self.permutations[permutation] = False
+            self.sampler.update(self.row_index[permutation], 0)
+            self.valid_count -= 1
+            for counts, role in zip(self.role_counts, permutation):
+                counts[role] -= 1
+
+    def _compact(self) -> None:
+        """Remove the permutations that are no longer possible from the store once they are the majority,
+        so later queries do not scan them.
+        """
+        if 2 * self.valid_count <= self._permutation_count():
+            self.logger.debug('compacting %s permutations to %s', self._permutation_count(), self.valid_count)
+            self.permutations = {p: True for p, valid in self.permutations.items() if valid}
+            self._index_rows()
+
+    def _store_snapshot(self) -> object:
+        """Return a copy of the stored game states for Game._restore_store().
+        The permutations are shared with the store, only their validity is copied, packed into bits.
+        """
+        return self.rows, _pack_bits([self.permutations[p] for p in self.rows])
+
+    def _restore_store(self, snapshot: object) -> None:
+        """Restore the stored game states from a result of Game._store_snapshot()."""
+        rows, valid_bits = snapshot
+        self.permutations = dict(zip(rows, _unpack_bits(valid_bits, len(rows))))
+        self._count_roles()
+
+    def _snapshot(self) -> None:
+        """Append a snapshot of the game state at the current end of Game.journal to Game.snapshots."""
+        self.snapshots.append((len(self.journal), {
+            'store': self._store_snapshot(),
+            'deaths': [row[:] for row in self.deaths],
+            'killed': self.killed[:],
+            'lovers_list': dict(self.lovers_list),
+            'werewolf_count': self.werewolf_count,
+        }))
+
+    def _permutation_count(self) -> int:
+        """Return the number of stored permutations, including invalidated ones."""
+        return len(self.permutations)
+
+    def _state_count(self) -> int:
+        """Return the number of game states a query goes through."""
+        return self.valid_count
 
     @started(False)
     def start(self) -> bool:
@@ -195,7 +411,7 @@ class Game:
         self.logger.debug("running start()")
 
         # Determine playercount
-        self.logger.info(f"number of players is {self.player_count}")
+        self.logger.info("number of players is %s", self.player_count)
         if self.player_count == 0:
             self.logger.error('No players in current game. Failed to start game.')
             return False
@@ -206,18 +422,18 @@ class Game:
 
         # Generate permutation list for anomymous printing in print_probabilities()
         self.print_permutation = list(range(self.player_count))
-        shuffle(self.print_permutation)
-        self.logger.info(f'Random player order in tables is {self.print_permutation}')
+        self.rng.shuffle(self.print_permutation)
+        self.logger.info('Random player order in tables is %s', self.print_permutation)
 
         # Determine (valid) amount of villager in the game
         assert self._valid_deck(self.deck)
 
         # Sets the list of roles
         self.used_roles = [role for role, count in self.deck.items() if count > 0]
-        self.logger.info(f'Roles used in game are {self.used_roles}')
+        self.logger.info('Roles used in game are %s', self.used_roles)
 
         self.werewolf_count = self.deck['werewolf']
-        self.logger.info(f'Number of live werewolves is {self.werewolf_count}')
+        self.logger.info('Number of live werewolves is %s', self.werewolf_count)
 
         # Generates the list of role permutations
         if self.start_with_subset:
@@ -225,7 +441,7 @@ class Game:
         else:
             self.generate_all_permutations()
 
-        self.logger.debug(f'number of permutations: {len(self.permutations)}')
+        self.logger.debug('number of permutations: %s', self._permutation_count())
 
         # Set all players to be fully alive
         self.logger.info('Initializing attacked and killed list')
@@ -243,6 +459,16 @@ class Game:
         self.started = True
         self.turn_counter = 0
 
+        # every action that changes the game state increases the version
+        self.version = 0
+        self._cache = {}
+        self._cache_version = 0
+
+        # recorded actions and snapshots of the game state to undo them, see Game.rewind()
+        self.journal = []
+        self.snapshots = []
+        self._snapshot()
+
         return True
 
     @started()
@@ -254,6 +480,159 @@ class Game:
         self.logger.info("Game stopped.")
         return True
 
+    @started()
+    def rewind(self, n: int = 1) -> List[tuple]:
+        """Undo the last actions and return their entries in Game.journal. The game state is restored from the
+        last snapshot before them, after which the recorded actions since that snapshot are performed again
+        with their recorded outcomes.
+
+        Arguments:
+            n: int -- number of actions to undo (default: 1)
+        """
+        self.logger.debug("running rewind(%s)", n)
+        assert 0 <= n <= len(self.journal), "ERROR: in rewind() only {} actions can be undone.".format(len(self.journal))
+        position = len(self.journal) - n
+        undone = self.journal[position:]
+        while self.snapshots[-1][0] > position:
+            self.snapshots.pop()
+        snapshot_position, snapshot = self.snapshots[-1]
+        replay = self.journal[snapshot_position:position]
+        del self.journal[snapshot_position:]
+
+        self._restore_store(snapshot['store'])
+        self.deaths = [row[:] for row in snapshot['deaths']]
+        self.killed = snapshot['killed'][:]
+        self.lovers_list = dict(snapshot['lovers_list'])
+        self.werewolf_count = snapshot['werewolf_count']
+        # cached results are never valid for an earlier game state
+        self.version += 1
+
+        self.logger.info("undoing %s actions, performing %s actions again", n, len(replay))
+        for action, arguments in replay:
+            getattr(self, action)(**arguments)
+        return undone
+
+    # SERIALIZATION
+
+    @started()
+    def dump(self) -> bytes:
+        """Return the game state in a compact, versioned binary format that Game.load() reads.
+
+        The format is the magic bytes, the format version and the length of a JSON header as little-endian
+        unsigned 32-bit integers, the header, and binary sections at offsets given in the header,
+        aligned to 8 bytes. The header holds the players, the deck, the rules and the small parts of
+        the game state. The sections hold the Game.deaths matrix as float64 and the stored game states,
+        which for the permutation engines are a matrix of role codes (indices in Game.used_roles) of one
+        byte per player and a bitset of the valid rows. The journal is not included.
+        """
+        self.logger.debug("running dump()")
+        n = self.player_count
+        header = {
+            'engine': type(self).__name__,
+            'players': self.players,
+            'deck': self.deck,
+            'used_roles': self.used_roles,
+            'werewolf_cannot_eat_werewolf': self.werewolf_cannot_eat_werewolf,
+            'start_with_subset': self.start_with_subset,
+            'werewolf_count': self.werewolf_count,
+            'killed': self.killed,
+            'lovers_list': [[cupid_id, list(lovers)] for cupid_id, lovers in self.lovers_list.items()],
+            'print_permutation': self.print_permutation,
+            'turn_counter': self.turn_counter,
+            'version': self.version,
+        }
+        sections = {'deaths': struct.pack(f'<{n * n}d', *(attack for row in self.deaths for attack in row))}
+        store_header, store_sections = self._dump_store()
+        header.update(store_header)
+        sections.update(store_sections)
+
+        header['sections'] = {}
+        offset = 0
+        for name, section in sections.items():
+            header['sections'][name] = [offset, len(section)]
+            offset += -(-len(section) // 8) * 8
+        header_bytes = json.dumps(header).encode()
+        start = -(-(12 + len(header_bytes)) // 8) * 8
+
+        data = bytearray(start + offset)
+        data[:12] = dump_magic + struct.pack('<II', dump_version, len(header_bytes))
+        data[12:12 + len(header_bytes)] = header_bytes
+        for name, section in sections.items():
+            section_start = start + header['sections'][name][0]
+            data[section_start:section_start + len(section)] = section
+        return bytes(data)
+
+    @classmethod
+    def load(cls, data: Union[bytes, memoryview], rng: Union[int, random.Random, object] = None) -> 'Game':
+        """Return a started game from the result of Game.dump() of a game of the same class.
+        The sections are read through a memoryview, so engines that keep them as arrays share the buffer
+        instead of copying it, for example a memory-mapped file.
+
+        Arguments:
+            data: Union[bytes, memoryview] -- buffer holding the result of Game.dump().
+            rng: Union[int, random.Random, numpy.random.Generator] -- seed or generator of the game (default: None)
+        """
+        view = memoryview(data)
+        assert bytes(view[:4]) == dump_magic, "ERROR: in load() data is not a dumped game."
+        version, header_length = struct.unpack_from('<II', view, 4)
+        assert version == dump_version, "ERROR: in load() unsupported format version {}.".format(version)
+        header = json.loads(bytes(view[12:12 + header_length]))
+        assert header['engine'] == cls.__name__, \
+            "ERROR: in load() a {} can not be loaded as {}.".format(header['engine'], cls.__name__)
+        start = -(-(12 + header_length) // 8) * 8
+        sections = {name: view[start + offset:start + offset + length]
+                    for name, (offset, length) in header['sections'].items()}
+
+        game = cls(rng=rng)
+        game.add_players(header['players'])
+        assert game.set_deck(header['deck'])
+        game.werewolf_cannot_eat_werewolf = header['werewolf_cannot_eat_werewolf']
+        game.start_with_subset = header['start_with_subset']
+        game.logger.debug("running load() of %s bytes", len(view))
+
+        n = game.player_count
+        game.player_ids = {player: player_id for player_id, player in enumerate(game.players)}
+        game.print_permutation = header['print_permutation']
+        game.used_roles = header['used_roles']
+        game.werewolf_count = header['werewolf_count']
+        deaths = struct.unpack_from(f'<{n * n}d', sections['deaths'])
+        game.deaths = [list(deaths[i * n:(i + 1) * n]) for i in range(n)]
+        game.killed = header['killed']
+        game.lovers_list = {cupid_id: tuple(lovers) for cupid_id, lovers in header['lovers_list']}
+        game._load_store(header, sections)
+
+        game.started = True
+        game.turn_counter = header['turn_counter']
+        game.version = header['version']
+        game._cache = {}
+        game._cache_version = game.version
+        game.journal = []
+        game.snapshots = []
+        game._snapshot()
+        return game
+
+    def _dump_store(self) -> Tuple[dict, Dict[str, bytes]]:
+        """Return the header entries and the sections of Game.dump() that hold the stored game states."""
+        codes = {role: code for code, role in enumerate(self.used_roles)}
+        header = {'rows': len(self.rows)}
+        sections = {
+            'codes': b''.join(bytes(codes[role] for role in p) for p in self.rows),
+            'valid': _pack_bits([self.permutations[p] for p in self.rows]),
+        }
+        return header, sections
+
+    def _load_rows(self, header: dict, sections: Dict[str, memoryview]) -> List[Tuple[str, ...]]:
+        """Return the stored permutations from the role codes of Game._dump_store()."""
+        n = self.player_count
+        codes = sections['codes']
+        return [tuple(self.used_roles[code] for code in codes[i * n:(i + 1) * n]) for i in range(header['rows'])]
+
+    def _load_store(self, header: dict, sections: Dict[str, memoryview]) -> None:
+        """Restore the stored game states from the header entries and sections of Game._dump_store()."""
+        rows = self._load_rows(header, sections)
+        self.permutations = dict(zip(rows, _unpack_bits(sections['valid'], len(rows))))
+        self._count_roles()
+
     def reset(self) -> None:
         """Set all values to default and stop the game if started."""
         self.logger.debug("running reset()")
@@ -269,130 +648,166 @@ class Game:
     @started()
     def valid_permutations(self) -> List[List[str]]:
         """Return all possible game states."""
+        return self._valid_rows()
+
+    def _valid_rows(self) -> List[Tuple[str, ...]]:
+        """Return the stored permutations that are still possible."""
         return [p for p in self.permutations if self.permutations[p]]
 
+    def _choose_permutation(self, p_list: List[Tuple[str, ...]]) -> Tuple[str, ...]:
+        """Return a random permutation from a list of stored permutations, in proportion to the game states they stand for.
+
+        Arguments:
+            p_list: List[Tuple[str, ...]] -- permutations in Game.permutations.
+        """
+        return self.rng.choice(p_list)
+
+    def _sample_permutation(self, condition: Callable = None, acceptance: float = 1) -> Tuple[str, ...]:
+        """Return a random valid permutation for which a condition holds, in proportion to the game states they stand for.
+        Draws from Game.sampler until the condition holds, unless it holds too rarely.
+
+        Arguments:
+            condition: Callable -- function of a permutation that holds for at least one valid permutation (default: None)
+            acceptance: float -- fraction of the game states for which the condition holds (default: 1)
+        """
+        if acceptance < 1 / 64:
+            return self._choose_permutation([p for p in self._valid_rows() if condition(p)])
+        while True:
+            p = self.rows[self.sampler.sample()]
+            if condition is None or condition(p):
+                return p
+
     def living_players(self) -> List[str]:
         """Return all players that are still alive."""
         return [player for player_id, player in enumerate(self.players) if self.killed[player_id] == 0]
 
     @started()
+    @cached()
     def check_deaths(self) -> List[str]:
         """Return names of players that have died but are not marked as such."""
         self.logger.debug("running check_deaths()")
         killed_players = []
+        death_probabilities = self.death_probabilities()
         for player_id, player in enumerate(self.players):
-            p_dead = self.death_probability(player)
-            if self.killed[player_id] == 0 and p_dead >= 1:
+            if self.killed[player_id] == 0 and death_probabilities[player_id] >= 1:
                 killed_players.append(player)
         return killed_players
 
     @started()
+    @cached()
     def role_probabilities(self) -> Tuple[dict, ...]:
         """Return table of probability per role per player."""
         self.logger.debug("running role_probabilities()")
-        p_list = self.valid_permutations()
-        transpose = list(zip(*p_list))
+        death_probabilities = self.death_probabilities()
         probs = []
         for i, p in enumerate(self.players):
             player_probs = {'name': p}
             for role in self.used_roles:
-                player_probs[role] = transpose[i].count(role) / len(p_list)
-            player_probs['dead'] = self.death_probability(p)
+                player_probs[role] = self.role_counts[i][role] / self.valid_count
+            player_probs['dead'] = death_probabilities[i]
             probs.append(player_probs)
         return tuple(probs)
 
-    # computes the probability of death for a player TODO: rewrite to calculate all probabilities at once
+    @started()
+    @cached()
+    def death_probabilities(self) -> List[float]:
+        """Return the probability that each player has died, in order of Game.players."""
+        self.logger.debug("running death_probabilities()")
+        total = 0
+        total_attacks = [0] * self.player_count
+        for p in self._valid_rows():
+            weight = self.permutations[p]
+            total += weight
+            attacks = self._death_attacks(p)
+            for i in range(self.player_count):
+                total_attacks[i] += attacks[i] * weight
+
+        return [1 if self.killed[i] == 1 else total_attacks[i] / total for i in range(self.player_count)]
+
     def death_probability(self, player: str) -> float:
         """ Return the probability that a player has died.
 
         Arguments:
             player: str -- Player for which to compute the death probability.
         """
-        self.logger.debug(f"running death_probability({player})")
-        # name: name of player
-        player_id = self._id(player)
-        if self.killed[player_id] == 1:
-            return 1
-
-        total_attacks = 0
-        p_list = self.valid_permutations()
-        for p in p_list:
-            # check for lover in permutation
-            lover_id = self._lover(p, player_id)
-
-            # count attacks by werewolves in this permutation
-            werewolf_attacks = self._werewolf_attack(p, player_id)
-
-            # count attacks by werewolves on lover in this permutation
-            lover_werewolf_attacks = 0
-            if lover_id is not None:
-                if self.killed[lover_id] == 1:
-                    lover_werewolf_attacks = 1  # TODO: rename this as it also checks if lover is killed by other means
-                else:
-                    lover_werewolf_attacks = self._werewolf_attack(p, lover_id)
+        self.logger.debug("running death_probability(%s)", player)
+        return self.death_probabilities()[self._id(player)]
+
+    def _werewolf_pair_counts(self) -> List[List[int]]:
+        """Return matrix of the number of valid permutations in which both players i and j are werewolves."""
+        counts = [[0] * self.player_count for _ in range(self.player_count)]
+        for p in self._valid_rows():
+            weight = self.permutations[p]
+            werewolf_ids = [i for i, role in enumerate(p) if role == 'werewolf']
+            for i in werewolf_ids:
+                row = counts[i]
+                for j in werewolf_ids:
+                    row[j] += weight
+        return counts
 
-            total_attacks += max(werewolf_attacks, lover_werewolf_attacks)
-
-        P_dead = total_attacks / len(p_list)
-
-        return P_dead
+    @started()
+    @cached()
+    def werewolf_cooccurrence(self) -> List[List[float]]:
+        """Return matrix of the probabilities that player j (column) is a werewolf if player i (row) is a werewolf.
+        The row of a player that cannot be a werewolf is None.
+        """
+        self.logger.debug("running werewolf_cooccurrence()")
+        matrix = []
+        for i, row in enumerate(self._werewolf_pair_counts()):
+            n_werewolf = row[i]
+            matrix.append([float(count / n_werewolf) for count in row] if n_werewolf else None)
+        return matrix
 
     @started()
+    @cached(maxsize=128)
     def other_werewolves(self, werewolf: str) -> List[dict]:
         """Returns a table of players and their probabilities to be a werewolf simultaneously as a given werewolf.
 
         Arguments:
             werewolf: str -- name of player assumed to be a werewolf.
         """
-        self.logger.debug(f"running other_werewolves({werewolf})")
+        self.logger.debug("running other_werewolves(%s)", werewolf)
         # Gives the probabilities of all other players being a werewolf
-        werewolf_id = self._id(werewolf)
-        p_list = self.valid_permutations()
-        projection = [p for p in p_list if p[werewolf_id] == 'werewolf']
+        row = self.werewolf_cooccurrence()[self._id(werewolf)]
 
-        if not projection:
+        if row is None:
             return []
 
-        n_projection = len(projection)
-        transpose = list(zip(*projection))
-
-        probs = []
-        for i, p in enumerate(self.players):
-            P_werewolf = transpose[i].count("werewolf") / n_projection
-            probs.append({'name': p, 'werewolf': P_werewolf})
-
-        return probs
+        return [{'name': p, 'werewolf': row[i]} for i, p in enumerate(self.players)]
 
     @started()
+    @cached(maxsize=128)
     def other_lover(self, player: str) -> List[dict]:
         """Return table of players and their probabilities to be the lover of a given player.
 
         Arguments:
             player: str -- name of player
         """
-        self.logger.debug(f"running other_lover({player})")
+        self.logger.debug("running other_lover(%s)", player)
         player_id = self._id(player)
 
         lover_count_list = [0] * self.player_count
-        p_list = self.valid_permutations()
+        p_list = self._valid_rows()
         if self.lovers_list:
             if self.deck['cupid'] > 0:
                 for p in p_list:
                     cupid_id = p.index('cupid')
                     lover1, lover2 = self.lovers_list[cupid_id]
                     if player_id == lover1:
-                        lover_count_list[lover2] += 1
+                        lover_count_list[lover2] += self.permutations[p]
                     elif player_id == lover2:
-                        lover_count_list[lover1] += 1
+                        lover_count_list[lover1] += self.permutations[p]
 
+        total = sum(self.permutations[p] for p in p_list)
         probs = []
         for i, p in enumerate(self.players):
-            P_lover = lover_count_list[i] / len(p_list)
+            P_lover = lover_count_list[i] / total
             probs.append({'name': p, 'lover': P_lover})
 
         return probs
 
     @started()
+    @cached()
     def check_win(self) -> Tuple[bool, str]:
         """Return wether any win condition is met and if so the faction that won."""
         all_dead = True
@@ -400,12 +815,12 @@ class Game:
         werewolf_win = True
         lover_win = True
 
-        p_list = self.valid_permutations()
+        p_list = self._valid_rows()
         for p in p_list:
             lovers = ()
             if 'cupid' in p:
                 cupid_id = p.index('cupid')
-                lovers = self.lovers_list[cupid_id]
+                lovers = self.lovers_list.get(cupid_id, ())
             for ID, role in enumerate(p):
                 if self.killed[ID] == 0:
                     all_dead = False
@@ -433,7 +848,7 @@ class Game:
     # TODO: research if player loop and role loop need to be reversed
     @started()
     def process_night(self, actions):
-        self.logger.debug(f"running process_night({actions})")
+        self.logger.debug("running process_night(%s)", actions)
         for player, player_actions in actions.items():
             for role, args in player_actions.items():
                 if role == 'cupid':
@@ -446,14 +861,17 @@ class Game:
     # ROLE ACTIONS
 
     @started()
+    @journaled
     def cupid(self, cupid: str, lover1: str, lover2: str) -> None:
         """Perform cupid action for a player. Records the lover pair in Game.lovers_list."""
-        self.logger.debug(f"running cupid({cupid}, {lover1}, {lover2})")
+        self.logger.debug("running cupid(%s, %s, %s)", cupid, lover1, lover2)
         cupid_id = self._id(cupid)
         lovers = (self._id(lover1), self._id(lover2))
         self.lovers_list[cupid_id] = lovers
+        self.version += 1
 
     @started()
+    @journaled
     def seer(self, seer: str, target: str, target_role: str = None, project: bool = True) -> str:
         """Perform the seer action for a players. Return target's role and collapse game state..
 
@@ -461,7 +879,7 @@ class Game:
             seer: str -- name of playerperforming the seer action.
             target: str -- name of target of the seer action
         """
-        self.logger.debug(f"running seer({seer}, {target}, target_role={target_role}, project={project})")
+        self.logger.debug("running seer(%s, %s, target_role=%s, project=%s)", seer, target, target_role, project)
         seer_id = self._id(seer)
         target_id = self._id(target)
 
@@ -471,27 +889,29 @@ class Game:
         # assert self.probs[seer_id]['seer'] != 0, "ERROR: in seer() {}'s seer probability is 0.".format(seer)
 
         # Player is allowed to take the action
-        self.logger.info("{} is investigating {} ...".format(seer, target))
-        p_list = self.valid_permutations()
-        projection = [p for p in p_list if p[seer_id] == 'seer']
+        self.logger.info("%s is investigating %s ...", seer, target)
+        seer_count = self.role_counts[seer_id].get('seer', 0)
 
-        if projection:
+        if seer_count:
             # Choose an outcome
             if target_role is None:
-                target_role = choice(projection)[target_id]
+                acceptance = seer_count / self.valid_count
+                target_role = self._sample_permutation(lambda p: p[seer_id] == 'seer', acceptance)[target_id]
 
             # Collapse the wave function
             if project:
-                for p in projection:
-                    if p[target_id] != target_role:
-                        self.permutations[p] = False
+                for p, valid in self.permutations.items():
+                    if valid and p[seer_id] == 'seer' and p[target_id] != target_role:
+                        self._invalidate(p)
+                self.version += 1
 
         # Report on results
-        self.logger.info(f"{seer} sees that {target} is a {target_role}!")
+        self.logger.info("%s sees that %s is a %s!", seer, target, target_role)
 
         return target_role
 
     @started()
+    @journaled
     def werewolf(self, werewolf, target):
         """Perform werewolf action for a player. Mark the attack in Game.deaths.
         Optionally collapses the game to exclude werewolves targeting werewolves. [CAUSES PROBLEMS]
@@ -503,48 +923,54 @@ class Game:
         kill chance is 1 over number of werewolves still alive.
         If werewolves may not eat other werewolves then all permutations in which acting player and target are both werewolves are no longer possible.
         """
-        self.logger.debug(f"running werewolf({werewolf}, {target})")
+        self.logger.debug("running werewolf(%s, %s)", werewolf, target)
         assert werewolf != target, "ERRROR: in werwwolf() werewolf == target."
         werewolf_id = self._id(werewolf)
         target_id = self._id(target)
         assert self.killed[werewolf_id] != 1, "ERROR: in werewolf() werewolf {} is dead".format(werewolf)
         assert self.killed[target_id] != 1, "ERROR: in werewolf() target {} is dead".format(target)
+        assert self.werewolf_count > 0, "ERROR: in werewolf() no werewolves are alive"
         # assert self.probs[werewolf_id]['werewolf'] != 0, "ERROR: in werewolf() {}'s werewolf probability is 0".format(target)
 
         self.deaths[target_id][werewolf_id] = 1 / self.werewolf_count
+        self.version += 1
 
         if self.werewolf_cannot_eat_werewolf:
             # project such that target and werewolf can't be both werewolves
-            p_list = self.valid_permutations()
+            p_list = self._valid_rows()
             for p in p_list:
                 if p[werewolf_id] == 'werewolf' and p[target_id] == 'werewolf':
-                    self.permutations[p] = False
+                    self._invalidate(p)
 
     @started()
-    def kill(self, target: str) -> str:
+    @journaled
+    def kill(self, target: str, target_role: str = None) -> str:
         """Kill and identify a player. Return the player's role and collapses the game state.
 
         Arguments:
             target: str -- name of player to kill.
+            target_role: str -- role to reveal, a random possible role if None (default: None)
         """
-        self.logger.debug(f"running kill({target})")
+        self.logger.debug("running kill(%s, target_role=%s)", target, target_role)
         target_id = self._id(target)
         assert self.killed[target_id] != 1, "ERROR:in kill() target {} is already dead.".format(target)
 
-        self.logger.info("{} was killed!".format(target))
+        self.logger.info("%s was killed!", target)
 
         # Chooses an outcome
-        p_list = self.valid_permutations()
-        result = choice(p_list)
-        target_role = result[target_id]
+        if target_role is None:
+            target_role = self._sample_permutation()[target_id]
+        assert self.role_counts[target_id].get(target_role, 0), \
+            "ERROR: in kill() target {} can not be a {}.".format(target, target_role)
 
         # Collapse the wave function
-        for p in p_list:
-            if p[target_id] != target_role:
-                self.permutations[p] = False
+        for p, valid in self.permutations.items():
+            if valid and p[target_id] != target_role:
+                self._invalidate(p)
+        self._compact()
 
         # Report on results
-        self.logger.info(f"{target} was a {target_role}!")
+        self.logger.info("%s was a %s!", target, target_role)
 
         # Deal with the case that the dead person is a werewolf
         if target_role == "werewolf":
@@ -553,59 +979,74 @@ class Game:
                 self.deaths[i][target_id] = 0
 
         self.killed[target_id] = 1
+        self.version += 1
 
         return target_role
 
-    def _lover(self, permutation: List[str], player_id: int) -> int:
-        """Return the index of the lover of a player in a given permutation if they exits, otherwise returns None.
+    @started()
+    def resolve_deaths(self, killed_players: List[str] = ()) -> Tuple[List[dict], List[str]]:
+        """Kill players and then everyone who died as a consequence, until no more players die.
+        Return the kills, as dicts with the 'name' and 'role' of the player and whether they died in a 'chain' of deaths,
+        and the hunters among them that still have to shoot, in order of death.
 
         Arguments:
-            permutation: List[str] -- permutation in which to check for lover.
-            player_id: int -- index of player for which to check lover.
+            killed_players: List[str] -- names of players to kill first (default: ())
+        """
+        self.logger.debug("running resolve_deaths(%s)", killed_players)
+        kills = []
+        chain = False
+        while True:
+            for player in killed_players:
+                if self.killed[self._id(player)] != 1:
+                    kills.append({'name': player, 'role': self.kill(player), 'chain': chain})
+            # all players that died from these kills at once
+            killed_players = self.check_deaths()
+            if not killed_players:
+                break
+            chain = True
+
+        hunters = [kill['name'] for kill in kills if kill['role'] == 'hunter']
+        return kills, hunters
+
+    def _lovers(self, permutation: List[str]) -> Tuple[int, int]:
+        """Return the indices of the lovers in a given permutation if they exist, otherwise returns None.
+
+        Arguments:
+            permutation: List[str] -- permutation in which to check for lovers.
         """
         if self.deck['cupid'] == 0 or not self.lovers_list:
             return None
-        lover_id = None
         cupid_id = permutation.index('cupid')
-        lover1, lover2 = self.lovers_list[cupid_id]
-        if player_id == lover1:
-            lover_id = lover2
-        elif player_id == lover2:
-            lover_id = lover1
-        return lover_id
+        return self.lovers_list.get(cupid_id)
 
-    def _werewolf_attack(self, permutation: List[str], player_id: int) -> int:
-        """Return the total sum of werewolf attacks of a player in a given permutation.
+    def _werewolf_attacks(self, permutation: List[str]) -> List[float]:
+        """Return the total sum of werewolf attacks on every player in a given permutation.
 
         Arguments:
             permutation: List[str] -- permutation in which to sum the werewolf attacks.
-            player_id: int -- index of player for which to check werewolf attacks.
         """
-        werewolf_attacks = 0
-        for i in range(self.player_count):
-            if permutation[i] == "werewolf" and permutation[player_id] != "werewolf":
-                werewolf_attacks += self.deaths[player_id][i]
-        return werewolf_attacks
-
-    # TODO
-    """
-    # count attacks by werewolves in this permutation
-    def _werewolf_attacks(self, permutation):
-        werewolf_attacks = [0] * self.player_count
-        for i in range(self.player_count):
-            if permutation[i] == "werewolf":
-                werewolf_attacks += self.deaths[player_id][i]
-        return werewolf_attacks
-
-    # computes the probability of death for a player TODO: rewrite to calculate all probabilities at once
-    def death_probabilities(self):
-        # name: name of player
-        P_dead = [1 if self.killed[player_id] else 0 for player_id in range(self.player_count)]
+        werewolf_ids = [i for i, role in enumerate(permutation) if role == 'werewolf']
+        attacks = [0] * self.player_count
+        for player_id, role in enumerate(permutation):
+            if role != 'werewolf':
+                attacks[player_id] = sum(self.deaths[player_id][i] for i in werewolf_ids)
+        return attacks
 
-        # compute total werewolf death probabilities
-        p_list = self.valid_permutations()
-        for p in p_list:
-            pass
+    def _death_attacks(self, permutation: List[str]) -> List[float]:
+        """Return the total attacks on every player in a given permutation, including those on their lover.
 
-        return P_dead
-    """
+        Arguments:
+            permutation: List[str] -- permutation in which to sum the attacks.
+        """
+        # count attacks by werewolves in this permutation
+        attacks = self._werewolf_attacks(permutation)
+
+        # lovers die with their lover, also when killed by other means
+        lovers = self._lovers(permutation)
+        if lovers is not None:
+            lover1, lover2 = lovers
+            lover1_attacks = 1 if self.killed[lover1] == 1 else attacks[lover1]
+            lover2_attacks = 1 if self.killed[lover2] == 1 else attacks[lover2]
+            attacks[lover1] = max(attacks[lover1], lover2_attacks)
+            attacks[lover2] = max(attacks[lover2], lover1_attacks)
+        return attacks
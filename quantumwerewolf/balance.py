@@ -0,0 +1,141 @@
+"""Win rates of simulated games per deck and player count, cached on disk."""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import cpu_count
+from typing import Dict, Iterator, List
+
+from quantumwerewolf.simulate import simulate, summary
+
+default_cache = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                             'quantumwerewolf', 'balance.jsonl')
+
+# fields of a cell that determine its results
+key_fields = ('players', 'deck', 'werewolf_cannot_eat_werewolf', 'start_with_subset', 'seed', 'games', 'policy')
+
+
+def cell_key(cell: dict) -> str:
+    """Return the cache key of a cell of the balance table."""
+    return json.dumps([cell[field] for field in key_fields], sort_keys=True)
+
+
+def decks(player_count: int, roles: List[str] = ()) -> Iterator[dict]:
+    """Yield the decks to sweep for a number of players: one seer, the given extra roles and one werewolf up to
+    a third of the players.
+
+    Arguments:
+        player_count: int -- number of players.
+        roles: List[str] -- extra roles in every deck, 'cupid' and/or 'hunter' (default: ())
+    """
+    for werewolf_count in range(1, max(player_count // 3, 1) + 1):
+        deck = {'werewolf': werewolf_count, 'seer': 1, 'hunter': 0, 'cupid': 0}
+        for role in roles:
+            deck[role] = 1
+        deck['villager'] = player_count - sum(deck.values())
+        if deck['villager'] >= 0:
+            yield deck
+
+
+def cells(min_players: int, max_players: int, roles: List[str] = (), games: int = 200, policy: str = 'random',
+          seed: int = 0, werewolf_cannot_eat_werewolf: bool = False, start_with_subset: bool = True) -> List[dict]:
+    """Return the cells of the balance table for all player counts and decks, without results."""
+    return [{
+        'players': player_count,
+        'deck': deck,
+        'werewolf_cannot_eat_werewolf': werewolf_cannot_eat_werewolf,
+        'start_with_subset': start_with_subset,
+        'seed': seed,
+        'games': games,
+        'policy': policy,
+    } for player_count in range(min_players, max_players + 1) for deck in decks(player_count, roles)]
+
+
+def load_cache(path: str) -> Dict[str, dict]:
+    """Return the cached cells by cache key. A missing cache is empty.
+
+    Arguments:
+        path: str -- cache file, with one cell per line.
+    """
+    cache = {}
+    if os.path.exists(path):
+        with open(path) as lines:
+            for line in lines:
+                try:
+                    cell = json.loads(line)
+                except ValueError:
+                    # a line cut off by an interrupted sweep
+                    continue
+                cache[cell_key(cell)] = cell
+    return cache
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as lines:
+        lines.seek(-1, os.SEEK_END)
+        return lines.read() == b'\n'
+
+
+def run_cell(cell: dict) -> dict:
+    """Return a cell with the summary() of its simulated games added."""
+    results = list(simulate(cell['games'], cell['players'], cell['deck'], cell['policy'], cell['seed'],
+                            start_with_subset=cell['start_with_subset'],
+                            werewolf_cannot_eat_werewolf=cell['werewolf_cannot_eat_werewolf'], workers=1))
+    result = summary(results, 1)
+    del result['games_per_second']
+    return dict(cell, **result)
+
+
+def sweep(table: List[dict], cache: str = default_cache, workers: int = None) -> List[dict]:
+    """Return the cells of a balance table with their results. Cells that are not in the cache are simulated in
+    a pool of worker processes, one cell per worker, and added to the cache as soon as they are done,
+    so an interrupted sweep continues where it stopped.
+
+    Arguments:
+        table: List[dict] -- cells, see cells()
+        cache: str -- cache file (default: default_cache)
+        workers: int -- number of worker processes (default: os.cpu_count())
+    """
+    cached = load_cache(cache)
+    missing = [cell for cell in table if cell_key(cell) not in cached]
+    if missing:
+        os.makedirs(os.path.dirname(os.path.abspath(cache)), exist_ok=True)
+        with open(cache, 'a') as output, ProcessPoolExecutor(workers or cpu_count()) as executor:
+            if output.tell() and not _ends_with_newline(cache):
+                # end the line cut off by an interrupted sweep
+                output.write('\n')
+            for future in as_completed([executor.submit(run_cell, cell) for cell in missing]):
+                cell = future.result()
+                output.write(json.dumps(cell) + '\n')
+                output.flush()
+                cached[cell_key(cell)] = cell
+    return [cached[cell_key(cell)] for cell in table]
+
+
+def balanced_werewolf_count(player_count: int, werewolf_cannot_eat_werewolf: bool = False,
+                            start_with_subset: bool = True, cache: str = default_cache) -> int:
+    """Return the number of werewolves for which the villagers win closest to half of the cached games with one
+    seer and no other roles, or None if the cache has no such games for the player count.
+
+    Arguments:
+        player_count: int -- number of players.
+        werewolf_cannot_eat_werewolf: bool -- rule flag of the game (default: False)
+        start_with_subset: bool -- rule flag of the game (default: True)
+        cache: str -- cache file (default: default_cache)
+    """
+    games = {}
+    villager_wins = {}
+    for cell in load_cache(cache).values():
+        deck = cell['deck']
+        if (cell['players'] != player_count or deck['seer'] != 1 or deck['cupid'] or deck['hunter']
+                or cell['werewolf_cannot_eat_werewolf'] != werewolf_cannot_eat_werewolf
+                or cell['start_with_subset'] != start_with_subset):
+            continue
+        # cells with other seeds or policies add up
+        werewolf_count = deck['werewolf']
+        games[werewolf_count] = games.get(werewolf_count, 0) + cell['games']
+        villager_wins[werewolf_count] = (villager_wins.get(werewolf_count, 0)
+                                         + cell['games'] * cell['win_rates'].get('villagers', 0))
+    if not games:
+        return None
+    return min(games, key=lambda count: (abs(villager_wins[count] / games[count] - 0.5), count))
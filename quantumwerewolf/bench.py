@@ -0,0 +1,198 @@
+"""Benchmark of the game engines across player counts and deck shapes."""
+
+import json
+import random
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Dict, List
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.engines import engine, engine_names
+
+decks = {
+    'plain': {'werewolf': 0, 'seer': 1, 'hunter': 0, 'cupid': 0},
+    'cupid': {'werewolf': 0, 'seer': 1, 'hunter': 0, 'cupid': 1},
+    'hunter': {'werewolf': 0, 'seer': 1, 'hunter': 1, 'cupid': 0},
+    'cupid+hunter': {'werewolf': 0, 'seer': 1, 'hunter': 1, 'cupid': 1},
+}
+
+
+def new_game(engine_name: str, player_count: int, deck_name: str, start_with_subset: bool, seed: int = 0) -> Game:
+    """Return a seeded game that is ready to start, with the suggested number of werewolves."""
+    game = engine(engine_name)(seed)
+    game.add_players([f'player{i}' for i in range(player_count)])
+    deck = decks[deck_name].copy()
+    deck['werewolf'] = max(round(player_count / 5), 1)
+    assert game.set_deck(deck), f'deck {deck_name} does not fit {player_count} players'
+    game.start_with_subset = start_with_subset
+    return game
+
+
+def play_script(game: Game, seed: int, rounds: int, timings: Dict[str, float]) -> int:
+    """Start a game and play scripted nights and days, adding the time spent per method to timings.
+    Return the number of permutations the game started with.
+
+    Arguments:
+        game: Game -- game that is ready to start.
+        seed: int -- seed of the scripted choices.
+        rounds: int -- maximum number of nights and days to play.
+        timings: Dict[str, float] -- total seconds spent per method name.
+    """
+    rng = random.Random(seed)
+
+    def timed(method, *args):
+        start = perf_counter()
+        result = getattr(game, method)(*args)
+        timings[method] = timings.get(method, 0.0) + perf_counter() - start
+        return result
+
+    timed('start')
+    permutations = game._permutation_count()
+    for _ in range(rounds):
+        # night
+        game.turn_counter += 1
+        timed('role_probabilities')
+        living = game.living_players()
+        actions = {}
+        for player in living:
+            target = rng.choice([p for p in living if p != player])
+            actions[player] = {'seer': (target, timed('seer', player, target, None, False)), 'werewolf': target}
+            if game.turn_counter == 1 and 'cupid' in game.used_roles:
+                actions[player]['cupid'] = tuple(rng.sample(game.players, 2))
+        timed('process_night', actions)
+
+        # day
+        timed('death_probabilities')
+        for player in timed('check_deaths'):
+            timed('kill', player)
+        if timed('check_win')[0]:
+            break
+        timed('kill', rng.choice(game.living_players()))
+        for player in timed('check_deaths'):
+            timed('kill', player)
+        if timed('check_win')[0]:
+            break
+    return permutations
+
+
+def run_case(engine_name: str, player_count: int, deck_name: str, start_with_subset: bool,
+             seed: int = 0, rounds: int = 3) -> dict:
+    """Return the timings, peak memory and permutation counts of a scripted game.
+
+    The script is played twice with the same seed: once for the timings and once for the peak memory,
+    as tracing the memory slows down the game.
+    """
+    timings = {}
+    game = new_game(engine_name, player_count, deck_name, start_with_subset, seed)
+    start = perf_counter()
+    permutations = play_script(game, seed, rounds, timings)
+    total = perf_counter() - start
+    game.stop()
+
+    tracemalloc.start()
+    memory_game = new_game(engine_name, player_count, deck_name, start_with_subset, seed)
+    play_script(memory_game, seed, rounds, {})
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    memory_game.stop()
+
+    return {
+        'engine': engine_name,
+        'players': player_count,
+        'deck': deck_name,
+        'start_with_subset': start_with_subset,
+        'seed': seed,
+        'permutations': permutations,
+        'max_permutations': game._max_permutations(),
+        'turns': game.turn_counter,
+        'wall_time': total,
+        'timings': timings,
+        'peak_memory': peak_memory,
+    }
+
+
+def case_key(result: dict) -> tuple:
+    return (result['engine'], result['players'], result['deck'], result['start_with_subset'])
+
+
+def sweep(engines: List[str], min_players: int = 5, max_players: int = 12, max_permutations: int = 200000,
+          seed: int = 0, rounds: int = 3) -> List[dict]:
+    """Return the results of run_case() for all engines, player counts, decks and both start_with_subset settings.
+    Cases that enumerate more than max_permutations game states are skipped.
+    """
+    results = []
+    for engine_name in engines:
+        for player_count in range(min_players, max_players + 1):
+            for deck_name in decks:
+                for start_with_subset in (True, False):
+                    game = new_game(engine_name, player_count, deck_name, start_with_subset)
+                    if game.enumerates and not start_with_subset and game._max_permutations() > max_permutations:
+                        continue
+                    results.append(run_case(engine_name, player_count, deck_name, start_with_subset, seed, rounds))
+    return results
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float = 1.5) -> List[dict]:
+    """Return the cases that became slower or used more memory than tolerance times the baseline.
+
+    Arguments:
+        results: List[dict] -- results of sweep()
+        baseline: List[dict] -- earlier results of sweep()
+        tolerance: float -- allowed ratio between result and baseline
+    """
+    baseline = {case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline.get(case_key(result))
+        if reference is None:
+            continue
+        for measure in ('wall_time', 'peak_memory'):
+            if reference[measure] > 0 and result[measure] / reference[measure] > tolerance:
+                regressions.append({
+                    'case': dict(zip(('engine', 'players', 'deck', 'start_with_subset'), case_key(result))),
+                    'measure': measure,
+                    'baseline': reference[measure],
+                    'result': result[measure],
+                })
+    return regressions
+
+
+def bench(argv=None):
+    parser = ArgumentParser(prog='quantumwerewolf-bench', description='Benchmark the quantum werewolf game engines.')
+    parser.add_argument('--engine', action='append', choices=engine_names,
+                        help='engine to benchmark, can be given multiple times (default: game)')
+    parser.add_argument('--min-players', type=int, default=5)
+    parser.add_argument('--max-players', type=int, default=12)
+    parser.add_argument('--max-permutations', type=int, default=200000,
+                        help='skip full enumerations with more game states (default: 200000)')
+    parser.add_argument('--rounds', type=int, default=3, help='maximum number of nights and days per game (default: 3)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='FILE', help='write the results to FILE instead of standard output')
+    parser.add_argument('--baseline', metavar='FILE', help='compare the results against an earlier output')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='ratio to the baseline that counts as a regression (default: 1.5)')
+    args = parser.parse_args(argv)
+
+    results = sweep(args.engine or ['game'], args.min_players, args.max_players, args.max_permutations,
+                    args.seed, args.rounds)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        json.dump({'regressions': regressions}, sys.stderr, indent=2)
+        print(file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    bench()
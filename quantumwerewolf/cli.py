@@ -1,9 +1,15 @@
+import json
 import logging
-from os import system, get_terminal_size
+import sys
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from shutil import get_terminal_size
+from quantumwerewolf import balance
 from quantumwerewolf.backend import Game
+from quantumwerewolf.logs import setup_logging, stop_logging
+from quantumwerewolf.simulate import policies
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(filename='debug.log', level=logging.DEBUG)
 
 
 # TODO: take Game class as mutable gamestate instead of subclassing
@@ -51,67 +57,109 @@ class CliGame(Game):
 
     name_length = 12
 
-    def __init__(self):
-        super().__init__()
+    clear_screen = '\033[H\033[2J'
+
+    def __init__(self, inputs=None, output=None, rng=None):
+        """Create a game played in the terminal.
+
+        Arguments:
+            inputs: Iterable[str] -- answers to all prompts, read from the keyboard if None (default: None)
+            output: TextIO -- stream to write the screens to (default: sys.stdout)
+            rng: Union[int, random.Random, numpy.random.Generator] -- seed or generator of the game (default: None)
+        """
+        super().__init__(rng)
+        self.inputs = None if inputs is None else iter(inputs)
+        self.output = sys.stdout if output is None else output
+        self.buffer = []
         columns = get_terminal_size().columns
         if columns < 69:
             if columns < 45:
-                print(f"{self.boldred}WARNING: screen is too narrow for the game{self.normal}")
+                self.print(f"{self.boldred}WARNING: screen is too narrow for the game{self.normal}")
                 self.bar_length = 12
             else:
                 self.bar_length = columns - 27
         else:
             self.bar_length = 36
 
+    @contextmanager
+    def turn_stats(self, enabled: bool = True):
+        """Return context manager that logs Game.stats() of the turn played inside it, slowest methods first."""
+        if not enabled:
+            yield
+            return
+        with self.stats_turn():
+            yield
+        stats = sorted(self.stats().items(), key=lambda item: item[1]['total_time'], reverse=True)
+        for name, method_stats in stats:
+            self.logger.info('turn %d %s: %d calls, %.6fs total, %.6fs max, %d permutations', self.turn_counter, name,
+                             method_stats['calls'], method_stats['total_time'], method_stats['max_time'],
+                             method_stats['permutations'])
+
+    def print(self, *values, sep=' ', end='\n'):
+        self.buffer.append(sep.join(str(value) for value in values) + end)
+
+    def flush(self):
+        self.output.write(''.join(self.buffer))
+        self.output.flush()
+        self.buffer.clear()
+
+    def clear(self):
+        # show the previous screen and start a new one
+        self.flush()
+        self.buffer.append(self.clear_screen)
+
+    def input(self, prompt=''):
+        self.print(prompt, end='')
+        self.flush()
+        if self.inputs is None:
+            return input()
+        answer = next(self.inputs, None)
+        if answer is None:
+            raise EOFError('No more input in script')
+        answer = answer.rstrip('\n')
+        self.output.write(answer + '\n')
+        return answer
+
     def ask_yesno(self, query, yes, no):
-        self.logger.debug(f'running ask_yesno({query}, {yes}, {no})')
-        answer = input(query + ' (yes/no) ')
-        if answer == 'yes' or answer == 'y':
-            if callable(yes):
-                return yes()
-            else:
-                return yes
-        elif answer == 'no' or answer == 'n':
-            if callable(no):
-                return no()
-            else:
-                return no
-        else:
-            print('invalid answer')
-            return self.ask_yesno(query, yes, no)
+        self.logger.debug('running ask_yesno(%s, %s, %s)', query, yes, no)
+        while True:
+            answer = self.input(query + ' (yes/no) ')
+            if answer == 'yes' or answer == 'y':
+                return yes() if callable(yes) else yes
+            elif answer == 'no' or answer == 'n':
+                return no() if callable(no) else no
+            self.print('invalid answer')
 
     def ask_player(self, query, invalid_players=[]):
-        answer = input(query + 'Name: ')
-
-        if answer.isdecimal():
-            i = int(answer) - 1
-            if i in range(self.player_count):
-                answer = self.players[i]
-
         valid_players = self.living_players()
         for player in invalid_players:
             valid_players.remove(player)
 
-        if not valid_players:
-            return None
+        while True:
+            answer = self.input(query + 'Name: ')
 
-        if answer in valid_players:
-            return answer
-        else:
-            print(f'    {self.red}"{answer}" is not a valid choice{self.normal}')
-            print('    Valid players are:')
-            for i, p in enumerate(valid_players):
-                print("      {}".format(p))
+            if answer.isdecimal():
+                i = int(answer) - 1
+                if i in range(self.player_count):
+                    answer = self.players[i]
+
+            if not valid_players:
+                return None
+
+            if answer in valid_players:
+                return answer
 
-            return self.ask_player(query, invalid_players=invalid_players)
+            self.print(f'    {self.red}"{answer}" is not a valid choice{self.normal}')
+            self.print('    Valid players are:')
+            for p in valid_players:
+                self.print("      {}".format(p))
 
     def ask_number(self, query, valid_numbers=None):
-        answer = input(query)
-        if answer.isdigit():
-            return int(answer)
-        else:
-            print('  "{}" is not a valid choice'.format(answer))
-            return self.ask_number(query)
+        while True:
+            answer = self.input(query)
+            if answer.isdigit():
+                return int(answer)
+            self.print('  "{}" is not a valid choice'.format(answer))
 
     # Gives the table of probabilities
     def print_probability_table(self):
@@ -121,7 +169,7 @@ class CliGame(Game):
         for role in self.used_roles:
             header_line += f"{role:>12s}"
         header_line += f"{'dead':>12s}"
-        print(header_line)
+        self.print(header_line)
 
         for i in self.print_permutation:
             p = probabilities[i]
@@ -132,13 +180,13 @@ class CliGame(Game):
             for role in self.used_roles:
                 line += f"{100*p[role]:11.0f}%"
             line += f"{100*p['dead']:11.0f}%"
-            print(line)
+            self.print(line)
 
     def print_probability_bars(self, game_over=False):
         probabilities = self.role_probabilities()
 
         # print header
-        print(f"{self.bold}{'Name':>{self.name_length}}    {'Role Distribution':<{self.bar_length}}{'Deadness':>11}{self.normal}")
+        self.print(f"{self.bold}{'Name':>{self.name_length}}    {'Role Distribution':<{self.bar_length}}{'Deadness':>11}{self.normal}")
 
         # print bars
         for i in self.print_permutation:
@@ -158,89 +206,82 @@ class CliGame(Game):
                 total_length = total_length_new
                 line += f"{self.role_style_bold[role]}{letter * length}"
             line += f"{self.normal}{100*p['dead']:5.0f}% dead"
-            print(line)
+            self.print(line)
 
         # print legend
         legend = ""
         for role in self.used_roles:
             legend += f"{self.role_style_bold[role]}{role.title()}, "
-        print(f'\n        {self.bold}Legend: {legend[:-2]}.{self.normal}')
-
-    def print_kill(self, player, cause=''):
-        player_role = self.kill(player)
-        print(f'\n  {player} was killed {cause}')
-        print(f'    {player} was {self.role_preposition[player_role]}{player_role}\n')
-        return player_role
-
-    # TODO: move to backend
-    def process_deaths(self, killed_players):
-        # kill all players that died
-        hunter = None
-        for player in killed_players:
-            player_role = self.print_kill(player, '')
-            if player_role == 'hunter':
-                hunter = player
-
-        # check for chain deaths
-        if killed_players:
-            killed_players = self.check_deaths()
-            self.process_deaths(killed_players)
-
-        # if hunter died and someone is still alive they must kill someone
-        if hunter and self.living_players():
-            print(f'    {hunter} must now kill another player')
+        self.print(f'\n        {self.bold}Legend: {legend[:-2]}.{self.normal}')
+
+    def print_kill(self, player, player_role, cause=''):
+        self.print(f'\n  {player} was killed {cause}')
+        self.print(f'    {player} was {self.role_preposition[player_role]}{player_role}\n')
+
+    def process_deaths(self, killed_players, cause=''):
+        # kill all players that died and let every hunter among them shoot
+        pending_hunters = []
+        while True:
+            kills, hunters = self.resolve_deaths(killed_players)
+            for kill in kills:
+                self.print_kill(kill['name'], kill['role'], '' if kill['chain'] else cause)
+            pending_hunters += hunters
+
+            # if hunter died and someone is still alive they must kill someone
+            if not pending_hunters or not self.living_players():
+                break
+            hunter = pending_hunters.pop(0)
+            self.print(f'    {hunter} must now kill another player')
             hunter_target = self.ask_player(f'\n  {self.boldgreen}[HUNTER]{self.normal} {hunter}, who do you shoot?\n    ')
-            self.print_kill(hunter_target, 'by the hunter')
-            killed_players = self.check_deaths()
-            self.process_deaths(killed_players)
+            killed_players, cause = [hunter_target], 'by the hunter'
 
     def print_win(self):
         win, winners = self.check_win()
         if win:
             if winners is None:
-                print("THE GAME IS A TIE!")
+                self.print("THE GAME IS A TIE!")
             else:
-                print(f"\n\n{self.bold}THE {winners.upper()} WIN!{self.normal}\n")
+                self.print(f"\n\n{self.bold}THE {winners.upper()} WIN!{self.normal}\n")
             self.print_probability_bars(game_over=True)
             self.stop()
         return win
 
     def get_players(self):
         # Get player names
-        print("Enter player names")
-        print("Enter no name to continue.")
+        self.print("Enter player names")
+        self.print("Enter no name to continue.")
         new_player = True
         while new_player:
-            name = input(f"  Name player {self.player_count + 1}: ")
+            name = self.input(f"  Name player {self.player_count + 1}: ")
             if name == '':
                 if self.player_count < 3:
-                    print(f'\033[F{self.red}  This game needs at least 3 players to play! Add more players.{self.normal}\033[K')
+                    self.print(f'\033[F{self.red}  This game needs at least 3 players to play! Add more players.{self.normal}\033[K')
                 else:
                     new_player = False
             elif not name.isalpha():
-                print(f"\033[F{self.red}  Name may only contain letters!{self.normal}\033[K")
+                self.print(f"\033[F{self.red}  Name may only contain letters!{self.normal}\033[K")
             elif len(name) > self.name_length:
-                print(f"\033[F{self.red}  Name cannot be longer than 12 characters!{self.normal}\033[K")
+                self.print(f"\033[F{self.red}  Name cannot be longer than 12 characters!{self.normal}\033[K")
             else:
                 if not self.add_player(name):
-                    print(f"\033[F{self.red}  Name {name} already in use!{self.normal}\033[K")
+                    self.print(f"\033[F{self.red}  Name {name} already in use!{self.normal}\033[K")
 
     def print_players(self):
         # display players
-        print("Current Players:")
+        self.print("Current Players:")
         for i, p in enumerate(self.players):
-            print(f"{i+1:3d}: {p}")
+            self.print(f"{i+1:3d}: {p}")
 
     def print_live_players(self):
         # display live players
-        print(f"  {self.underline}Live Players:{self.normal}")
+        self.print(f"  {self.underline}Live Players:{self.normal}")
         live_players = self.living_players()
         for i, p in enumerate(self.players):
             if p in live_players:
-                print(f"  {i+1:3d}: {p}")
+                self.print(f"  {i+1:3d}: {p}")
 
         if self.turn_counter == 1:
-            print(f'\n  {self.italic}Hint: you can also use player numbers instead of names{self.normal}')
+            self.print(f'\n  {self.italic}Hint: you can also use player numbers instead of names{self.normal}')
 
     def print_deck(self, hide_unused=False):
         for (role, count) in self.deck.items():
@@ -257,52 +298,50 @@ class CliGame(Game):
                     name = 'werewolves'
                 else:
                     name = role + 's'
-            print(f"{count:>4} {name}")
+            self.print(f"{count:>4} {name}")
 
     def get_deck(self):
         self.logger.debug('running get_deck()')
 
         def ask_deck():
             self.logger.debug('running ask_deck()')
-            # ask for new roles
-            print('')
-            deck = {}
-            for role in self.default_deck.keys():
-                if role == 'werewolf':
-                    deck['werewolf'] = self.ask_number('Number of werewolves: ')
-                elif role == 'villager':
-                    continue
-                else:
-                    deck[role] = self.ask_yesno(f'Include {role}?', 1, 0)
-
-            # check for valid deck
-            if self.set_deck(deck):
-                self.logger.debug('Received asked deck. Returning False.')
-                return False
-            else:
-                print(f"{self.red}Too many roles for numer of players. Try again.{self.normal}")
+            while True:
+                # ask for new roles
+                self.print('')
+                deck = {}
+                for role in self.default_deck.keys():
+                    if role == 'werewolf':
+                        deck['werewolf'] = self.ask_number('Number of werewolves: ')
+                    elif role == 'villager':
+                        continue
+                    else:
+                        deck[role] = self.ask_yesno(f'Include {role}?', 1, 0)
+
+                # check for valid deck
+                if self.set_deck(deck):
+                    self.logger.debug('Received asked deck. Returning False.')
+                    return False
+                self.print(f"{self.red}Too many roles for numer of players. Try again.{self.normal}")
                 self.logger.debug('Deck not valid. Asking again.')
-                return ask_deck()
 
         self.set_suggested_deck()
 
         deck_confirmed = False
         while deck_confirmed is False:
-            print("\nPlay with following roles?")
+            self.print("\nPlay with following roles?")
             self.print_deck()
             deck_confirmed = self.ask_yesno('', True, ask_deck)
 
     # TODO: move to backend
     def start_day(self):
-        killed_players = self.check_deaths()
-        self.process_deaths(killed_players)
+        self.process_deaths([])
 
     # TODO: move to backend
     def end_day(self, lynch_target):
         self.process_deaths([lynch_target])
 
     def get_player_actions(self, player, player_role_probabilities, player_other_werewolves, player_other_lover):
-        self.logger.debug(f"running get_player_actions({player}, {player_role_probabilities}, {player_other_werewolves}, {player_other_lover})")
+        self.logger.debug("running get_player_actions(%s, %s, %s, %s)", player, player_role_probabilities, player_other_werewolves, player_other_lover)
         player_actions = {}
         # cupid
         if 'cupid' in self.used_roles:
@@ -311,35 +350,36 @@ class CliGame(Game):
                 first_lover = self.ask_player(f'\n  {self.boldblue}[CUPID]{self.normal} Who do you choose as first lover?\n    ')
                 second_lover = self.ask_player(f'  {self.boldblue}[CUPID]{self.normal} Who do you choose as second lover?\n    ', invalid_players=[first_lover])
                 player_actions['cupid'] = (first_lover, second_lover)
-                print(f'  {self.boldblue}[CUPID]{self.normal} {first_lover} and {second_lover} are now lovers.')
+                self.print(f'  {self.boldblue}[CUPID]{self.normal} {first_lover} and {second_lover} are now lovers.')
             elif self.turn_counter > 1:
                 # print lover probabilities
-                print(f'\n  {self.boldblue}[CUPID]{self.normal} Your lover is:')
+                self.print(f'\n  {self.boldblue}[CUPID]{self.normal} Your lover is:')
                 for p in player_other_lover:
                     name = p['name']
                     chance = p['lover']
                     if name != player:
                         length = round(chance * self.bar_length)
-                        print(f'    {name:>{self.name_length}}: {100*chance:3.0f}% {self.boldblue}{"L" * length}{self.normal}')
+                        self.print(f'    {name:>{self.name_length}}: {100*chance:3.0f}% '
+                                   f'{self.boldblue}{"L" * length}{self.normal}')
 
         # seer
         if 'seer' in self.used_roles and player_role_probabilities['seer'] != 0:
             target = self.ask_player(f'\n  {self.boldpink}[SEER]{self.normal} Whose role do you inspect?\n    ')
             target_role = self.seer(player, target, project=False)
             player_actions['seer'] = (target, target_role)
-            print(f'  {self.boldpink}[SEER]{self.normal} You see that {target} is {self.role_preposition[target_role]}{target_role}.')
+            self.print(f'  {self.boldpink}[SEER]{self.normal} You see that {target} is {self.role_preposition[target_role]}{target_role}.')
 
         # werewolf
         if 'werewolf' in self.used_roles and player_role_probabilities['werewolf'] != 0:
             invalid_players = [player]
             # print other werewolves
-            print(f'\n  {self.boldred}[WEREWOLF]{self.normal} Your fellow werewolves are:')
+            self.print(f'\n  {self.boldred}[WEREWOLF]{self.normal} Your fellow werewolves are:')
             for p in player_other_werewolves:
                 name = p['name']
                 chance = p['werewolf']
                 if name != player:
                     length = round(chance * self.bar_length)
-                    print(f'    {name:>{self.name_length}}: {100*chance:3.0f}% {self.boldred}{"W"*length}{self.normal}')
+                    self.print(f'    {name:>{self.name_length}}: {100*chance:3.0f}% {self.boldred}{"W"*length}{self.normal}')
                 if chance == 1 and p in self.living_players():
                     invalid_players.append(p)
 
@@ -352,103 +392,178 @@ class CliGame(Game):
 
     def print_player_role(self, player_probabilities):
         # display game and player info (role superposition)
-        print(f'\n  {self.underline}Your role:{self.normal}')
+        self.print(f'\n  {self.underline}Your role:{self.normal}')
         for role in self.used_roles:
             style = self.role_style[role]
             letter = role[0].capitalize()
             chance = player_probabilities[role]
             length = round(chance * self.bar_length)
-            print(f"    {style}{role:>8s}: {100*chance:3.0f}% |{letter * length:<{self.bar_length}}|{self.normal}")
+            self.print(f"    {style}{role:>8s}: {100*chance:3.0f}% |{letter * length:<{self.bar_length}}|{self.normal}")
+
 
+def play(inputs=None, output=None, stats=False, balance_table=None):
+    """Play a game in the terminal, or headless from a script of answers.
 
-def cli():
+    Arguments:
+        inputs: Iterable[str] -- answers to all prompts, read from the keyboard if None (default: None)
+        output: TextIO -- stream to write the screens to (default: sys.stdout)
+        stats: bool -- log the time spent in each game method after every turn (default: False)
+        balance_table: str -- win rates to suggest the number of werewolves from, see Game.balance_table (default: None)
+    """
+    g = CliGame(inputs, output)
+    g.balance_table = balance_table
 
-    system('clear')
+    g.clear()
 
-    g = CliGame()
     g.get_players()
 
-    system('clear')
+    g.clear()
 
     g.print_players()
     g.get_deck()
 
-    system('clear')
+    g.clear()
 
     g.start()
 
     # loop turns for every player
     while g.started:
-        g.turn_counter += 1
+        with g.turn_stats(stats):
+            g.turn_counter += 1
 
-        # night
-        system('clear')
-        print('Night falls and all players take their actions in turns privately\n')
+            # night
+            g.clear()
+            g.print('Night falls and all players take their actions in turns privately\n')
 
-        start_probabilities = g.role_probabilities()
+            start_probabilities = g.role_probabilities()
 
-        # collect all player actions
-        actions = {}
-        for player_id, player in enumerate(g.players):
-            player_role_probabilities = start_probabilities[player_id]
-            player_other_lover = g.other_lover(player)
-            player_other_werewolves = g.other_werewolves(player)
-
-            # if player is dead skip turn
-            if g.killed[player_id] == 1:
-                continue
-
-            input(f"{player}'s turn (press ENTER to continue)")
-            system('clear')
-            print(f"{player}'s turn\n")
-
-            g.print_live_players()
-
-            g.print_player_role(player_role_probabilities)
+            # collect all player actions
+            actions = {}
+            for player_id, player in enumerate(g.players):
+                # if player is dead skip turn
+                if g.killed[player_id] == 1:
+                    continue
 
-            player_actions = g.get_player_actions(player, player_role_probabilities, player_other_werewolves, player_other_lover)
+                player_role_probabilities = start_probabilities[player_id]
+                player_other_lover = g.other_lover(player)
+                player_other_werewolves = g.other_werewolves(player)
 
-            # pass the actions for the player
-            actions[player] = player_actions
+                g.input(f"{player}'s turn (press ENTER to continue)")
+                g.clear()
+                g.print(f"{player}'s turn\n")
 
-            input("\n(press ENTER to continue)")
+                g.print_live_players()
 
-            system('clear')
+                g.print_player_role(player_role_probabilities)
 
-        # process actions
-        g.logger.debug(g.valid_permutations())
-        g.process_night(actions)
-        g.logger.debug(g.valid_permutations())
+                player_actions = g.get_player_actions(player, player_role_probabilities, player_other_werewolves, player_other_lover)
 
-        # day
-        input('All player have had their turn (press ENTER to continue)')
-        system('clear')
+                # pass the actions for the player
+                actions[player] = player_actions
 
-        print('The day begins and the villagers awaken.\n')
-        g.start_day()
+                g.input("\n(press ENTER to continue)")
 
-        # check win before the vote
-        if g.print_win():
-            break
+                g.clear()
 
-        # show live players
-        g.print_live_players()
+            # process actions
+            g.logger.debug('%d valid permutations before the night', g.valid_count)
+            g.process_night(actions)
+            g.logger.debug('%d valid permutations after the night', g.valid_count)
 
-        # Show current game state
-        print('\n  These are the current roles of the players:')
-        g.print_probability_bars()
+            # day
+            g.input('All player have had their turn (press ENTER to continue)')
+            g.clear()
 
-        # vote
-        print('\n  All players that are still alive must now choose one player to lynch.')
-        lynch_target = g.ask_player(f'\n  {g.boldyellow}[ALL VILLAGERS]{g.normal} Who do you lynch?\n    ')
+            g.print('The day begins and the villagers awaken.\n')
+            g.start_day()
 
-        g.end_day(lynch_target)
+            # check win before the vote
+            if g.print_win():
+                break
 
-        # check win after the vote
-        if g.print_win():
-            break
+            # show live players
+            g.print_live_players()
 
-        input('(press ENTER to continue)')
+            # Show current game state
+            g.print('\n  These are the current roles of the players:')
+            g.print_probability_bars()
+
+            # vote
+            g.print('\n  All players that are still alive must now choose one player to lynch.')
+            lynch_target = g.ask_player(f'\n  {g.boldyellow}[ALL VILLAGERS]{g.normal} Who do you lynch?\n    ')
+
+            g.end_day(lynch_target)
+
+            # check win after the vote
+            if g.print_win():
+                break
+
+            g.input('(press ENTER to continue)')
+
+    g.flush()
+
+
+def sweep(args):
+    table = balance.cells(args.min_players, args.max_players, args.role or [], args.games, args.policy, args.seed,
+                          args.werewolf_cannot_eat_werewolf, not args.full)
+    results = balance.sweep(table, args.cache, args.workers)
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+def cli(argv=None):
+    parser = ArgumentParser(prog='quantumwerewolf', description='Quantum version of the werewolves party game.')
+    parser.add_argument('--script', metavar='FILE', help='read all answers from FILE instead of the keyboard')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='minimum level of messages written to the log file (default: WARNING)')
+    parser.add_argument('--log-file', default='debug.log', metavar='FILE', help='log file (default: debug.log)')
+    parser.add_argument('--stats', action='store_true',
+                        help='log the calls and time spent per game method every turn, at INFO level')
+    parser.add_argument('--balance-table', default=balance.default_cache, metavar='FILE',
+                        help=f'suggest the number of werewolves from the win rates in FILE (default: {balance.default_cache})')
+    commands = parser.add_subparsers(dest='command')
+
+    sweep_parser = commands.add_parser('sweep', help='simulate games for a range of decks and write the win rates',
+                                       description='Simulate games with bots for a range of player counts and '
+                                                   'werewolf counts and write the win rates as JSON. '
+                                                   'Results are cached, so reruns only simulate new cells.')
+    sweep_parser.add_argument('--min-players', type=int, default=5)
+    sweep_parser.add_argument('--max-players', type=int, default=16)
+    sweep_parser.add_argument('--role', action='append', choices=['cupid', 'hunter'],
+                              help='extra role in every deck, can be given multiple times')
+    sweep_parser.add_argument('--games', type=int, default=200, help='number of games per cell (default: 200)')
+    sweep_parser.add_argument('--policy', default='random', choices=sorted(policies))
+    sweep_parser.add_argument('--full', action='store_true', help='start with all permutations instead of a random subset')
+    sweep_parser.add_argument('--werewolf-cannot-eat-werewolf', action='store_true')
+    sweep_parser.add_argument('--seed', type=int, default=0, help='seed of the first game of every cell (default: 0)')
+    sweep_parser.add_argument('--workers', type=int, help='number of worker processes (default: number of CPUs)')
+    sweep_parser.add_argument('--cache', default=balance.default_cache, metavar='FILE',
+                              help=f'file with the results of earlier sweeps (default: {balance.default_cache})')
+    sweep_parser.add_argument('--output', metavar='FILE', help='write the table to FILE instead of standard output')
+    args = parser.parse_args(argv)
+
+    setup_logging(getattr(logging, args.log_level), args.log_file)
+    try:
+        if args.command == 'sweep':
+            sweep(args)
+            return
+
+        if args.script is None:
+            play(stats=args.stats, balance_table=args.balance_table)
+            return
+
+        with open(args.script) as script:
+            try:
+                play(script, stats=args.stats, balance_table=args.balance_table)
+            except EOFError:
+                sys.stdout.flush()
+                sys.exit(f'\nScript {args.script} ended before the game did')
+    finally:
+        stop_logging()
 
 
 if __name__ == '__main__':
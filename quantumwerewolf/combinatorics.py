@@ -0,0 +1,92 @@
+"""Combinatorics of multiset permutations, used to enumerate the possible game states."""
+
+from collections import Counter
+from math import comb
+from typing import Iterable, Iterator, Sequence, Tuple
+
+
+def multiset_permutations(items: Sequence, first: Sequence = None) -> Iterator[Tuple]:
+    """Yield every distinct permutation of a multiset exactly once, in lexicographic order.
+
+    Arguments:
+        items: Sequence -- the elements of the multiset, which must be sortable.
+        first: Sequence -- if given, the permutation of items to start from instead of the smallest (default: None)
+    """
+    a = sorted(items) if first is None else list(first)
+    n = len(a)
+    while True:
+        yield tuple(a)
+        # find the last position that can be increased
+        i = n - 2
+        while i >= 0 and a[i] >= a[i + 1]:
+            i -= 1
+        if i < 0:
+            return
+        # swap it with the smallest larger element to its right
+        j = n - 1
+        while a[j] <= a[i]:
+            j -= 1
+        a[i], a[j] = a[j], a[i]
+        # the tail is decreasing, reverse it to get the smallest tail
+        a[i + 1:] = a[:i:-1]
+
+
+def multinomial(counts: Iterable[int]) -> int:
+    """Return the number of distinct permutations of a multiset with the given element counts.
+
+    Arguments:
+        counts: Iterable[int] -- number of copies of every distinct element.
+    """
+    result = 1
+    total = 0
+    for count in counts:
+        total += count
+        result *= comb(total, count)
+    return result
+
+
+def multiset_rank(permutation: Sequence) -> int:
+    """Return the index of a permutation in the lexicographic order of multiset_permutations().
+
+    Arguments:
+        permutation: Sequence -- permutation of a multiset, of which the elements must be sortable.
+    """
+    counts = Counter(permutation)
+    elements = sorted(counts)
+    remaining = multinomial(counts.values())
+    rank = 0
+    for n, item in zip(range(len(permutation), 0, -1), permutation):
+        # skip all permutations that start with a smaller element
+        for element in elements:
+            if element == item:
+                break
+            rank += remaining * counts[element] // n
+        remaining = remaining * counts[item] // n
+        counts[item] -= 1
+    return rank
+
+
+def multiset_unrank(rank: int, items: Sequence) -> Tuple:
+    """Return the permutation of a multiset at a given index of the lexicographic order of multiset_permutations().
+
+    Arguments:
+        rank: int -- index of the permutation, in range(multinomial(...)) of the multiset.
+        items: Sequence -- the elements of the multiset, which must be sortable.
+    """
+    counts = Counter(items)
+    elements = sorted(counts)
+    remaining = multinomial(counts.values())
+    if not 0 <= rank < remaining:
+        raise ValueError(f'rank {rank} out of range for {remaining} permutations')
+    permutation = []
+    for n in range(len(items), 0, -1):
+        for element in elements:
+            # number of permutations that start with this element
+            block = remaining * counts[element] // n
+            if rank < block:
+                break
+            rank -= block
+        permutation.append(element)
+        remaining = block
+        counts[element] -= 1
+    return tuple(permutation)
@@ -0,0 +1,527 @@
+"""Game engines that keep the constraints on the game state instead of a list of permutations."""
+
+from abc import ABC, abstractmethod
+from functools import partial
+from itertools import combinations
+from math import comb
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from quantumwerewolf.backend import Game
+
+
+class Tally:
+    """Number of game states, in total and per role, death, lover and werewolf pair."""
+
+    def __init__(self, game: Game, pairs: bool = False):
+        n = game.player_count
+        self.total = 0
+        self.roles = [dict.fromkeys(game.deck, 0) for _ in range(n)]
+        self.deaths = [0.0] * n
+        self.lovers = {}
+        self.pairs = [[0] * n for _ in range(n)] if pairs else None
+
+
+def _free_placements(free_count: int, werewolf_count: int, n_werewolf: int, n_villager: int) -> int:
+    """Return the number of ways to place werewolf_count werewolves on free_count free players, of which n_werewolf
+    given players are werewolves and n_villager given players are villagers.
+    """
+    rest = free_count - n_werewolf - n_villager
+    if n_werewolf > werewolf_count or rest < 0 or werewolf_count - n_werewolf > rest:
+        return 0
+    return comb(rest, werewolf_count - n_werewolf)
+
+
+class ConstraintGame(Game, ABC):
+    """Game keeping the deck and the constraints recorded by the actions instead of the permutations.
+
+    The constraints are the roles revealed by kills (Game.revealed), the observations of each
+    possible seer (Game.observations), the werewolf attacks (Game.deaths), the cupid pairs
+    (Game.lovers_list) and, if werewolves cannot eat werewolves, the pairs of players that cannot
+    both be werewolves (Game.forbidden_pairs).
+    Subclasses decide how the probabilities are computed from these constraints.
+    """
+
+    enumerates = False
+
+    # GAMESTATE
+
+    def _init_constraints(self) -> None:
+        self.revealed = {}
+        self.observations = {}
+        self.forbidden_pairs = set()
+
+    def generate_all_permutations(self):
+        self.logger.info('Initializing game state constraints')
+        self._init_constraints()
+
+    def generate_subset_permutations(self):
+        self.logger.info('Initializing game state constraints, a subset of permutations is not needed')
+        self._init_constraints()
+
+    def _permutation_count(self) -> int:
+        return 0
+
+    def _store_snapshot(self):
+        observations = {seer_id: observations[:] for seer_id, observations in self.observations.items()}
+        return dict(self.revealed), observations, set(self.forbidden_pairs)
+
+    def _restore_store(self, snapshot) -> None:
+        revealed, observations, forbidden_pairs = snapshot
+        self.revealed = dict(revealed)
+        self.observations = {seer_id: observations[:] for seer_id, observations in observations.items()}
+        self.forbidden_pairs = set(forbidden_pairs)
+
+    def _dump_store(self) -> Tuple[dict, Dict[str, bytes]]:
+        header = {
+            'revealed': [[player_id, role] for player_id, role in self.revealed.items()],
+            'observations': [[seer_id, [list(observation) for observation in observations]]
+                             for seer_id, observations in self.observations.items()],
+            'forbidden_pairs': sorted(self.forbidden_pairs),
+        }
+        return header, {}
+
+    def _load_store(self, header: dict, sections: Dict[str, memoryview]) -> None:
+        self.revealed = {player_id: role for player_id, role in header['revealed']}
+        self.observations = {seer_id: [tuple(observation) for observation in observations]
+                             for seer_id, observations in header['observations']}
+        self.forbidden_pairs = {tuple(pair) for pair in header['forbidden_pairs']}
+
+    def _state_count(self) -> int:
+        return 0
+
+    def _constraints(self) -> List[tuple]:
+        """Return the recorded constraints as tuples starting with the constraint type and the players involved."""
+        constraints = [('revealed', player_id, role) for player_id, role in self.revealed.items()]
+        for seer_id, observations in self.observations.items():
+            constraints += [('observation', seer_id, target_id, role) for target_id, role in observations]
+        constraints += [('forbidden', a, b) for a, b in self.forbidden_pairs]
+        return constraints
+
+    @staticmethod
+    def _satisfied(permutation: List[str], constraint: tuple) -> bool:
+        """Return whether a permutation satisfies a constraint from ConstraintGame._constraints().
+
+        Arguments:
+            permutation: List[str] -- permutation to check.
+            constraint: tuple -- constraint to check.
+        """
+        if constraint[0] == 'revealed':
+            _, player_id, role = constraint
+            return permutation[player_id] == role
+        if constraint[0] == 'observation':
+            _, seer_id, target_id, role = constraint
+            return permutation[seer_id] != 'seer' or permutation[target_id] == role
+        _, a, b = constraint
+        return permutation[a] != 'werewolf' or permutation[b] != 'werewolf'
+
+    @abstractmethod
+    def _tally(self, condition=None, pairs: bool = False) -> Tally:
+        """Return the number of game states per role, death, lover and optionally werewolf pair.
+
+        Arguments:
+            condition: tuple -- if given, only count game states satisfying this constraint.
+            pairs: bool -- if True, also count the game states in which each pair of players are both werewolves.
+        """
+
+    @abstractmethod
+    def _sample_role(self, target_id: int, seer_id: int = None) -> str:
+        """Return a random role for a player according to the current game state, or None if there is none.
+
+        Arguments:
+            target_id: int -- index of the player.
+            seer_id: int -- if given, only consider game states in which this player is the seer.
+        """
+
+    def _exact_tally(self) -> Tally:
+        """Return the number of all game states per role, death and lover, for the decisions that can not be taken
+        from estimates: the end of the game and whether a role is possible.
+        """
+        return self._tally()
+
+    # GAME INFO METHODS
+
+    @Game.started()
+    @Game.cached()
+    def role_probabilities(self) -> Tuple[dict, ...]:
+        """Return table of probability per role per player."""
+        self.logger.debug("running role_probabilities()")
+        tally = self._tally()
+        death_probabilities = self._death_probabilities(tally)
+        probs = []
+        for i, p in enumerate(self.players):
+            player_probs = {'name': p}
+            for role in self.used_roles:
+                player_probs[role] = tally.roles[i][role] / tally.total
+            player_probs['dead'] = death_probabilities[i]
+            probs.append(player_probs)
+        return tuple(probs)
+
+    def _death_probabilities(self, tally: Tally) -> List[float]:
+        return [1 if self.killed[i] == 1 else tally.deaths[i] / tally.total for i in range(self.player_count)]
+
+    @Game.started()
+    @Game.cached()
+    def death_probabilities(self) -> List[float]:
+        """Return the probability that each player has died, in order of Game.players."""
+        self.logger.debug("running death_probabilities()")
+        return self._death_probabilities(self._tally())
+
+    def _werewolf_pair_counts(self) -> List[List[int]]:
+        return self._tally(pairs=True).pairs
+
+    @Game.started()
+    @Game.cached(maxsize=128)
+    def other_lover(self, player: str) -> List[dict]:
+        """Return table of players and their probabilities to be the lover of a given player.
+
+        Arguments:
+            player: str -- name of player
+        """
+        self.logger.debug("running other_lover(%s)", player)
+        player_id = self._id(player)
+        tally = self._tally()
+        lover_count_list = [0] * self.player_count
+        for (lover1, lover2), count in tally.lovers.items():
+            if player_id == lover1:
+                lover_count_list[lover2] += count
+            elif player_id == lover2:
+                lover_count_list[lover1] += count
+        return [{'name': p, 'lover': lover_count_list[i] / tally.total} for i, p in enumerate(self.players)]
+
+    @Game.started()
+    @Game.cached()
+    def check_win(self) -> Tuple[bool, str]:
+        """Return wether any win condition is met and if so the faction that won."""
+        living = [i for i in range(self.player_count) if self.killed[i] == 0]
+        if not living:
+            self.logger.info('the game is a tie')
+            return True, None
+
+        tally = self._exact_tally()
+        werewolf_counts = [tally.roles[i]['werewolf'] for i in living]
+        if not any(werewolf_counts):
+            self.logger.info('The villagers win')
+            return True, 'villagers'
+        if all(count == tally.total for count in werewolf_counts):
+            self.logger.info('The werewolves win')
+            return True, 'werewolves'
+        lover_counts = [sum(count for lovers, count in tally.lovers.items() if i in lovers) for i in living]
+        if all(count == tally.total for count in lover_counts):
+            self.logger.info('The lovers win')
+            return True, 'lovers'
+        return False, None
+
+    # ROLE ACTIONS
+
+    @Game.started()
+    @Game.journaled
+    def seer(self, seer: str, target: str, target_role: str = None, project: bool = True) -> str:
+        """Perform the seer action for a players. Return target's role and record the observation.
+
+        Arguments:
+            seer: str -- name of playerperforming the seer action.
+            target: str -- name of target of the seer action
+        """
+        self.logger.debug("running seer(%s, %s, target_role=%s, project=%s)", seer, target, target_role, project)
+        seer_id = self._id(seer)
+        target_id = self._id(target)
+
+        assert self.killed[seer_id] != 1, "ERROR: in seer() seer {} is dead.".format(seer)
+        assert self.killed[target_id] != 1, "ERROR: in seer() target {} is dead.".format(target)
+
+        self.logger.info("%s is investigating %s ...", seer, target)
+        outcome = self._sample_role(target_id, seer_id=seer_id)
+
+        if outcome is not None:
+            # Choose an outcome
+            if target_role is None:
+                target_role = outcome
+
+            # Collapse the wave function
+            if project:
+                self.observations.setdefault(seer_id, []).append((target_id, target_role))
+                self.version += 1
+
+        self.logger.info("%s sees that %s is a %s!", seer, target, target_role)
+
+        return target_role
+
+    @Game.started()
+    @Game.journaled
+    def werewolf(self, werewolf, target):
+        """Perform werewolf action for a player. Mark the attack in Game.deaths.
+        Optionally forbids the acting player and the target to both be werewolves.
+
+        Arguments:
+            werewolf: str -- name of the player performing the werewolf action
+            target: str -- name of target of the werewolf action
+        """
+        self.logger.debug("running werewolf(%s, %s)", werewolf, target)
+        assert werewolf != target, "ERRROR: in werwwolf() werewolf == target."
+        werewolf_id = self._id(werewolf)
+        target_id = self._id(target)
+        assert self.killed[werewolf_id] != 1, "ERROR: in werewolf() werewolf {} is dead".format(werewolf)
+        assert self.killed[target_id] != 1, "ERROR: in werewolf() target {} is dead".format(target)
+        assert self.werewolf_count > 0, "ERROR: in werewolf() no werewolves are alive"
+
+        self.deaths[target_id][werewolf_id] = 1 / self.werewolf_count
+        self.version += 1
+
+        if self.werewolf_cannot_eat_werewolf:
+            self.forbidden_pairs.add((werewolf_id, target_id))
+
+    @Game.started()
+    @Game.journaled
+    def kill(self, target: str, target_role: str = None) -> str:
+        """Kill and identify a player. Return the player's role and record it.
+
+        Arguments:
+            target: str -- name of player to kill.
+            target_role: str -- role to reveal, a random possible role if None (default: None)
+        """
+        self.logger.debug("running kill(%s, target_role=%s)", target, target_role)
+        target_id = self._id(target)
+        assert self.killed[target_id] != 1, "ERROR:in kill() target {} is already dead.".format(target)
+
+        self.logger.info("%s was killed!", target)
+
+        # Chooses an outcome and collapse the wave function
+        if target_role is None:
+            target_role = self._sample_role(target_id)
+        else:
+            assert self._exact_tally().roles[target_id].get(target_role, 0), \
+                "ERROR: in kill() target {} can not be a {}.".format(target, target_role)
+        self.revealed[target_id] = target_role
+
+        self.logger.info("%s was a %s!", target, target_role)
+
+        if target_role == "werewolf":
+            self.werewolf_count -= 1
+            for i in range(self.player_count):
+                self.deaths[i][target_id] = 0
+
+        self.killed[target_id] = 1
+        self.version += 1
+
+        return target_role
+
+
+class CountingGame(ConstraintGame):
+    """Game computing exact probabilities by counting the game states, without enumerating them.
+
+    The roles other than werewolf and villager are placed explicitly. Given such a placement, the
+    players whose werewolf membership matters for a lover or for Game.forbidden_pairs are enumerated.
+    All remaining players are interchangeable, so the ways to place the remaining werewolves among
+    them are counted with binomial coefficients.
+    """
+
+    def _place_specials(self, assignment: list, index: int = 0) -> Iterator[list]:
+        """Yield every completion of an assignment that places the special roles (not werewolf or villager),
+        from the index-th on, on players without a role.
+        """
+        specials = [role for role in self.used_roles if role not in ('werewolf', 'villager')]
+        if index == len(specials):
+            yield assignment
+            return
+        role = specials[index]
+        candidates = [i for i in range(self.player_count) if assignment[i] is None]
+        for chosen in combinations(candidates, self.deck[role] - assignment.count(role)):
+            new_assignment = assignment.copy()
+            for i in chosen:
+                new_assignment[i] = role
+            yield from self._place_specials(new_assignment, index + 1)
+
+    def _observe(self, assignment: list) -> bool:
+        """Assign the werewolf and villager roles observed by the seers in an assignment.
+        Return whether the observations are consistent with the assignment.
+        """
+        consistent = True
+        for seer_id, seer_role in enumerate(assignment.copy()):
+            if seer_role != 'seer':
+                continue
+            for target_id, target_role in self.observations.get(seer_id, []):
+                if assignment[target_id] is None and target_role in ('werewolf', 'villager'):
+                    assignment[target_id] = target_role
+                elif assignment[target_id] != target_role:
+                    consistent = False
+        return consistent
+
+    def _constrained_players(self, assignment: list, lover_attackers: List[set]) -> Tuple[List[int], List[int]]:
+        """Return the players without a role whose werewolf membership matters for a constraint (a pair in
+        Game.forbidden_pairs, a lover or an attacker of a lover) and the other, free, players without a role.
+        """
+        constrained = set()
+        for pair in self.forbidden_pairs:
+            constrained.update(pair)
+        lovers = self._lovers(assignment)
+        if lovers is not None:
+            constrained.update(*(lover_attackers[lover] for lover in lovers))
+        constrained = [i for i in sorted(constrained) if assignment[i] is None]
+        free = [i for i in range(self.player_count) if assignment[i] is None and i not in constrained]
+        return constrained, free
+
+    def _forbidden(self, assignment: list, werewolves: set) -> bool:
+        """Return whether both players of a pair in Game.forbidden_pairs are werewolves, by the assignment or
+        by the set of werewolves.
+        """
+        return any((a in werewolves or assignment[a] == 'werewolf') and (b in werewolves or assignment[b] == 'werewolf')
+                   for a, b in self.forbidden_pairs)
+
+    def _werewolf_placements(self, assignment: list, constrained: List[int], free_count: int,
+                             werewolf_count: int) -> Iterator[Tuple[set, int, int]]:
+        """Yield every (werewolves, remaining, weight): a set of constrained players that are werewolves, the number
+        of werewolves left for the free players and the number of ways to place them.
+        """
+        for m in range(min(werewolf_count, len(constrained)) + 1):
+            if werewolf_count - m > free_count:
+                continue
+            weight = comb(free_count, werewolf_count - m)
+            for werewolves in combinations(constrained, m):
+                werewolves = set(werewolves)
+                if not self._forbidden(assignment, werewolves):
+                    yield werewolves, werewolf_count - m, weight
+
+    def _configurations(self, condition=None) -> Iterator[Tuple[list, set, list, int, int]]:
+        """Yield every (assignment, werewolves, free, werewolf_count, weight) consistent with the constraints.
+
+        The assignment holds the known role of each player or None. The set of werewolves holds the
+        enumerated werewolves that are not in the assignment. The remaining werewolf_count werewolves
+        are distributed over the free players in weight ways.
+
+        Arguments:
+            condition: tuple -- if given, only yield assignments of the special roles satisfying this constraint.
+        """
+        n = self.player_count
+        start = [None] * n
+        for player_id, role in self.revealed.items():
+            start[player_id] = role
+        if any(start.count(role) > count for role, count in self.deck.items()):
+            return
+        lover_attackers = [{i for i in range(n) if self.deaths[lover][i] > 0} | {lover} for lover in range(n)]
+
+        for assignment in self._place_specials(start):
+            if condition is not None and not self._satisfied(assignment, condition):
+                continue
+            # apply the observations of the seers in this assignment
+            consistent = self._observe(assignment)
+            werewolf_count = self.deck['werewolf'] - assignment.count('werewolf')
+            if not consistent or werewolf_count < 0 or assignment.count('villager') > self.deck.get('villager', 0):
+                continue
+
+            # enumerate the werewolf membership of the players in a constraint
+            constrained, free = self._constrained_players(assignment, lover_attackers)
+            for werewolves, remaining, weight in self._werewolf_placements(assignment, constrained, len(free),
+                                                                           werewolf_count):
+                yield assignment, werewolves, free, remaining, weight
+
+    def _tally(self, condition=None, pairs: bool = False) -> Tally:
+        """Return the number of game states per role, death, lover and optionally werewolf pair.
+
+        Arguments:
+            condition: tuple -- if given, only count assignments of the special roles satisfying this constraint.
+            pairs: bool -- if True, also count the game states in which each pair of players are both werewolves.
+        """
+        n = self.player_count
+        tally = Tally(self, pairs=pairs)
+        attackers = [[(i, attack) for i, attack in enumerate(self.deaths[t]) if attack > 0] for t in range(n)]
+
+        for assignment, werewolves, free, k, weight in self._configurations(condition):
+            ways = partial(_free_placements, len(free), k)
+            status = self._werewolf_status(assignment, werewolves, free)
+            lovers = self._lovers(assignment)
+
+            tally.total += weight
+            self._tally_roles(tally, assignment, status, weight, ways)
+            if lovers is not None:
+                tally.lovers[lovers] = tally.lovers.get(lovers, 0) + weight
+            self._tally_deaths(tally, status, lovers, attackers, weight, ways)
+            if pairs:
+                self._tally_pairs(tally, status, weight, ways)
+
+        return tally
+
+    @staticmethod
+    def _werewolf_status(assignment: list, werewolves: set, free: List[int]) -> list:
+        """Return for every player 1 or 0 if they are known to be a werewolf or not, or None if they are free."""
+        status = [None] * len(assignment)
+        for i, role in enumerate(assignment):
+            if role is not None:
+                status[i] = int(role == 'werewolf')
+            elif i in werewolves:
+                status[i] = 1
+            elif i not in free:
+                status[i] = 0
+        return status
+
+    @staticmethod
+    def _tally_roles(tally: Tally, assignment: list, status: list, weight: int, ways: Callable) -> None:
+        """Add the roles of the players in the game states of a configuration."""
+        free_werewolf = ways(1, 0)
+        free_villager = ways(0, 1)
+        for i, role in enumerate(assignment):
+            if status[i] is None:
+                tally.roles[i]['werewolf'] += free_werewolf
+                tally.roles[i]['villager'] += free_villager
+            elif role is not None:
+                tally.roles[i][role] += weight
+            else:
+                tally.roles[i]['werewolf' if status[i] else 'villager'] += weight
+
+    def _tally_deaths(self, tally: Tally, status: list, lovers: Tuple[int, int], attackers: List[list], weight: int,
+                      ways: Callable) -> None:
+        """Add the deaths by werewolf attacks in the game states of a configuration,
+        counted over the free werewolf placements.
+        """
+        free_werewolf = ways(1, 0)
+        free_villager = ways(0, 1)
+        for t in range(self.player_count):
+            if status[t] == 1 or (lovers is not None and t in lovers):
+                continue
+            for i, attack in attackers[t]:
+                if status[t] is None:
+                    count = free_villager * status[i] if status[i] is not None else ways(1, 1)
+                else:
+                    count = weight * status[i] if status[i] is not None else free_werewolf
+                tally.deaths[t] += attack * count
+
+        # the lovers and their attackers are known
+        if lovers is not None:
+            attacks = {}
+            for lover in lovers:
+                attacks[lover] = 0 if status[lover] else sum(attack * status[i] for i, attack in attackers[lover])
+            for lover, other in (lovers, lovers[::-1]):
+                other_attacks = 1 if self.killed[other] == 1 else attacks[other]
+                tally.deaths[lover] += weight * max(attacks[lover], other_attacks)
+
+    @staticmethod
+    def _tally_pairs(tally: Tally, status: list, weight: int, ways: Callable) -> None:
+        """Add the game states of a configuration in which each pair of players are both werewolves."""
+        free_werewolf = ways(1, 0)
+        for i, status_i in enumerate(status):
+            for j, status_j in enumerate(status):
+                if i == j:
+                    count = weight * status_i if status_i is not None else free_werewolf
+                elif status_i is not None and status_j is not None:
+                    count = weight * status_i * status_j
+                elif status_i is not None or status_j is not None:
+                    count = free_werewolf * (status_i if status_i is not None else status_j)
+                else:
+                    count = ways(2, 0)
+                tally.pairs[i][j] += count
+
+    def _sample_role(self, target_id: int, seer_id: int = None) -> str:
+        condition = None if seer_id is None else ('revealed', seer_id, 'seer')
+        counts = self._tally(condition).roles[target_id]
+        if not any(counts.values()):
+            return None
+        return self.rng.choices(list(counts), weights=list(counts.values()))[0]
+
+    @Game.started()
+    def valid_permutations(self) -> List[List[str]]:
+        """Return all possible game states. Enumerates them, so only use this for small games."""
+        p_list = []
+        for assignment, werewolves, free, k, weight in self._configurations():
+            for free_werewolves in combinations(free, k):
+                roles = set(werewolves) | set(free_werewolves)
+                p_list.append(tuple(role or ('werewolf' if i in roles else 'villager') for i, role in enumerate(assignment)))
+        return p_list
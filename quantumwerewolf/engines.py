@@ -0,0 +1,31 @@
+"""Lookup of the game engines by name."""
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.counting import CountingGame
+from quantumwerewolf.montecarlo import MonteCarloGame
+from quantumwerewolf.sharded import ShardedGame
+from quantumwerewolf.symmetric import SymmetricGame
+
+engine_names = ['game', 'numpy', 'mapped', 'counting', 'montecarlo', 'sharded', 'symmetric']
+
+
+def engine(name: str) -> type:
+    """Return the Game class of an engine. The numpy engines are only imported when asked for.
+
+    Arguments:
+        name: str -- one of engine_names
+    """
+    if name == 'numpy':
+        from quantumwerewolf.numpy_backend import NumpyGame
+        return NumpyGame
+    if name == 'mapped':
+        from quantumwerewolf.mapped import MappedGame
+        return MappedGame
+    engines = {
+        'game': Game,
+        'counting': CountingGame,
+        'montecarlo': MonteCarloGame,
+        'sharded': ShardedGame,
+        'symmetric': SymmetricGame,
+    }
+    return engines[name]
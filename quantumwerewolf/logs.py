@@ -0,0 +1,58 @@
+"""Logging setup that keeps writing log records off the game's hot paths."""
+
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+_listener = None
+_queue_handler = None
+# level and propagation of the quantumwerewolf logger before setup_logging()
+_saved_logger_state = None
+
+
+def setup_logging(level: int = logging.WARNING, filename: str = 'debug.log',
+                  fmt: str = '%(asctime)s %(levelname)s %(name)s: %(message)s') -> QueueListener:
+    """Send the log records of the quantumwerewolf package to a file from a background thread.
+    Records are put on a queue by the game and formatted and written by a QueueListener.
+    They do not propagate to the handlers of the root logger, which would handle them on the game's thread.
+    Calling it again replaces the previous setup. Return the started listener.
+
+    Arguments:
+        level: int -- minimum level of the records to log (default: logging.WARNING)
+        filename: str -- file to append the log to (default: 'debug.log')
+        fmt: str -- format of the log lines
+    """
+    global _listener, _queue_handler, _saved_logger_state
+    stop_logging()
+
+    queue = SimpleQueue()
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(logging.Formatter(fmt))
+    _listener = QueueListener(queue, file_handler, respect_handler_level=True)
+    _queue_handler = QueueHandler(queue)
+
+    logger = logging.getLogger('quantumwerewolf')
+    _saved_logger_state = logger.level, logger.propagate
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.addHandler(_queue_handler)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """Write all queued log records, remove the handler added by setup_logging() and restore the level and
+    propagation of the quantumwerewolf logger.
+    """
+    global _listener, _queue_handler, _saved_logger_state
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        logger = logging.getLogger('quantumwerewolf')
+        logger.removeHandler(_queue_handler)
+        level, logger.propagate = _saved_logger_state
+        logger.setLevel(level)
+    _listener = None
+    _queue_handler = None
+    _saved_logger_state = None
@@ -0,0 +1,185 @@
+"""Game engine keeping the superposition of game states in memory-mapped files, for games larger than the memory.
+
+Requires the optional numpy dependency (pip install quantumwerewolf[numpy]).
+"""
+
+import os
+from tempfile import mkstemp
+from typing import Iterator
+
+import numpy as np
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.combinatorics import multiset_permutations
+from quantumwerewolf.numpy_backend import NumpyGame
+
+# private directory of the states files shared by the games of a user
+default_directory = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                                 'quantumwerewolf', 'states')
+
+
+class MappedGame(NumpyGame):
+    """Game keeping Game.states and a validity bitmap in files mapped into memory, processed in blocks.
+
+    All permutations of a deck are the same for every game, so games with the same deck share one
+    read-only states file in Game.directory, and with it the page cache of the operating system.
+    The validity bitmap and the states of a subset are private to the game, and removed once no longer
+    mapped by the game or one of its snapshots, and by Game.stop().
+    """
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        # directory of the shared states files, default_directory if None, and of the private files,
+        # the temporary directory if None
+        self.directory = None
+        self.chunk_size = 1 << 16
+        self.valid_bits = None
+        self.private_files = []
+
+    @property
+    def chunk_size(self) -> int:
+        """Rows per block, a multiple of 8 so that every block starts at a byte of Game.valid_bits."""
+        return self._chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, chunk_size: int) -> None:
+        assert chunk_size > 0 and chunk_size % 8 == 0, \
+            "ERROR: chunk_size must be a positive multiple of 8, not {}.".format(chunk_size)
+        self._chunk_size = chunk_size
+
+    # GAMESTATE
+
+    def _path(self, name: str) -> str:
+        """Return the path of a shared states file, creating its directory only accessible by the user if needed."""
+        directory = self.directory or default_directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        return os.path.join(directory, name)
+
+    @staticmethod
+    def _trusted(path: str, size: int) -> bool:
+        """Return whether a shared states file exists, has the expected size and, where the operating system has
+        owners, is owned by the user and can only be written by them.
+        """
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if not hasattr(os, 'getuid'):
+            return status.st_size == size
+        return status.st_size == size and status.st_uid == os.getuid() and not status.st_mode & 0o022
+
+    def _private_file(self, kind: str) -> str:
+        """Return the path of a new private file of the game.
+
+        Arguments:
+            kind: str -- what the file is used for, part of its name.
+        """
+        handle, path = mkstemp(prefix=f'quantumwerewolf-{kind}-', suffix='.bin', dir=self.directory)
+        os.close(handle)
+        self.private_files.append(path)
+        return path
+
+    def _allocate(self, rows: int) -> None:
+        self.states = np.memmap(self._private_file('states'), dtype=np.int8, mode='w+', shape=(rows, self.player_count))
+        self._allocate_valid(rows)
+
+    def _allocate_valid(self, rows: int) -> None:
+        self.valid_bits = np.memmap(self._private_file('valid'), dtype=np.uint8, mode='w+', shape=((rows + 7) // 8,))
+        self.valid_bits[:] = 0xFF
+
+    def _remove_private_files(self) -> None:
+        # files can only be removed once unmapped on every operating system
+        self.states = self.valid_bits = None
+        self.snapshots = []
+        self._remove_unmapped_files()
+
+    def _remove_unmapped_files(self) -> None:
+        """Remove the private files that are mapped by neither Game.states, Game.valid_bits nor a snapshot."""
+        stores = [self.states, self.valid_bits] + [snapshot['store'][0] for _, snapshot in getattr(self, 'snapshots', [])]
+        mapped = {os.path.abspath(store.filename) for store in stores if getattr(store, 'filename', None)}
+        for path in [path for path in self.private_files if os.path.abspath(path) not in mapped]:
+            os.remove(path)
+            self.private_files.remove(path)
+
+    def _compact(self) -> None:
+        if 2 * self.valid_count > self._permutation_count():
+            return
+        self.logger.debug('compacting %s permutations to %s', self._permutation_count(), self.valid_count)
+        states = np.memmap(self._private_file('states'), dtype=np.int8, mode='w+',
+                           shape=(self.valid_count, self.player_count))
+        start = 0
+        for valid_states in self._valid_chunks():
+            states[start:start + len(valid_states)] = valid_states
+            start += len(valid_states)
+        self.states = states
+        self.valid_bits = None
+        self._allocate_valid(self.valid_count)
+        self._remove_unmapped_files()
+
+    def _store_snapshot(self):
+        # the private files of Game.states are kept while a snapshot maps them
+        return self.states, np.array(self.valid_bits)
+
+    def _restore_store(self, snapshot) -> None:
+        self.states, valid_bits = snapshot
+        self._load_valid(valid_bits, len(self.states))
+        self._count_roles()
+
+    def _valid_bits(self):
+        return self.valid_bits
+
+    def _load_valid(self, valid_bits, rows: int) -> None:
+        # the bitmap file is reused if it has the size of the rows
+        if self.valid_bits is None or len(self.valid_bits) != (rows + 7) // 8:
+            self.valid_bits = None
+            self._allocate_valid(rows)
+        self.valid_bits[:] = valid_bits
+        self._remove_unmapped_files()
+
+    def _chunks(self) -> Iterator[tuple]:
+        for start in range(0, len(self.states), self.chunk_size):
+            stop = min(start + self.chunk_size, len(self.states))
+            valid = np.unpackbits(self.valid_bits[start // 8:(stop + 7) // 8], count=stop - start).astype(bool)
+            yield slice(start, stop), self.states[start:stop], valid
+
+    def _store_valid(self, rows: slice, valid) -> None:
+        self.valid_bits[rows.start // 8:(rows.stop + 7) // 8] = np.packbits(valid)
+
+    def generate_all_permutations(self):
+        self.logger.info('Generating all role permutations')
+        rows = self._max_permutations()
+        deck_name = '-'.join(f'{role}{count}' for role, count in self.deck.items() if count > 0)
+        path = self._path(f'quantumwerewolf-states-{deck_name}.bin')
+        self._remove_private_files()
+
+        if self._trusted(path, rows * self.player_count):
+            self.logger.info('Mapping all role permutations from %s', path)
+            self.states = np.memmap(path, dtype=np.int8, mode='r', shape=(rows, self.player_count))
+            self._allocate_valid(rows)
+            self._count_roles()
+            return
+
+        self.logger.info('Writing all role permutations to %s', path)
+        self._allocate(rows)
+        self._fill(multiset_permutations(self._role_codes()))
+        self.states.flush()
+        private_path = self.private_files[0]
+        self.states = None
+        try:
+            # publish the complete file at once for other games
+            os.replace(private_path, path)
+            self.private_files.remove(private_path)
+        except OSError:
+            self.logger.warning('Cannot replace %s, keeping the role permutations private', path)
+            path = private_path
+        self.states = np.memmap(path, dtype=np.int8, mode='r', shape=(rows, self.player_count))
+
+    def generate_subset_permutations(self):
+        self._remove_private_files()
+        super().generate_subset_permutations()
+
+    @Game.started()
+    def stop(self) -> None:
+        """Stop the game and remove its private files, dropping its snapshots."""
+        self._remove_private_files()
+        return super().stop()
@@ -0,0 +1,220 @@
+"""Game engine estimating the probabilities from random game states consistent with the constraints."""
+
+from math import sqrt
+from time import perf_counter
+from typing import Dict, Iterator, List, Tuple
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.counting import CountingGame, Tally
+
+
+class SampleTally(Tally):
+    """Tally of sampled game states, which also keeps the squared deaths for the standard errors."""
+
+    def __init__(self, game: Game, pairs: bool = False):
+        super().__init__(game, pairs=pairs)
+        self.death_squares = [0.0] * game.player_count
+
+
+class MonteCarloGame(CountingGame):
+    """Game estimating probabilities by sampling game states with a Markov chain, using constant memory.
+
+    The chain swaps the roles of two players whenever the result is consistent with the recorded
+    constraints, which samples the consistent game states uniformly. Consecutive samples are
+    Game.thinning swaps apart and are treated as independent for the standard errors.
+    A role that is possible in few game states may not be sampled, so the end of the game is decided
+    from the exact counts of CountingGame.
+    """
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        # sampling budget
+        self.sample_count = 2000
+        self.time_budget = None
+        self.thinning = None
+
+    # GAMESTATE
+
+    def _init_constraints(self) -> None:
+        super()._init_constraints()
+        self.state = [role for role, count in self.deck.items() for _ in range(count)]
+        self.rng.shuffle(self.state)
+
+    def _state_count(self) -> int:
+        return self.sample_count
+
+    def _dump_store(self) -> Tuple[dict, Dict[str, bytes]]:
+        header, sections = super()._dump_store()
+        header['state'] = self.state
+        return header, sections
+
+    def _load_store(self, header: dict, sections: Dict[str, memoryview]) -> None:
+        super()._load_store(header, sections)
+        self.state = header['state']
+
+    def _repair(self, state: List[str], constraints: List[tuple]) -> List[str]:
+        """Return a copy of state satisfying all constraints, or None if none was found within the budget.
+
+        Arguments:
+            state: List[str] -- permutation to start from.
+            constraints: List[tuple] -- constraints from ConstraintGame._constraints() to satisfy.
+        """
+        state = list(state)
+        violations = sum(not self._satisfied(state, c) for c in constraints)
+        steps = 0
+        while violations:
+            steps += 1
+            if steps > self.sample_count * self.player_count:
+                return None
+            i, j = self.rng.sample(range(self.player_count), 2)
+            if state[i] == state[j]:
+                continue
+            state[i], state[j] = state[j], state[i]
+            new_violations = sum(not self._satisfied(state, c) for c in constraints)
+            if new_violations <= violations:
+                violations = new_violations
+            else:
+                state[i], state[j] = state[j], state[i]
+        return state
+
+    def _chain(self, condition: tuple = None) -> Iterator[List[str]]:
+        """Yield game states of a Markov chain over the permutations consistent with the constraints.
+
+        Arguments:
+            condition: tuple -- if given, an extra constraint the game states must satisfy.
+        """
+        constraints = self._constraints()
+        start = self.state
+        if condition is not None:
+            _, player_id, role = condition
+            if self.deck.get(role, 0) == 0 or self.revealed.get(player_id, role) != role:
+                return
+            # start from the current state with the role moved to the player
+            start = list(self.state)
+            other_id = start.index(role)
+            start[player_id], start[other_id] = start[other_id], start[player_id]
+            constraints.append(condition)
+
+        state = self._repair(start, constraints)
+        if state is None:
+            if condition is None:
+                raise RuntimeError('No game state consistent with the constraints found')
+            return
+        if condition is None:
+            self.state = state
+
+        # constraints involving each player, a swap can only violate these
+        index = [[] for _ in range(self.player_count)]
+        for constraint in constraints:
+            for player_id in constraint[1:]:
+                if isinstance(player_id, int):
+                    index[player_id].append(constraint)
+        movable = [i for i in range(self.player_count) if not any(c[0] == 'revealed' for c in index[i])]
+
+        steps = self.thinning or self.player_count
+        while True:
+            for _ in range(steps if len(movable) > 1 else 0):
+                i, j = self.rng.sample(movable, 2)
+                if state[i] == state[j]:
+                    continue
+                state[i], state[j] = state[j], state[i]
+                if not all(self._satisfied(state, c) for c in index[i] + index[j]):
+                    state[i], state[j] = state[j], state[i]
+            yield state
+
+    def _samples(self, condition: tuple = None) -> Iterator[List[str]]:
+        """Yield Game.sample_count sampled game states, or fewer if Game.time_budget seconds have passed.
+
+        Arguments:
+            condition: tuple -- if given, an extra constraint the game states must satisfy.
+        """
+        start_time = perf_counter()
+        for count, state in enumerate(self._chain(condition), start=1):
+            yield state
+            if count >= self.sample_count:
+                return
+            if self.time_budget is not None and perf_counter() - start_time > self.time_budget:
+                self.logger.info('Time budget exceeded after %s samples', count)
+                return
+
+    def _tally(self, condition=None, pairs: bool = False) -> SampleTally:
+        n = self.player_count
+        tally = SampleTally(self, pairs=pairs)
+        for state in self._samples(condition):
+            tally.total += 1
+            for i, role in enumerate(state):
+                tally.roles[i][role] += 1
+            for i, attacks in enumerate(self._death_attacks(state)):
+                tally.deaths[i] += attacks
+                tally.death_squares[i] += attacks * attacks
+            lovers = self._lovers(state)
+            if lovers is not None:
+                tally.lovers[lovers] = tally.lovers.get(lovers, 0) + 1
+            if pairs:
+                werewolves = [i for i in range(n) if state[i] == 'werewolf']
+                for i in werewolves:
+                    for j in werewolves:
+                        tally.pairs[i][j] += 1
+        return tally
+
+    def _sample_role(self, target_id: int, seer_id: int = None) -> str:
+        condition = None if seer_id is None else ('revealed', seer_id, 'seer')
+        for state in self._chain(condition):
+            return state[target_id]
+        return None
+
+    def _exact_tally(self) -> Tally:
+        return CountingGame._tally(self)
+
+    # GAME INFO METHODS
+
+    @Game.started()
+    def valid_permutations(self) -> List[List[str]]:
+        """Return the distinct sampled game states."""
+        return list(dict.fromkeys(tuple(state) for state in self._samples()))
+
+    def _death_errors(self, tally: SampleTally) -> List[float]:
+        errors = []
+        for i in range(self.player_count):
+            mean = tally.deaths[i] / tally.total
+            variance = max(tally.death_squares[i] / tally.total - mean * mean, 0)
+            errors.append(0 if self.killed[i] == 1 else sqrt(variance / tally.total))
+        return errors
+
+    @Game.started()
+    @Game.cached()
+    def role_probabilities(self) -> Tuple[dict, ...]:
+        """Return table of estimated probability per role per player.
+        The standard error of every estimate is stored under the 'error' key of each player.
+        """
+        self.logger.debug("running role_probabilities()")
+        tally = self._tally()
+        death_probabilities = self._death_probabilities(tally)
+        death_errors = self._death_errors(tally)
+        probs = []
+        for i, p in enumerate(self.players):
+            player_probs = {'name': p}
+            errors = {}
+            for role in self.used_roles:
+                P_role = tally.roles[i][role] / tally.total
+                player_probs[role] = P_role
+                errors[role] = sqrt(P_role * (1 - P_role) / tally.total)
+            player_probs['dead'] = death_probabilities[i]
+            errors['dead'] = death_errors[i]
+            player_probs['error'] = errors
+            probs.append(player_probs)
+        return tuple(probs)
+
+    @Game.started()
+    @Game.cached()
+    def death_probabilities(self) -> List[float]:
+        """Return the estimated probability that each player has died, in order of Game.players."""
+        self.logger.debug("running death_probabilities()")
+        return self._death_probabilities(self._tally())
+
+    @Game.started()
+    @Game.cached()
+    def death_errors(self) -> List[float]:
+        """Return the standard error of the estimated probability that each player has died, in order of Game.players."""
+        self.logger.debug("running death_errors()")
+        return self._death_errors(self._tally())
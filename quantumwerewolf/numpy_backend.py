@@ -0,0 +1,393 @@
+"""Game engine storing the superposition of game states as a NumPy matrix.
+
+Requires the optional numpy dependency (pip install quantumwerewolf[numpy]).
+"""
+
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.combinatorics import multiset_permutations, multiset_unrank
+
+
+class NumpyGame(Game):
+    """Game keeping its permutations as an int8 matrix with a boolean validity mask.
+
+    Every row of Game.states is a permutation and every column a player.
+    Roles are stored as their index in Game.used_roles.
+    """
+
+    # GAMESTATE
+
+    def _code(self, role: str) -> int:
+        """Return the code of a role in Game.states, or -1 if the role is not in the game.
+
+        Arguments:
+            role: str -- name of the role
+        """
+        if role in self.used_roles:
+            return self.used_roles.index(role)
+        return -1
+
+    def _role_codes(self) -> List[int]:
+        return [self._code(role) for role, count in self.deck.items() for _ in range(count)]
+
+    def _allocate(self, rows: int) -> None:
+        """Create Game.states with a number of rows, all valid, for Game._fill() to fill in.
+
+        Arguments:
+            rows: int -- number of permutations to store.
+        """
+        self.states = np.empty((rows, self.player_count), dtype=np.int8)
+        self.valid = np.ones(rows, dtype=bool)
+
+    def _fill(self, permutations: Iterator[Tuple[int, ...]]) -> None:
+        """Write permutations of role codes into the allocated rows and count the roles.
+
+        Arguments:
+            permutations: Iterator[Tuple[int, ...]] -- a permutation for every row of Game.states.
+        """
+        for _, states, _ in self._chunks():
+            states[:] = np.array(list(islice(permutations, len(states))), dtype=np.int8).reshape(states.shape)
+        self._count_roles()
+
+    def _chunks(self) -> Iterator[tuple]:
+        """Yield (rows, states, valid) blocks covering Game.states: a slice of rows, their role codes and validity.
+        Changes to the validity are only stored by Game._store_valid().
+        """
+        yield slice(0, len(self.states)), self.states, self.valid
+
+    def _store_valid(self, rows: slice, valid) -> None:
+        """Store the validity of a block of rows from Game._chunks()."""
+        self.valid[rows] = valid
+
+    def _valid_chunks(self) -> Iterator:
+        """Yield the valid rows of Game.states in blocks."""
+        for _, states, valid in self._chunks():
+            yield states[valid]
+
+    def _bincount(self, states):
+        """Return matrix of the number of rows of states with each role code (rows) per player (columns)."""
+        n_roles = len(self.used_roles)
+        offsets = np.arange(self.player_count) * n_roles
+        counts = np.bincount((states + offsets).ravel(), minlength=n_roles * self.player_count)
+        return counts.reshape(self.player_count, n_roles).T
+
+    def _count_roles(self) -> None:
+        """Count the valid rows in total (Game.valid_count) and per role per player (Game.code_counts)."""
+        self.valid_count = 0
+        self.code_counts = np.zeros((len(self.used_roles), self.player_count), dtype=np.int64)
+        for states in self._valid_chunks():
+            self.valid_count += len(states)
+            self.code_counts += self._bincount(states)
+
+    def _store_snapshot(self):
+        # rows of Game.states are never changed once filled in, so the array is shared
+        return self.states, np.packbits(self.valid)
+
+    def _restore_store(self, snapshot) -> None:
+        self.states, valid_bits = snapshot
+        self.valid = np.unpackbits(valid_bits, count=len(self.states)).astype(bool)
+        self._count_roles()
+
+    def _dump_store(self) -> Tuple[dict, Dict[str, bytes]]:
+        return {'rows': len(self.states)}, {'codes': self.states.tobytes(), 'valid': self._valid_bits().tobytes()}
+
+    def _valid_bits(self):
+        """Return the validity of the rows of Game.states packed into bits."""
+        return np.packbits(self.valid)
+
+    def _load_store(self, header: dict, sections: Dict[str, memoryview]) -> None:
+        # Game.states is never written to, so it can stay in the buffer of the dump
+        self.states = np.frombuffer(sections['codes'], dtype=np.int8).reshape(header['rows'], self.player_count)
+        self._load_valid(np.frombuffer(sections['valid'], dtype=np.uint8), header['rows'])
+        self._count_roles()
+
+    def _load_valid(self, valid_bits, rows: int) -> None:
+        """Set the validity of the rows of Game.states from bits packed by Game._valid_bits()."""
+        self.valid = np.unpackbits(valid_bits, count=rows).astype(bool)
+
+    def _invalidate(self, condition: Callable) -> None:
+        """Mark the rows for which a condition holds as no longer possible and remove them from the role counts.
+
+        Arguments:
+            condition: Callable -- function returning a boolean mask for a block of rows of Game.states.
+        """
+        for rows, states, valid in self._chunks():
+            removed = condition(states) & valid
+            if removed.any():
+                self._store_valid(rows, valid & ~removed)
+                self.valid_count -= int(removed.sum())
+                self.code_counts -= self._bincount(states[removed])
+
+    def _compact(self) -> None:
+        if 2 * self.valid_count <= self._permutation_count():
+            self.logger.debug('compacting %s permutations to %s', self._permutation_count(), self.valid_count)
+            self.states = self.states[self.valid]
+            self.valid = np.ones(len(self.states), dtype=bool)
+
+    def _choose(self, condition: Callable = None):
+        """Return a random valid row of Game.states for which a condition holds, or None if there is none.
+
+        Arguments:
+            condition: Callable -- function returning a boolean mask for a block of rows of Game.states (default: None)
+        """
+        def matches(states, valid):
+            return valid if condition is None else valid & condition(states)
+
+        counts = [int(matches(states, valid).sum()) for _, states, valid in self._chunks()]
+        if not sum(counts):
+            return None
+        index = self.rng.randrange(sum(counts))
+        for (_, states, valid), count in zip(self._chunks(), counts):
+            if index < count:
+                return states[np.flatnonzero(matches(states, valid))[index]]
+            index -= count
+
+    def generate_all_permutations(self):
+        self.logger.info('Generating all role permutations')
+        self._allocate(self._max_permutations())
+        self._fill(multiset_permutations(self._role_codes()))
+
+    def generate_subset_permutations(self):
+        self.logger.info('Generating subset of role permutations')
+        roles = self._role_codes()
+        ranks = self.rng.sample(range(self._max_permutations()), self._subset_size())
+        self._allocate(len(ranks))
+        self._fill(multiset_unrank(rank, roles) for rank in ranks)
+
+    def _permutation_count(self) -> int:
+        return len(self.states)
+
+    def _partners(self):
+        """Return array where entry [c, i] is the lover of player i if player c is cupid, or -1."""
+        n = self.player_count
+        partners = np.full((n, n), -1, dtype=np.intp)
+        for cupid_id, (lover1, lover2) in self.lovers_list.items():
+            partners[cupid_id, lover1] = lover2
+            partners[cupid_id, lover2] = lover1
+        return partners
+
+    def _cupids(self, states):
+        """Return the index of the cupid in each row of states, or None if cupid is not in the game."""
+        cupid_code = self._code('cupid')
+        if cupid_code < 0 or not self.lovers_list:
+            return None
+        return np.argmax(states == cupid_code, axis=1)
+
+    def _werewolf_attacks(self, states):
+        """Return matrix of the total werewolf attacks on every player (columns) in every row of states."""
+        werewolves = states == self._code('werewolf')
+        deaths = np.array(self.deaths, dtype=float)
+        return (werewolves @ deaths.T) * ~werewolves
+
+    # GAME INFO METHODS
+
+    @Game.started()
+    def valid_permutations(self) -> List[List[str]]:
+        """Return all possible game states."""
+        return [tuple(self.used_roles[code] for code in row) for states in self._valid_chunks() for row in states]
+
+    @Game.started()
+    @Game.cached()
+    def role_probabilities(self) -> Tuple[dict, ...]:
+        """Return table of probability per role per player."""
+        self.logger.debug("running role_probabilities()")
+        role_probs = self.code_counts / self.valid_count
+        death_probabilities = self.death_probabilities()
+        probs = []
+        for i, p in enumerate(self.players):
+            player_probs = {'name': p}
+            for code, role in enumerate(self.used_roles):
+                player_probs[role] = float(role_probs[code, i])
+            player_probs['dead'] = death_probabilities[i]
+            probs.append(player_probs)
+        return tuple(probs)
+
+    @Game.started()
+    @Game.cached()
+    def death_probabilities(self) -> List[float]:
+        """Return the probability that each player has died, in order of Game.players."""
+        self.logger.debug("running death_probabilities()")
+        killed = np.array(self.killed, dtype=bool)
+        partners = self._partners()
+        total_attacks = np.zeros(self.player_count)
+        for states in self._valid_chunks():
+            attacks = self._werewolf_attacks(states)
+
+            # lovers die with their lover, also when killed by other means
+            cupids = self._cupids(states)
+            if cupids is not None:
+                lovers = partners[cupids]
+                has_lover = lovers >= 0
+                rows, players = np.nonzero(has_lover)
+                lover_attacks = np.zeros_like(attacks)
+                lover_attacks[rows, players] = attacks[rows, lovers[rows, players]]
+                lover_attacks[has_lover & killed[lovers]] = 1
+                attacks = np.maximum(attacks, lover_attacks)
+
+            total_attacks += attacks.sum(axis=0)
+
+        P_dead = total_attacks / self.valid_count
+        P_dead[killed] = 1
+        return [float(p) for p in P_dead]
+
+    def _werewolf_pair_counts(self):
+        counts = np.zeros((self.player_count, self.player_count), dtype=np.int64)
+        for states in self._valid_chunks():
+            werewolves = (states == self._code('werewolf')).astype(np.int64)
+            counts += werewolves.T @ werewolves
+        return counts
+
+    @Game.started()
+    @Game.cached(maxsize=128)
+    def other_lover(self, player: str) -> List[dict]:
+        """Return table of players and their probabilities to be the lover of a given player.
+
+        Arguments:
+            player: str -- name of player
+        """
+        self.logger.debug("running other_lover(%s)", player)
+        partners = self._partners()
+        lover_count_list = np.zeros(self.player_count)
+        for states in self._valid_chunks():
+            cupids = self._cupids(states)
+            if cupids is not None:
+                lovers = partners[cupids, self._id(player)]
+                lover_count_list += np.bincount(lovers[lovers >= 0], minlength=self.player_count)
+
+        P_lover = lover_count_list / self.valid_count
+        return [{'name': p, 'lover': float(P_lover[i])} for i, p in enumerate(self.players)]
+
+    @Game.started()
+    @Game.cached()
+    def check_win(self) -> Tuple[bool, str]:
+        """Return wether any win condition is met and if so the faction that won."""
+        living = np.flatnonzero(np.array(self.killed) == 0)
+        if not len(living):
+            self.logger.info('the game is a tie')
+            return True, None
+
+        any_werewolf = False
+        all_werewolves = True
+        all_lovers = self._code('cupid') >= 0 and bool(self.lovers_list)
+        partners = self._partners()
+        for states in self._valid_chunks():
+            werewolves = states[:, living] == self._code('werewolf')
+            any_werewolf = any_werewolf or werewolves.any()
+            all_werewolves = all_werewolves and werewolves.all()
+            all_lovers = all_lovers and (partners[self._cupids(states)][:, living] >= 0).all()
+
+        if not any_werewolf:
+            self.logger.info('The villagers win')
+            return True, 'villagers'
+        if all_werewolves:
+            self.logger.info('The werewolves win')
+            return True, 'werewolves'
+        if all_lovers:
+            self.logger.info('The lovers win')
+            return True, 'lovers'
+        return False, None
+
+    # ROLE ACTIONS
+
+    @Game.started()
+    @Game.journaled
+    def seer(self, seer: str, target: str, target_role: str = None, project: bool = True) -> str:
+        """Perform the seer action for a players. Return target's role and collapse game state..
+
+        Arguments:
+            seer: str -- name of playerperforming the seer action.
+            target: str -- name of target of the seer action
+        """
+        self.logger.debug("running seer(%s, %s, target_role=%s, project=%s)", seer, target, target_role, project)
+        seer_id = self._id(seer)
+        target_id = self._id(target)
+
+        assert self.killed[seer_id] != 1, "ERROR: in seer() seer {} is dead.".format(seer)
+        assert self.killed[target_id] != 1, "ERROR: in seer() target {} is dead.".format(target)
+
+        self.logger.info("%s is investigating %s ...", seer, target)
+        seer_code = self._code('seer')
+
+        if seer_code >= 0 and self.code_counts[seer_code, seer_id] > 0:
+            # Choose an outcome
+            if target_role is None:
+                row = self._choose(lambda states: states[:, seer_id] == seer_code)
+                target_role = self.used_roles[row[target_id]]
+
+            # Collapse the wave function
+            if project:
+                target_code = self._code(target_role)
+                self._invalidate(lambda states: (states[:, seer_id] == seer_code) & (states[:, target_id] != target_code))
+                self.version += 1
+
+        self.logger.info("%s sees that %s is a %s!", seer, target, target_role)
+
+        return target_role
+
+    @Game.started()
+    @Game.journaled
+    def werewolf(self, werewolf, target):
+        """Perform werewolf action for a player. Mark the attack in Game.deaths.
+        Optionally collapses the game to exclude werewolves targeting werewolves.
+
+        Arguments:
+            werewolf: str -- name of the player performing the werewolf action
+            target: str -- name of target of the werewolf action
+        """
+        self.logger.debug("running werewolf(%s, %s)", werewolf, target)
+        assert werewolf != target, "ERRROR: in werwwolf() werewolf == target."
+        werewolf_id = self._id(werewolf)
+        target_id = self._id(target)
+        assert self.killed[werewolf_id] != 1, "ERROR: in werewolf() werewolf {} is dead".format(werewolf)
+        assert self.killed[target_id] != 1, "ERROR: in werewolf() target {} is dead".format(target)
+        assert self.werewolf_count > 0, "ERROR: in werewolf() no werewolves are alive"
+
+        self.deaths[target_id][werewolf_id] = 1 / self.werewolf_count
+        self.version += 1
+
+        if self.werewolf_cannot_eat_werewolf:
+            werewolf_code = self._code('werewolf')
+            self._invalidate(lambda states: (states[:, werewolf_id] == werewolf_code)
+                             & (states[:, target_id] == werewolf_code))
+
+    @Game.started()
+    @Game.journaled
+    def kill(self, target: str, target_role: str = None) -> str:
+        """Kill and identify a player. Return the player's role and collapses the game state.
+
+        Arguments:
+            target: str -- name of player to kill.
+            target_role: str -- role to reveal, a random possible role if None (default: None)
+        """
+        self.logger.debug("running kill(%s, target_role=%s)", target, target_role)
+        target_id = self._id(target)
+        assert self.killed[target_id] != 1, "ERROR:in kill() target {} is already dead.".format(target)
+
+        self.logger.info("%s was killed!", target)
+
+        # Chooses an outcome
+        if target_role is None:
+            target_role = self.used_roles[self._choose()[target_id]]
+        target_code = self._code(target_role)
+        assert target_code >= 0 and self.code_counts[target_code, target_id] > 0, \
+            "ERROR: in kill() target {} can not be a {}.".format(target, target_role)
+
+        # Collapse the wave function
+        self._invalidate(lambda states: states[:, target_id] != target_code)
+        self._compact()
+
+        self.logger.info("%s was a %s!", target, target_role)
+
+        if target_role == "werewolf":
+            self.werewolf_count -= 1
+            for i in range(self.player_count):
+                self.deaths[i][target_id] = 0
+
+        self.killed[target_id] = 1
+        self.version += 1
+
+        return target_role
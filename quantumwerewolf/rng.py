@@ -0,0 +1,54 @@
+"""Random number generators of the games."""
+
+import random
+from typing import Union
+
+
+class GeneratorRandom(random.Random):
+    """random.Random drawing all its numbers from a NumPy Generator, so that every method of random.Random
+    (choice, sample, shuffle, randrange, ...) advances the Generator.
+    """
+
+    def __init__(self, generator):
+        """Create a random.Random from a Generator.
+
+        Arguments:
+            generator: numpy.random.Generator -- source of the random numbers.
+        """
+        self.generator = generator
+        super().__init__()
+
+    def seed(self, *args, **kwargs) -> None:
+        # the state is kept by the Generator
+        pass
+
+    def random(self) -> float:
+        return float(self.generator.random())
+
+    def getrandbits(self, k: int) -> int:
+        if k == 0:
+            return 0
+        value = int.from_bytes(self.generator.bytes((k + 7) // 8), 'little')
+        return value >> (-k % 8)
+
+    def getstate(self):
+        return self.generator.bit_generator.state
+
+    def setstate(self, state) -> None:
+        self.generator.bit_generator.state = state
+
+
+def make_rng(rng: Union[int, random.Random, object] = None) -> random.Random:
+    """Return a random.Random from a seed, a random.Random or a NumPy Generator.
+
+    Arguments:
+        rng: Union[int, random.Random, numpy.random.Generator] -- seed, or generator to draw from.
+            A new generator seeded from the operating system if None. (default: None)
+    """
+    if isinstance(rng, random.Random):
+        return rng
+    if rng is None or isinstance(rng, (int, str, bytes)):
+        return random.Random(rng)
+    if hasattr(rng, 'bit_generator'):
+        return GeneratorRandom(rng)
+    raise TypeError(f'ERROR: can not draw random numbers from {rng!r}')
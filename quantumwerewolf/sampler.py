@@ -0,0 +1,69 @@
+"""Random sampling of indices in proportion to weights that change over time."""
+
+import random
+from typing import Sequence
+
+
+class FenwickSampler:
+    """Sampler of indices in proportion to integer weights, using a Fenwick tree of the prefix sums.
+
+    Drawing an index and changing a weight both take O(log n) time.
+    """
+
+    def __init__(self, weights: Sequence[int], rng: random.Random = None):
+        """Create the sampler in O(n) time.
+
+        Arguments:
+            weights: Sequence[int] -- non-negative weight of every index.
+            rng: random.Random -- source of the random draws, the random module if None (default: None)
+        """
+        self.rng = random if rng is None else rng
+        self.weights = [int(weight) for weight in weights]
+        self.tree = [0] + self.weights
+        n = len(self.weights)
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+        # largest power of two not above n, the first step of the search
+        self.step = 1 << n.bit_length() - 1 if n else 0
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def update(self, index: int, weight: int) -> None:
+        """Set the weight of an index.
+
+        Arguments:
+            index: int -- index to change.
+            weight: int -- new non-negative weight.
+        """
+        weight = int(weight)
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        self.total += delta
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, value: int) -> int:
+        """Return the index at which the running sum of the weights first exceeds a value.
+
+        Arguments:
+            value: int -- value in range(FenwickSampler.total)
+        """
+        position = 0
+        step = self.step
+        while step:
+            if position + step < len(self.tree) and self.tree[position + step] <= value:
+                position += step
+                value -= self.tree[position]
+            step >>= 1
+        return position
+
+    def sample(self) -> int:
+        """Return a random index with probability proportional to its weight."""
+        assert self.total > 0, 'ERROR: in sample() all weights are zero.'
+        return self.find(self.rng.randrange(self.total))
@@ -0,0 +1,278 @@
+"""Asyncio server hosting many games at once behind a local JSON API."""
+
+import asyncio
+import json
+import logging
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf import engines
+from quantumwerewolf.logs import setup_logging, stop_logging
+
+logger = logging.getLogger(__name__)
+
+# game methods that change the game state
+actions = ['cupid', 'seer', 'werewolf', 'kill', 'process_night', 'resolve_deaths', 'rewind']
+
+# game methods that only read the game state
+queries = ['role_probabilities', 'death_probabilities', 'werewolf_cooccurrence', 'other_werewolves', 'other_lover',
+           'check_deaths', 'check_win', 'living_players']
+
+
+class GameServer:
+    """Server hosting games that clients on the same machine play through a JSON protocol.
+
+    Every request is a single line holding a JSON object {"id": ..., "method": ..., "params": {...}}, answered by a
+    single line {"id": ..., "result": ...} or {"id": ..., "error": "..."}. Requests on one connection are handled
+    concurrently, so the answers may arrive out of order. The methods are:
+
+        create(engine='game', start_with_subset=True, seed=None) -- create a game and return its id.
+        join(game, players) -- add one or more players to a game that has not started.
+        start(game, deck=None) -- start a game with a deck, or with the suggested deck.
+        action(game, action, args=[]) -- call one of the game methods in actions.
+        query(game, query, args=[]) -- call one of the game methods in queries.
+        delete(game) -- stop a game and forget it.
+
+    Game methods run in a pool of worker threads, so that a large game does not stall the event loop.
+    A lock per game makes the calls to a single game run one at a time, together with the checks of the game state
+    they depend on.
+    """
+
+    def __init__(self, workers: int = None):
+        """Create a server without any games.
+
+        Arguments:
+            workers: int -- number of worker threads for the game methods (default: chosen by ThreadPoolExecutor)
+        """
+        self.games: Dict[int, Game] = {}
+        self.locks: Dict[int, asyncio.Lock] = {}
+        self.next_id = 1
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='quantumwerewolf')
+        self.server = None
+
+    async def listen(self, host: str = '127.0.0.1', port: int = 0, path: str = None) -> None:
+        """Listen on a TCP port, or on a Unix socket if a path is given.
+
+        Arguments:
+            host: str -- address to listen on (default: '127.0.0.1')
+            port: int -- port to listen on, 0 picks a free port (default: 0)
+            path: str -- path of the Unix socket (default: None)
+        """
+        if path is None:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        else:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path)
+        logger.info('listening on %s', self.address)
+
+    @property
+    def address(self):
+        """Return the address of the listening socket."""
+        return self.server.sockets[0].getsockname()
+
+    async def close(self) -> None:
+        """Stop listening, and stop and forget all games."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for game_id in list(self.games):
+            await self.delete(game_id)
+        self.executor.shutdown()
+        logger.info('stopped')
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the requests of a client until it closes the connection."""
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line: bytes) -> None:
+            response = await self.handle_request(line)
+            async with write_lock:
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, line: bytes) -> dict:
+        """Return the response to a single request line."""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'id': None, 'error': 'invalid JSON'}
+        if not isinstance(request, dict):
+            return {'id': None, 'error': 'request is not an object'}
+
+        request_id = request.get('id')
+        method = request.get('method')
+        if method not in ('create', 'join', 'start', 'action', 'query', 'delete'):
+            return {'id': request_id, 'error': f'unknown method {method!r}'}
+        try:
+            result = await getattr(self, method)(**request.get('params', {}))
+        except (AssertionError, KeyError, TypeError, ValueError) as error:
+            logger.info('request %s failed: %r', request_id, error)
+            return {'id': request_id, 'error': str(error) or type(error).__name__}
+        except Exception as error:
+            # the client gets an answer to every request, also when a game method has a bug
+            logger.exception('request %s raised an unexpected error', request_id)
+            return {'id': request_id, 'error': f'internal error: {type(error).__name__}: {error}'}
+        return {'id': request_id, 'result': result}
+
+    def _game(self, game: int) -> Game:
+        assert game in self.games, f'ERROR: no game with id {game}'
+        return self.games[game]
+
+    async def _run(self, game: int, function, *args: object) -> object:
+        """Return the result of a function of a game, called in a worker thread while holding the lock of the game."""
+        self._game(game)
+        async with self.locks[game]:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _call_started(self, game: int, method: str, args: list) -> object:
+        """Return the result of a method of a game that has started. Called through GameServer._run()."""
+        g = self._game(game)
+        assert g.started, f'ERROR: game {game} has not started'
+        return getattr(g, method)(*args)
+
+    # METHODS
+
+    async def create(self, engine: str = 'game', start_with_subset: bool = True, seed: int = None) -> int:
+        """Create a game and return its id.
+
+        Arguments:
+            engine: str -- name of the game engine, see engines.engine_names (default: 'game')
+            start_with_subset: bool -- start the game with a random subset of the permutations, as Game does
+                (default: True)
+            seed: int -- seed of the random choices of the game, to replay it (default: None)
+        """
+        assert engine in engines.engine_names, f'ERROR: unknown engine {engine!r}'
+        game_id = self.next_id
+        self.next_id += 1
+        game = engines.engine(engine)(seed)
+        game.start_with_subset = start_with_subset
+        self.games[game_id] = game
+        self.locks[game_id] = asyncio.Lock()
+        logger.info('created game %s with engine %s', game_id, engine)
+        return game_id
+
+    async def join(self, game: int, players) -> List[str]:
+        """Add players to a game and return all players of the game.
+
+        Arguments:
+            game: int -- id of the game.
+            players: Union[str, List[str]] -- name or names of the players.
+        """
+        g = self._game(game)
+
+        def join_game() -> List[str]:
+            assert not g.started, 'ERROR: players can not join a game that has started'
+            g.add_players(players)
+            return g.players
+
+        return await self._run(game, join_game)
+
+    async def start(self, game: int, deck: dict = None) -> List[str]:
+        """Start a game and return the roles in play.
+
+        Arguments:
+            game: int -- id of the game.
+            deck: dict -- number of players per role, the suggested deck if None (default: None)
+        """
+        g = self._game(game)
+
+        def start_game() -> List[str]:
+            assert not g.started, f'ERROR: game {game} has already started'
+            if deck is None:
+                g.set_suggested_deck()
+            else:
+                assert g.set_deck(deck), f'ERROR: invalid deck {deck}'
+            assert g.start(), f'ERROR: could not start game {game}'
+            return g.used_roles
+
+        return await self._run(game, start_game)
+
+    async def action(self, game: int, action: str, args: list = ()) -> object:
+        """Return the result of a game method that changes the game state.
+
+        Arguments:
+            game: int -- id of the game.
+            action: str -- name of the method, see actions.
+            args: list -- arguments of the method (default: ())
+        """
+        assert action in actions, f'ERROR: unknown action {action!r}'
+        return await self._run(game, self._call_started, game, action, args)
+
+    async def query(self, game: int, query: str, args: list = ()) -> object:
+        """Return the result of a game method that only reads the game state.
+
+        Arguments:
+            game: int -- id of the game.
+            query: str -- name of the method, see queries.
+            args: list -- arguments of the method (default: ())
+        """
+        assert query in queries, f'ERROR: unknown query {query!r}'
+        return await self._run(game, self._call_started, game, query, args)
+
+    async def delete(self, game: int) -> bool:
+        """Stop a game and forget it. Return True.
+
+        Arguments:
+            game: int -- id of the game.
+        """
+        g = self._game(game)
+
+        def stop_game() -> None:
+            if g.started:
+                g.stop()
+
+        await self._run(game, stop_game)
+        del self.games[game]
+        del self.locks[game]
+        logger.info('deleted game %s', game)
+        return True
+
+
+def serve(argv=None):
+    parser = ArgumentParser(prog='quantumwerewolf-server', description='Host quantum werewolf games for local clients.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8642, help='port to listen on (default: 8642)')
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket at PATH instead of a TCP port')
+    parser.add_argument('--workers', type=int, help='number of worker threads for the game methods')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='minimum level of messages written to the log file (default: WARNING)')
+    parser.add_argument('--log-file', default='debug.log', metavar='FILE', help='log file (default: debug.log)')
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = GameServer(args.workers)
+        await server.listen(args.host, args.port, args.unix)
+        print('Listening on', server.address)
+        try:
+            await server.server.serve_forever()
+        finally:
+            await server.close()
+
+    setup_logging(getattr(logging, args.log_level), args.log_file)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_logging()
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,258 @@
+"""Game engine splitting the permutations over worker processes that each own a shard of them."""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from os import cpu_count
+import struct
+from typing import Dict, List, Sequence, Tuple
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.combinatorics import multiset_permutations, multiset_unrank
+from quantumwerewolf.counting import ConstraintGame, Tally
+
+
+class Shard:
+    """Part of the permutations of a ShardedGame, kept in the worker process that owns it.
+
+    The shard computes the attacks with the methods of Game, for which it keeps a copy of the
+    attributes they use.
+    """
+
+    _lovers = Game._lovers
+    _werewolf_attacks = Game._werewolf_attacks
+    _death_attacks = Game._death_attacks
+    _satisfied = staticmethod(ConstraintGame._satisfied)
+
+    def __init__(self, deck: dict, ranks: Sequence[int]):
+        """Create the shard of the permutations with the given ranks in the order of multiset_permutations().
+
+        Arguments:
+            deck: dict -- number of players per role.
+            ranks: Sequence[int] -- ranks of the permutations, a contiguous range is enumerated without unranking.
+        """
+        self.deck = deck
+        self.player_count = sum(deck.values())
+        roles = [role for role, count in deck.items() for _ in range(count)]
+        if isinstance(ranks, range) and ranks.step == 1:
+            first = multiset_unrank(ranks.start, roles) if ranks else None
+            self.permutations = list(islice(multiset_permutations(roles, first), len(ranks)))
+        else:
+            self.permutations = [multiset_unrank(rank, roles) for rank in ranks]
+        self.valid = bytearray([True]) * len(self.permutations)
+
+    def _valid_permutations(self, condition: tuple = None):
+        for p, valid in zip(self.permutations, self.valid):
+            if valid and (condition is None or self._satisfied(p, condition)):
+                yield p
+
+    def apply(self, constraints: List[tuple]) -> Tuple[int, int]:
+        """Invalidate the permutations violating any of the constraints.
+        Return the number of stored and of valid permutations.
+
+        Arguments:
+            constraints: List[tuple] -- constraints from ConstraintGame._constraints()
+        """
+        for i, p in enumerate(self.permutations):
+            if self.valid[i] and not all(self._satisfied(p, c) for c in constraints):
+                self.valid[i] = False
+        valid_count = sum(self.valid)
+
+        # remove the invalid permutations once they are the majority
+        if 2 * valid_count <= len(self.permutations):
+            self.permutations = list(self._valid_permutations())
+            self.valid = bytearray([True]) * valid_count
+        return len(self.permutations), valid_count
+
+    def tally(self, condition: tuple, pairs: bool, deaths: List[List[float]], killed: List[bool],
+              lovers_list: dict) -> Tally:
+        """Return the Tally of the valid permutations satisfying the condition, see ConstraintGame._tally()."""
+        self.deaths = deaths
+        self.killed = killed
+        self.lovers_list = lovers_list
+        tally = Tally(self, pairs=pairs)
+        for p in self._valid_permutations(condition):
+            tally.total += 1
+            for counts, role in zip(tally.roles, p):
+                counts[role] += 1
+            for i, attacks in enumerate(self._death_attacks(p)):
+                tally.deaths[i] += attacks
+            lovers = self._lovers(p)
+            if lovers is not None:
+                tally.lovers[lovers] = tally.lovers.get(lovers, 0) + 1
+            if pairs:
+                werewolf_ids = [i for i, role in enumerate(p) if role == 'werewolf']
+                for i in werewolf_ids:
+                    for j in werewolf_ids:
+                        tally.pairs[i][j] += 1
+        return tally
+
+    def count(self, condition: tuple = None) -> int:
+        """Return the number of valid permutations satisfying the condition."""
+        return sum(1 for _ in self._valid_permutations(condition))
+
+    def role(self, target_id: int, condition: tuple, index: int) -> str:
+        """Return the role of a player in the valid permutation satisfying the condition at an index."""
+        return next(islice(self._valid_permutations(condition), index, None))[target_id]
+
+    def valid_permutations(self) -> List[tuple]:
+        return list(self._valid_permutations())
+
+
+# the shard owned by this worker process
+_shard = None
+
+# default number of shards of a game. Every shard has a worker process for the whole game, so the default is kept
+# small for servers and simulations running many games at once; a single large game can raise Game.shard_count.
+default_shard_count = 2
+
+
+def _create_shard(deck: dict, ranks: Sequence[int]) -> int:
+    global _shard
+    _shard = Shard(deck, ranks)
+    return len(_shard.permutations)
+
+
+def _call_shard(method: str, *args: object) -> object:
+    return getattr(_shard, method)(*args)
+
+
+class ShardedGame(ConstraintGame):
+    """Game dividing the permutations over Game.shard_count worker processes.
+
+    Every worker owns one shard of the permutations. The actions only send the constraints they
+    record to the workers, which collapse their shard locally, and the queries add up the tallies
+    computed by all workers in parallel. The constraints are sent in a batch before the next
+    query, after which Game.valid_count is up to date.
+    """
+
+    enumerates = True
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        self.shard_count = min(default_shard_count, cpu_count() or 1)
+        self.executors = []
+
+    # GAMESTATE
+
+    def _start_shards(self, ranks: Sequence[int]) -> None:
+        """Create the shards from parts of the ranks, in a worker process per shard.
+        The worker processes of earlier shards are reused if there are as many.
+
+        Arguments:
+            ranks: Sequence[int] -- ranks of all permutations in the game, in the order of multiset_permutations().
+        """
+        self._init_constraints()
+        self.ranks = ranks
+        self.applied = set()
+        shard_count = max(min(self.shard_count, len(ranks)), 1)
+        bounds = [len(ranks) * k // shard_count for k in range(shard_count + 1)]
+        if len(self.executors) != shard_count:
+            self._stop_shards()
+            self.executors = [ProcessPoolExecutor(max_workers=1) for _ in range(shard_count)]
+        futures = [executor.submit(_create_shard, self.deck, ranks[start:stop])
+                   for executor, start, stop in zip(self.executors, bounds, bounds[1:])]
+        self.shard_sizes = [future.result() for future in futures]
+        self.valid_count = sum(self.shard_sizes)
+
+    def _restore_store(self, snapshot) -> None:
+        super()._restore_store(snapshot)
+        if not self.applied <= set(self._constraints()):
+            # the shards dropped the game states excluded by the undone constraints
+            self.logger.info('Creating the shards again to undo constraints')
+            self._start_shards(self.ranks)
+            super()._restore_store(snapshot)
+
+    def _dump_store(self) -> Tuple[dict, Dict[str, bytes]]:
+        header, sections = super()._dump_store()
+        if isinstance(self.ranks, range):
+            # all permutations
+            header['ranks'] = [self.ranks.start, self.ranks.stop]
+        else:
+            header['ranks'] = len(self.ranks)
+            sections['ranks'] = struct.pack(f'<{len(self.ranks)}Q', *self.ranks)
+        return header, sections
+
+    def _load_store(self, header: dict, sections: Dict[str, memoryview]) -> None:
+        if isinstance(header['ranks'], list):
+            ranks = range(*header['ranks'])
+        else:
+            ranks = list(struct.unpack_from(f'<{header["ranks"]}Q', sections['ranks']))
+        self._start_shards(ranks)
+        # the shards are collapsed by the loaded constraints before the next query
+        super()._load_store(header, sections)
+
+    def _stop_shards(self) -> None:
+        for executor in self.executors:
+            executor.shutdown()
+        self.executors = []
+
+    def _map(self, method: str, *args: object) -> List[object]:
+        """Return the results of a Shard method called in every worker process in parallel."""
+        futures = [executor.submit(_call_shard, method, *args) for executor in self.executors]
+        return [future.result() for future in futures]
+
+    def _apply_constraints(self) -> None:
+        """Send the constraints recorded since the last call to the workers to collapse their shards."""
+        constraints = [c for c in self._constraints() if c not in self.applied]
+        if constraints:
+            self.shard_sizes, valid_counts = zip(*self._map('apply', constraints))
+            self.valid_count = sum(valid_counts)
+            self.applied.update(constraints)
+
+    def generate_all_permutations(self):
+        self.logger.info('Generating all role permutations in %s shards', self.shard_count)
+        self._start_shards(range(self._max_permutations()))
+
+    def generate_subset_permutations(self):
+        self.logger.info('Generating subset of role permutations in %s shards', self.shard_count)
+        self._start_shards(sorted(self.rng.sample(range(self._max_permutations()), self._subset_size())))
+
+    def _permutation_count(self) -> int:
+        return sum(self.shard_sizes)
+
+    def _state_count(self) -> int:
+        return self.valid_count
+
+    def _tally(self, condition=None, pairs: bool = False) -> Tally:
+        self._apply_constraints()
+        tally = Tally(self, pairs=pairs)
+        for shard_tally in self._map('tally', condition, pairs, self.deaths, self.killed, self.lovers_list):
+            tally.total += shard_tally.total
+            for counts, shard_counts in zip(tally.roles, shard_tally.roles):
+                for role, count in shard_counts.items():
+                    counts[role] += count
+            for i, deaths in enumerate(shard_tally.deaths):
+                tally.deaths[i] += deaths
+            for lovers, count in shard_tally.lovers.items():
+                tally.lovers[lovers] = tally.lovers.get(lovers, 0) + count
+            if pairs:
+                for row, shard_row in zip(tally.pairs, shard_tally.pairs):
+                    for j, count in enumerate(shard_row):
+                        row[j] += count
+        return tally
+
+    def _sample_role(self, target_id: int, seer_id: int = None) -> str:
+        self._apply_constraints()
+        condition = None if seer_id is None else ('revealed', seer_id, 'seer')
+        counts = self._map('count', condition)
+        if not sum(counts):
+            return None
+        index = self.rng.randrange(sum(counts))
+        for executor, count in zip(self.executors, counts):
+            if index < count:
+                return executor.submit(_call_shard, 'role', target_id, condition, index).result()
+            index -= count
+
+    @Game.started()
+    def stop(self) -> None:
+        """Stop the game and its worker processes."""
+        self._stop_shards()
+        return super().stop()
+
+    # GAME INFO METHODS
+
+    @Game.started()
+    def valid_permutations(self) -> List[List[str]]:
+        """Return all possible game states."""
+        self._apply_constraints()
+        return [p for permutations in self._map('valid_permutations') for p in permutations]
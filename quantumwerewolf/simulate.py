@@ -0,0 +1,294 @@
+"""Headless simulation of complete games played by bots."""
+
+import json
+import logging
+import random
+import sys
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from math import log
+from os import cpu_count
+from time import perf_counter
+from typing import Iterator, List, Tuple
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.engines import engine, engine_names
+from quantumwerewolf.logs import setup_logging, stop_logging
+
+
+class Policy:
+    """Bot policy choosing the actions and votes of all players uniformly at random.
+    Subclasses override the choices they make differently.
+    """
+
+    def __init__(self, rng: random.Random):
+        """Create a policy.
+
+        Arguments:
+            rng: random.Random -- source of the random choices.
+        """
+        self.rng = rng
+
+    def _best(self, players: List[str], score) -> str:
+        """Return the player with the highest score, breaking ties at random."""
+        scores = [score(player) for player in players]
+        best = max(scores)
+        return self.rng.choice([player for player, s in zip(players, scores) if s == best])
+
+    def cupid_pair(self, game: Game, cupid: str) -> Tuple[str, str]:
+        """Return the two players a cupid makes fall in love."""
+        return tuple(self.rng.sample(game.living_players(), 2))
+
+    def seer_target(self, game: Game, seer: str) -> str:
+        """Return the player whose role a seer inspects."""
+        return self.rng.choice([p for p in game.living_players() if p != seer])
+
+    def werewolf_target(self, game: Game, werewolf: str, candidates: List[str]) -> str:
+        """Return the player a werewolf attacks.
+
+        Arguments:
+            game: Game -- game being played.
+            werewolf: str -- name of the attacking player.
+            candidates: List[str] -- living players that are not surely werewolves together with the attacker.
+        """
+        return self.rng.choice(candidates)
+
+    def lynch_vote(self, game: Game, voter: str) -> str:
+        """Return the player a living player votes to lynch."""
+        return self.rng.choice([p for p in game.living_players() if p != voter])
+
+    def hunter_target(self, game: Game, hunter: str) -> str:
+        """Return the player a dead hunter shoots."""
+        return self.rng.choice(game.living_players())
+
+
+class InformedPolicy(Policy):
+    """Bot policy acting on the role probabilities: seers inspect the players whose role is most uncertain,
+    werewolves attack the players least likely to be a fellow werewolf,
+    and votes and hunters go to the players most likely to be a werewolf.
+    """
+
+    def seer_target(self, game: Game, seer: str) -> str:
+        probabilities = {row['name']: row for row in game.role_probabilities()}
+
+        def entropy(player):
+            return -sum(probabilities[player][role] * log(probabilities[player][role])
+                        for role in game.used_roles if probabilities[player][role] > 0)
+
+        return self._best([p for p in game.living_players() if p != seer], entropy)
+
+    def werewolf_target(self, game: Game, werewolf: str, candidates: List[str]) -> str:
+        fellow = {row['name']: row['werewolf'] for row in game.other_werewolves(werewolf)}
+        return self._best(candidates, lambda player: -fellow.get(player, 0))
+
+    def _werewolf_probability(self, game: Game):
+        probabilities = {row['name']: row.get('werewolf', 0) for row in game.role_probabilities()}
+        return probabilities.get
+
+    def lynch_vote(self, game: Game, voter: str) -> str:
+        return self._best([p for p in game.living_players() if p != voter], self._werewolf_probability(game))
+
+    def hunter_target(self, game: Game, hunter: str) -> str:
+        return self._best(game.living_players(), self._werewolf_probability(game))
+
+
+policies = {
+    'random': Policy,
+    'informed': InformedPolicy,
+}
+
+
+def suggested_deck(player_count: int) -> dict:
+    """Return the deck Game.set_suggested_deck() picks for a number of players."""
+    game = Game()
+    game.add_players([f'player{i}' for i in range(player_count)])
+    game.set_suggested_deck()
+    return game.deck
+
+
+def _resolve(game: Game, policy: Policy, killed_players: List[str], cause: str, turn: int, kills: List[dict]) -> None:
+    """Kill players and everyone who dies with them, and let every hunter among them shoot."""
+    pending_hunters = []
+    while True:
+        # without a first victim, as at night, the deaths can not be told apart from a chain
+        chained = bool(killed_players)
+        new_kills, hunters = game.resolve_deaths(killed_players)
+        for kill in new_kills:
+            kills.append(dict(kill, turn=turn, cause='chain' if kill['chain'] and chained else cause))
+        pending_hunters += hunters
+        if not pending_hunters or not game.living_players():
+            return
+        hunter = pending_hunters.pop(0)
+        killed_players, cause = [policy.hunter_target(game, hunter)], 'hunter'
+
+
+def _night(game: Game, policy: Policy) -> dict:
+    """Return the actions of all living players for a night, for Game.process_night()."""
+    probabilities = game.role_probabilities()
+    actions = {}
+    for player_id, player in enumerate(game.players):
+        if game.killed[player_id]:
+            continue
+        role_probabilities = probabilities[player_id]
+        player_actions = {}
+        if game.turn_counter == 1 and role_probabilities.get('cupid', 0) != 0:
+            player_actions['cupid'] = policy.cupid_pair(game, player)
+        if role_probabilities.get('seer', 0) != 0:
+            target = policy.seer_target(game, player)
+            player_actions['seer'] = (target, game.seer(player, target, project=False))
+        if role_probabilities.get('werewolf', 0) != 0:
+            fellow = {row['name']: row['werewolf'] for row in game.other_werewolves(player)}
+            candidates = [p for p in game.living_players() if p != player and fellow.get(p, 0) < 1]
+            if candidates:
+                player_actions['werewolf'] = policy.werewolf_target(game, player, candidates)
+        actions[player] = player_actions
+    return actions
+
+
+def play_game(player_count: int, deck: dict = None, policy: str = 'random', seed: int = 0, engine_name: str = 'game',
+              start_with_subset: bool = True, werewolf_cannot_eat_werewolf: bool = False) -> dict:
+    """Play a complete game with bots and return its result.
+
+    The result holds the 'winner' as returned by Game.check_win() (None for a tie), the number of 'turns' and the
+    'kills' in order, as dicts with the 'name', 'role', 'turn' and 'cause' ('night', 'lynch', 'hunter' or 'chain').
+
+    Arguments:
+        player_count: int -- number of players.
+        deck: dict -- number of players per role, the suggested deck if None (default: None)
+        policy: str -- name of the bot policy, see policies (default: 'random')
+        seed: int -- seed of the random choices of the game and the bots (default: 0)
+        engine_name: str -- name of the game engine, see engines.engine_names (default: 'game')
+        start_with_subset: bool -- start the game with a random subset of the permutations (default: True)
+        werewolf_cannot_eat_werewolf: bool -- rule flag of the game (default: False)
+    """
+    start = perf_counter()
+    # the game and the bots draw from the same generator
+    rng = random.Random(seed)
+    bots = policies[policy](rng)
+
+    game = engine(engine_name)(rng)
+    game.add_players([f'player{i}' for i in range(player_count)])
+    if deck is None:
+        game.set_suggested_deck()
+    else:
+        assert game.set_deck(dict(deck)), f'ERROR: deck {deck} does not fit {player_count} players'
+    game.start_with_subset = start_with_subset
+    game.werewolf_cannot_eat_werewolf = werewolf_cannot_eat_werewolf
+    game.start()
+
+    kills = []
+    try:
+        while True:
+            game.turn_counter += 1
+            game.process_night(_night(game, bots))
+            _resolve(game, bots, [], 'night', game.turn_counter, kills)
+            win, winner = game.check_win()
+            if win:
+                break
+
+            votes = Counter(bots.lynch_vote(game, player) for player in game.living_players())
+            most_votes = max(votes.values())
+            lynch_target = bots.rng.choice([player for player, count in votes.items() if count == most_votes])
+            _resolve(game, bots, [lynch_target], 'lynch', game.turn_counter, kills)
+            win, winner = game.check_win()
+            if win:
+                break
+    finally:
+        game.stop()
+
+    return {
+        'seed': seed,
+        'players': player_count,
+        'deck': game.deck,
+        'policy': policy,
+        'engine': engine_name,
+        'winner': winner,
+        'turns': game.turn_counter,
+        'kills': [{key: kill[key] for key in ('name', 'role', 'turn', 'cause')} for kill in kills],
+        'time': perf_counter() - start,
+    }
+
+
+def simulate(games: int, player_count: int, deck: dict = None, policy: str = 'random', seed: int = 0,
+             engine_name: str = 'game', start_with_subset: bool = True, werewolf_cannot_eat_werewolf: bool = False,
+             workers: int = None) -> Iterator[dict]:
+    """Yield the results of play_game() for games with seeds seed, seed + 1, ..., in order of seed.
+    The games are played in a pool of worker processes, unless workers is 1.
+
+    Arguments:
+        games: int -- number of games to play.
+        workers: int -- number of worker processes (default: os.cpu_count())
+        other arguments -- see play_game()
+    """
+    play = partial(play_game, player_count, deck, policy, engine_name=engine_name,
+                   start_with_subset=start_with_subset, werewolf_cannot_eat_werewolf=werewolf_cannot_eat_werewolf)
+    seeds = range(seed, seed + games)
+    workers = workers or cpu_count() or 1
+    if workers == 1:
+        yield from map(play, seeds)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        # send the games in chunks, small enough to keep all workers busy until the end
+        yield from executor.map(play, seeds, chunksize=max(1, games // (8 * workers)))
+
+
+def summary(results: List[dict], wall_time: float) -> dict:
+    """Return the number of games, the fraction won by each faction and the games per second."""
+    winners = Counter(str(result['winner']) for result in results)
+    return {
+        'games': len(results),
+        'win_rates': {winner: count / len(results) for winner, count in sorted(winners.items())},
+        'mean_turns': sum(result['turns'] for result in results) / len(results) if results else 0,
+        'games_per_second': len(results) / wall_time if wall_time > 0 else None,
+    }
+
+
+def main(argv=None):
+    parser = ArgumentParser(prog='quantumwerewolf-simulate', description='Simulate quantum werewolf games played by bots.')
+    parser.add_argument('--players', type=int, default=8, help='number of players (default: 8)')
+    parser.add_argument('--werewolf', type=int, help='number of werewolves (default: suggested for the players)')
+    parser.add_argument('--seer', type=int, default=1)
+    parser.add_argument('--cupid', type=int, default=0)
+    parser.add_argument('--hunter', type=int, default=0)
+    parser.add_argument('--games', type=int, default=100, help='number of games (default: 100)')
+    parser.add_argument('--policy', default='random', choices=sorted(policies))
+    parser.add_argument('--engine', default='game', choices=engine_names)
+    parser.add_argument('--full', action='store_true', help='start with all permutations instead of a random subset')
+    parser.add_argument('--werewolf-cannot-eat-werewolf', action='store_true')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game (default: 0)')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--output', metavar='FILE', help='write the results as JSON lines to FILE instead of standard output')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='minimum level of messages written to the log file (default: WARNING)')
+    parser.add_argument('--log-file', default='debug.log', metavar='FILE', help='log file (default: debug.log)')
+    args = parser.parse_args(argv)
+
+    setup_logging(getattr(logging, args.log_level), args.log_file)
+    try:
+        deck = suggested_deck(args.players)
+        deck.pop('villager')
+        deck.update(seer=args.seer, cupid=args.cupid, hunter=args.hunter)
+        if args.werewolf is not None:
+            deck['werewolf'] = args.werewolf
+
+        output = sys.stdout if args.output is None else open(args.output, 'w')
+        results = []
+        start = perf_counter()
+        try:
+            for result in simulate(args.games, args.players, deck, args.policy, args.seed, args.engine, not args.full,
+                                   args.werewolf_cannot_eat_werewolf, args.workers):
+                output.write(json.dumps(result) + '\n')
+                results.append(result)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    finally:
+        stop_logging()
+    json.dump(summary(results, perf_counter() - start), sys.stderr, indent=2)
+    print(file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Game engine storing one permutation per orbit of interchangeable players."""
+
+from array import array
+from collections import Counter
+import struct
+from typing import Dict, Iterator, List, Tuple
+
+from quantumwerewolf.backend import Game
+from quantumwerewolf.combinatorics import multinomial, multiset_permutations
+
+
+class SymmetricGame(Game):
+    """Game treating the players that no action has distinguished yet as interchangeable.
+
+    Living players that have not been investigated, attacked, chosen as lover or performed an action
+    (Game.interchangeable) can swap roles without changing any probability. Every stored permutation
+    lists their roles in sorted order and stands for all arrangements of those roles, which are counted
+    by its weight in Game.permutations. A player is split off from the interchangeable players as soon as an
+    action involves them. The full game starts as a single permutation.
+    """
+
+    # GAMESTATE
+
+    def generate_all_permutations(self):
+        self.logger.info('Generating a single permutation for all interchangeable players')
+        self.interchangeable = list(range(self.player_count))
+        roles = sorted(role for role, count in self.deck.items() for _ in range(count))
+        self.permutations = {tuple(roles): multinomial(self.deck.values())}
+        self._count_roles()
+
+    def generate_subset_permutations(self):
+        # a random subset of the permutations distinguishes every player
+        self.interchangeable = []
+        super().generate_subset_permutations()
+
+    def _shared_roles(self, permutation: Tuple[str, ...]) -> Counter:
+        """Return the number of interchangeable players with each role in a permutation."""
+        return Counter(permutation[i] for i in self.interchangeable)
+
+    def _role_weights(self, permutation: Tuple[str, ...], weight: int) -> Iterator[Tuple[int, str, int]]:
+        """Yield (player_id, role, count) for the number of game states of a stored permutation
+        in which each player has each role.
+
+        Arguments:
+            permutation: Tuple[str, ...] -- permutation in Game.permutations.
+            weight: int -- number of game states the permutation stands for.
+        """
+        interchangeable = set(self.interchangeable)
+        shared_roles = self._shared_roles(permutation)
+        for player_id, role in enumerate(permutation):
+            if player_id not in interchangeable:
+                yield player_id, role, weight
+        for role, count in shared_roles.items():
+            # the arrangements in which a given interchangeable player has this role
+            role_weight = weight * count // len(interchangeable)
+            for player_id in interchangeable:
+                yield player_id, role, role_weight
+
+    def _count_roles(self) -> None:
+        self.valid_count = 0
+        self.role_counts = [dict.fromkeys(self.deck, 0) for _ in range(self.player_count)]
+        for p, weight in self.permutations.items():
+            if weight:
+                self.valid_count += weight
+                for player_id, role, count in self._role_weights(p, weight):
+                    self.role_counts[player_id][role] += count
+        self._index_rows()
+
+    def _store_snapshot(self):
+        # the weights do not fit in bits, they are packed as unsigned 64-bit integers as in Game.dump()
+        return self.rows, array('Q', (self.permutations[p] for p in self.rows)), self.interchangeable[:]
+
+    def _restore_store(self, snapshot) -> None:
+        rows, weights, interchangeable = snapshot
+        self.interchangeable = interchangeable[:]
+        self.permutations = dict(zip(rows, weights))
+        self._count_roles()
+
+    def _dump_store(self) -> Tuple[dict, Dict[str, bytes]]:
+        header, sections = super()._dump_store()
+        header['interchangeable'] = self.interchangeable
+        # the number of game states of each stored permutation
+        sections['weights'] = struct.pack(f'<{len(self.rows)}Q', *(self.permutations[p] for p in self.rows))
+        return header, sections
+
+    def _load_store(self, header: dict, sections: Dict[str, memoryview]) -> None:
+        self.interchangeable = header['interchangeable']
+        rows = self._load_rows(header, sections)
+        self.permutations = dict(zip(rows, struct.unpack_from(f'<{len(rows)}Q', sections['weights'])))
+        self._count_roles()
+
+    def _invalidate(self, permutation: Tuple[str, ...]) -> None:
+        weight = self.permutations[permutation]
+        if weight:
+            self.permutations[permutation] = 0
+            self.sampler.update(self.row_index[permutation], 0)
+            self.valid_count -= weight
+            for player_id, role, count in self._role_weights(permutation, weight):
+                self.role_counts[player_id][role] -= count
+
+    def _distinguish(self, *player_ids: int) -> None:
+        """Split players off from the interchangeable players, storing a permutation for each role they can have.
+        The probabilities do not change.
+
+        Arguments:
+            player_ids: int -- indices of the players.
+        """
+        for player_id in player_ids:
+            if player_id not in self.interchangeable:
+                continue
+            self.interchangeable.remove(player_id)
+            permutations = {}
+            for p, weight in self.permutations.items():
+                if not weight:
+                    continue
+                shared_roles = self._shared_roles(p) + Counter([p[player_id]])
+                for role in shared_roles:
+                    rest = shared_roles - Counter([role])
+                    new_p = list(p)
+                    new_p[player_id] = role
+                    for i, other_role in zip(self.interchangeable, sorted(rest.elements())):
+                        new_p[i] = other_role
+                    permutations[tuple(new_p)] = multinomial(rest.values())
+            self.permutations = permutations
+            self._index_rows()
+            self.logger.debug('distinguished player %s, %s stored permutations', player_id, len(permutations))
+
+    def _compact(self) -> None:
+        self.permutations = {p: weight for p, weight in self.permutations.items() if weight}
+        self._index_rows()
+
+    def _state_count(self) -> int:
+        return len(self.permutations)
+
+    def _choose_permutation(self, p_list: List[Tuple[str, ...]]) -> Tuple[str, ...]:
+        return self.rng.choices(p_list, weights=[self.permutations[p] for p in p_list])[0]
+
+    # GAME INFO METHODS
+
+    @Game.started()
+    def valid_permutations(self) -> List[List[str]]:
+        """Return all possible game states, arranging the roles of the interchangeable players in every way."""
+        result = []
+        for p in self._valid_rows():
+            shared_roles = [p[i] for i in self.interchangeable]
+            for arrangement in multiset_permutations(shared_roles):
+                new_p = list(p)
+                for i, role in zip(self.interchangeable, arrangement):
+                    new_p[i] = role
+                result.append(tuple(new_p))
+        return result
+
+    def _werewolf_pair_counts(self) -> List[List[int]]:
+        n = self.player_count
+        interchangeable = set(self.interchangeable)
+        u = len(interchangeable)
+        counts = [[0] * n for _ in range(n)]
+        for p in self._valid_rows():
+            weight = self.permutations[p]
+            werewolf_ids = [i for i, role in enumerate(p) if role == 'werewolf' and i not in interchangeable]
+            m = self._shared_roles(p)['werewolf']
+            for i in werewolf_ids:
+                for j in werewolf_ids:
+                    counts[i][j] += weight
+                for j in interchangeable:
+                    counts[i][j] += weight * m // u
+                    counts[j][i] += weight * m // u
+            for i in interchangeable:
+                for j in interchangeable:
+                    counts[i][j] += weight * m // u if i == j else weight * m * (m - 1) // (u * (u - 1))
+        return counts
+
+    # ROLE ACTIONS
+
+    @Game.started()
+    def cupid(self, cupid: str, lover1: str, lover2: str) -> None:
+        """Distinguish the players involved and perform the cupid action, see Game.cupid()."""
+        self._distinguish(self._id(cupid), self._id(lover1), self._id(lover2))
+        super().cupid(cupid, lover1, lover2)
+
+    @Game.started()
+    def seer(self, seer: str, target: str, target_role: str = None, project: bool = True) -> str:
+        """Distinguish the players involved and perform the seer action, see Game.seer()."""
+        self._distinguish(self._id(seer), self._id(target))
+        return super().seer(seer, target, target_role, project)
+
+    @Game.started()
+    def werewolf(self, werewolf, target):
+        """Distinguish the players involved and perform the werewolf action, see Game.werewolf()."""
+        self._distinguish(self._id(werewolf), self._id(target))
+        super().werewolf(werewolf, target)
+
+    @Game.started()
+    def kill(self, target: str, target_role: str = None) -> str:
+        """Distinguish the target and kill them, see Game.kill()."""
+        self._distinguish(self._id(target))
+        return super().kill(target, target_role)
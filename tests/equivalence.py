@@ -0,0 +1,111 @@
+from quantumwerewolf.backend import Game
+import logging
+
+
+class UncompactedGame(Game):
+    """Game that keeps the permutations that are no longer possible, to compare compaction against."""
+
+    def _compact(self) -> None:
+        pass
+
+
+class EngineEquivalence:
+    """Mixin for the tests of a game engine that must give the same results as a reference engine.
+
+    A test case mixes it into TestCase and sets engine to the class under test. Every test starts
+    with self.game, a game of the reference engine, and self.engine_game, a game of the engine,
+    that have the same players and deck.
+    """
+
+    engine = None
+    reference = Game
+    # seed of both games
+    seed = None
+    names = ['Alice', 'Bob', 'Craig', 'David', 'Eve', 'Frank']
+    deck = {'werewolf': 2, 'seer': 1, 'hunter': 0, 'cupid': 1}
+    # deck of EngineEquivalence.assertCompacts(), all other players are villagers
+    compaction_deck = {'werewolf': 1, 'seer': 1, 'hunter': 0, 'cupid': 0}
+
+    def setUp(self):
+        logging.basicConfig(level=logging.WARNING)
+        self.game = self.start_game(self.reference(self.seed))
+        self.engine_game = self.start_game(self.new_engine_game())
+        self.games = [self.game, self.engine_game]
+
+    def tearDown(self):
+        for game in self.games:
+            if game.started:
+                game.stop()
+
+    def new_engine_game(self) -> Game:
+        return self.engine(self.seed)
+
+    def start_game(self, game: Game, start_with_subset: bool = False, werewolf_cannot_eat_werewolf: bool = True,
+                   deck: dict = None) -> Game:
+        game.add_players(self.names)
+        game.set_deck(dict(deck or self.deck))
+        game.start_with_subset = start_with_subset
+        game.werewolf_cannot_eat_werewolf = werewolf_cannot_eat_werewolf
+        game.start()
+        return game
+
+    def play_night(self, games):
+        for game in games:
+            for i, player in enumerate(self.names):
+                target = self.names[(i + 1) % len(self.names)]
+                game.cupid(player, target, self.names[(i + 3) % len(self.names)])
+                game.seer(player, target, 'villager' if i % 3 else 'werewolf')
+                game.werewolf(player, target)
+
+    def assertSameTable(self, table, engine_table):
+        self.assertEqual(len(table), len(engine_table))
+        for row, engine_row in zip(table, engine_table):
+            self.assertEqual(row.keys(), engine_row.keys())
+            self.assertEqual(row['name'], engine_row['name'])
+            for key in row.keys() - {'name'}:
+                self.assertAlmostEqual(row[key], engine_row[key])
+
+    def assertSameState(self, game=None, engine_game=None):
+        game = game or self.game
+        engine_game = engine_game or self.engine_game
+        self.assertEqual(sorted(game.valid_permutations()), sorted(engine_game.valid_permutations()))
+        self.assertSameTable(game.role_probabilities(), engine_game.role_probabilities())
+        for player in self.names:
+            self.assertSameTable(game.other_werewolves(player), engine_game.other_werewolves(player))
+            self.assertSameTable(game.other_lover(player), engine_game.other_lover(player))
+        self.assertEqual(game.check_win(), engine_game.check_win())
+
+    def assertCompacts(self, engine_game: Game, stored) -> None:
+        """Check that kills remove the rows that are no longer possible from the store of an engine game once
+        they are at least half of it, without changing the game state.
+
+        Arguments:
+            engine_game: Game -- game of the engine, not started.
+            stored: Callable -- function returning the number of rows stored by the engine game.
+        """
+        game = self.start_game(UncompactedGame(self.seed), deck=self.compaction_deck)
+        engine_game = self.start_game(engine_game, deck=self.compaction_deck)
+        self.games += [game, engine_game]
+        rows = stored(engine_game)
+        self.assertEqual(rows, game._max_permutations())
+
+        # with 6 players, a dead villager leaves 4 of 6 rows possible
+        for g in (game, engine_game):
+            g.kill(self.names[0], 'villager')
+        self.assertSameState(game, engine_game)
+        self.assertEqual(stored(engine_game), rows)
+
+        # a second one 3 of 5 of those, 2 of 5 rows
+        for g in (game, engine_game):
+            g.kill(self.names[1], 'villager')
+        self.assertSameState(game, engine_game)
+        self.assertEqual(stored(engine_game), game.valid_count)
+        self.assertEqual(5 * game.valid_count, 2 * rows)
+        self.assertEqual(game._permutation_count(), rows)
+
+    def test_start(self):
+        self.assertSameState()
+
+    def test_night(self):
+        self.play_night(self.games)
+        self.assertSameState()
@@ -2,7 +2,7 @@
 
 for i in {1..1000}
 do
-    out=$(python ../quantumwerewolf/cli.py < input.txt)
+    out=$(quantumwerewolf --script input.txt)
 #     if [[ $out == *'Traceback'* ]]
 #     then
 #         echo $out
@@ -15,7 +15,9 @@ UNIT TESTS
 
 """
 
+from equivalence import EngineEquivalence, UncompactedGame
 from quantumwerewolf.backend import Game
+from quantumwerewolf.symmetric import SymmetricGame
 from unittest import TestCase, main
 import logging
 
@@ -94,6 +96,15 @@ class TestGame(TestCase):
 
         self.assertEqual(len(self.game.permutations), n_perm)
 
+    def test_start_subset(self):
+        # test start with a random subset of permutations
+        self.game.add_players(['Alice', 'Bob', 'Craig', 'David', 'Eve'])
+        self.assertTrue(self.game.start())
+        self.assertEqual(self.game._max_permutations(), 30)
+        self.assertEqual(len(self.game.permutations), self.game._subset_size())
+        for permutation in self.game.permutations:
+            self.assertEqual(sorted(permutation), ['seer', 'villager', 'villager', 'werewolf', 'werewolf'])
+
 
 class TestGameStarted(TestCase):
 
@@ -132,14 +143,26 @@ class TestGameStarted(TestCase):
         self.assertEqual(self.game.living_players(), self.names)
 
     def test_death_probability(self):
-        # test all players are valid input
-
-        # test output is probabiltiy
+        # test output is probability at start of the game
+        self.assertEqual(self.game.death_probabilities(), [0] * self.game.player_count)
 
         # test without lovers
+        self.game.werewolf('Alice', 'Bob')
+        self.assertAlmostEqual(self.game.death_probability('Bob'), 1/2 * 4/12)
+        self.game.werewolf('Craig', 'Bob')
+        self.game.werewolf('David', 'Bob')
+        self.assertAlmostEqual(self.game.death_probability('Bob'), 1/2)
+
+        # test all players are valid input
+        probabilities = [self.game.death_probability(player) for player in self.names]
+        self.assertEqual(self.game.death_probabilities(), probabilities)
 
         # test with lovers
-        pass
+        self.game.deck['cupid'] = 1
+        self.game.permutations = {('cupid', 'werewolf', 'werewolf', 'seer'): True}
+        self.game.cupid('Alice', 'Craig', 'David')
+        self.game.werewolf('Bob', 'David')
+        self.assertEqual(self.game.death_probabilities(), [0, 0, 1/2, 1/2])
 
     def test_calculate_probabilities(self):
         # check results at start of the a game
@@ -154,18 +177,203 @@ class TestGameStarted(TestCase):
             self.assertEqual(player_result['villager'], 1/4)
             self.assertEqual(player_result['dead'], 0)
 
+    def assertRoleCounts(self):
+        # the incrementally updated role counts match a full recount
+        role_counts = self.game.role_counts
+        valid_count = self.game.valid_count
+        self.game._count_roles()
+        self.assertEqual(role_counts, self.game.role_counts)
+        self.assertEqual(valid_count, self.game.valid_count)
+        self.assertEqual(valid_count, len(self.game.valid_permutations()))
+
     def test_kill(self):
-        pass
+        role = self.game.kill('Alice')
+        self.assertEqual(self.game.living_players(), self.names[1:])
+        self.assertEqual(self.game.role_probabilities()[0][role], 1)
+        for permutation in self.game.valid_permutations():
+            self.assertEqual(permutation[0], role)
+        self.assertRoleCounts()
+        # the collapsed permutations are no longer stored
+        self.assertEqual(self.game._permutation_count(), self.game.valid_count)
 
     def test_seer(self):
-        pass
+        role = self.game.seer('Alice', 'Bob', project=False)
+        self.assertIn(role, self.game.used_roles)
+        self.assertEqual(self.game.valid_count, 12)
+
+        self.game.seer('Alice', 'Bob', 'werewolf')
+        for permutation in self.game.valid_permutations():
+            if permutation[0] == 'seer':
+                self.assertEqual(permutation[1], 'werewolf')
+        self.assertEqual(self.game.valid_count, 11)
+        self.assertRoleCounts()
 
     def test_werewolf(self):
-        pass
+        self.game.werewolf('Alice', 'Bob')
+        self.assertEqual(self.game.deaths[1][0], 1/2)
+        self.assertEqual(self.game.valid_count, 12)
+
+        self.game.werewolf_cannot_eat_werewolf = True
+        self.game.werewolf('Alice', 'Bob')
+        self.assertEqual(self.game.valid_count, 10)
+        self.assertEqual(self.game.other_werewolves('Alice')[1]['werewolf'], 0)
+        self.assertRoleCounts()
 
     def test_cupid(self):
         pass
 
+    def test_resolve_deaths(self):
+        self.game.stop()
+        self.game.set_deck({'werewolf': 1, 'seer': 0, 'hunter': 1, 'cupid': 1})
+        self.game.start()
+        for player in self.names:
+            self.game.cupid(player, 'Bob', 'Craig')
+
+        # the lover dies with Bob and the game continues until no one else dies
+        kills, hunters = self.game.resolve_deaths(['Bob'])
+        self.assertEqual([(kill['name'], kill['chain']) for kill in kills], [('Bob', False), ('Craig', True)])
+        self.assertEqual(hunters, [kill['name'] for kill in kills if kill['role'] == 'hunter'])
+        self.assertEqual(self.game.living_players(), ['Alice', 'David'])
+        self.assertEqual(self.game.resolve_deaths(), ([], []))
+
+    def test_werewolf_cooccurrence(self):
+        matrix = self.game.werewolf_cooccurrence()
+        for i in range(self.game.player_count):
+            for j in range(self.game.player_count):
+                self.assertAlmostEqual(matrix[i][j], 1 if i == j else 1/3)
+
+        self.game.werewolf_cannot_eat_werewolf = True
+        self.game.werewolf('Alice', 'Bob')
+        matrix = self.game.werewolf_cooccurrence()
+        self.assertEqual(matrix[0], [1, 0, 1/2, 1/2])
+        for i, player in enumerate(self.names):
+            self.assertEqual([p['werewolf'] for p in self.game.other_werewolves(player)], matrix[i])
+
+    def test_cache(self):
+        # queries are reused until an action changes the game state
+        probabilities = self.game.role_probabilities()
+        other_werewolves = self.game.other_werewolves('Alice')
+        self.assertIs(self.game.role_probabilities(), probabilities)
+        self.assertIs(self.game.other_werewolves('Alice'), other_werewolves)
+        self.assertIsNot(self.game.other_werewolves('Bob'), other_werewolves)
+
+        version = self.game.version
+        self.game.seer('Alice', 'Bob', project=False)
+        self.assertEqual(self.game.version, version)
+        self.assertIs(self.game.role_probabilities(), probabilities)
+
+        self.game.werewolf('Alice', 'Bob')
+        self.assertEqual(self.game.version, version + 1)
+        self.assertIsNot(self.game.role_probabilities(), probabilities)
+        self.assertGreater(self.game.role_probabilities()[1]['dead'], probabilities[1]['dead'])
+
+    def test_stats(self):
+        # nothing is recorded unless enabled
+        self.game.role_probabilities()
+        self.assertEqual(self.game.stats(), {})
+
+        with self.game.stats_turn():
+            self.game.role_probabilities()
+            self.game.kill('Alice')
+            self.game.check_win()
+        stats = self.game.stats()
+        self.assertLessEqual({'role_probabilities', 'kill', 'check_win'}, set(stats))
+        self.assertEqual(stats['kill']['calls'], 1)
+        self.assertEqual(stats['role_probabilities']['permutations'], 12)
+        self.assertLess(stats['check_win']['permutations'], 12)
+        self.assertGreaterEqual(stats['kill']['total_time'], stats['kill']['max_time'])
+
+        # statistics are reset by the next turn and not recorded outside of one
+        self.game.check_win()
+        self.assertEqual(self.game.stats()['check_win']['calls'], 1)
+        with self.game.stats_turn():
+            self.game.check_win()
+        self.assertEqual(set(self.game.stats()), {'check_win'})
+
+    def test_rewind(self):
+        self.game.snapshot_interval = 2
+        probabilities = [self.game.role_probabilities()]
+        for werewolf, target in [('Alice', 'Bob'), ('Bob', 'Craig'), ('Craig', 'David')]:
+            self.game.werewolf(werewolf, target)
+            probabilities.append(self.game.role_probabilities())
+        role = self.game.kill('Bob')
+        self.assertEqual(self.game.journal[-1], ('kill', {'target': 'Bob', 'target_role': role}))
+        self.assertEqual(len(self.game.snapshots), 3)
+        # the snapshots keep the validity of the stored permutations as bits
+        rows, valid_bits = self.game.snapshots[-1][1]['store']
+        self.assertIsInstance(valid_bits, bytes)
+        self.assertEqual(len(valid_bits), (len(rows) + 7) // 8)
+
+        # a wrong kill is undone and the state before it is restored
+        self.assertEqual(self.game.rewind(), [('kill', {'target': 'Bob', 'target_role': role})])
+        self.assertEqual(self.game.living_players(), self.names)
+        self.assertEqual(self.game.role_probabilities(), probabilities[3])
+        self.assertEqual(self.game.rewind(2), [('werewolf', {'werewolf': 'Bob', 'target': 'Craig'}),
+                                               ('werewolf', {'werewolf': 'Craig', 'target': 'David'})])
+        self.assertEqual(self.game.role_probabilities(), probabilities[1])
+        self.assertEqual(len(self.game.snapshots), 1)
+
+        # the recorded outcome is revealed again, an impossible role is refused
+        self.assertEqual(self.game.kill('Bob', role), role)
+        self.game.rewind()
+        self.assertRaises(AssertionError, self.game.kill, 'Bob', 'hunter')
+        self.assertRaises(AssertionError, self.game.rewind, 2)
+
+    def test_dump_load(self):
+        for player in self.names:
+            self.game.cupid(player, 'Alice', 'Bob')
+        self.game.werewolf('Alice', 'Craig')
+        self.game.seer('Bob', 'David', 'villager')
+        self.game.kill('David')
+        data = self.game.dump()
+        self.assertEqual(data[:4], b'QWWG')
+
+        # the loaded game holds the same state and plays on
+        game = Game.load(memoryview(data))
+        self.assertEqual(game.players, self.names)
+        self.assertEqual(game.role_probabilities(), self.game.role_probabilities())
+        self.assertEqual(game.death_probabilities(), self.game.death_probabilities())
+        self.assertEqual(game.lovers_list, self.game.lovers_list)
+        self.assertEqual(game.valid_permutations(), self.game.valid_permutations())
+        role = game.kill('Alice')
+        self.assertEqual(game.role_probabilities()[0][role], 1)
+        game.rewind()
+        self.assertEqual(game.living_players(), ['Alice', 'Bob', 'Craig'])
+
+        # other versions and engines are refused
+        self.assertRaises(AssertionError, Game.load, data[:4] + b'\x63' + data[5:])
+        self.assertRaises(AssertionError, SymmetricGame.load, data)
+
+    def test_rng(self):
+        def play(seed):
+            game = Game(seed)
+            game.add_players(['Alice', 'Bob', 'Craig', 'David', 'Eve', 'Frank'])
+            game.set_deck({'werewolf': 2, 'seer': 1, 'hunter': 0, 'cupid': 0})
+            game.start_with_subset = True
+            game.start()
+            return game
+
+        # games with the same seed play out the same, also when played interleaved
+        games = [play(7), play(7)]
+        for game in games:
+            self.assertEqual(game.print_permutation, games[0].print_permutation)
+            self.assertEqual(set(game.permutations), set(games[0].permutations))
+        outcomes = [[], []]
+        for player in ['Alice', 'Bob', 'Craig']:
+            for game, outcome in zip(games, outcomes):
+                outcome.append(game.seer(player, 'Eve' if player != 'Eve' else 'Frank'))
+                outcome.append(game.kill(player))
+        self.assertEqual(outcomes[0], outcomes[1])
+
+
+class TestCompaction(EngineEquivalence, TestCase):
+
+    engine = Game
+    reference = UncompactedGame
+
+    def test_compact(self):
+        self.assertCompacts(Game(), Game._permutation_count)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,72 @@
+from quantumwerewolf.backend import Game
+from quantumwerewolf.balance import balanced_werewolf_count, cells, decks, load_cache, sweep
+from quantumwerewolf.cli import cli
+from contextlib import redirect_stdout
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+import json
+import os
+
+
+class TestBalance(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.cache = os.path.join(self.directory.name, 'balance.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_decks(self):
+        self.assertEqual([deck['werewolf'] for deck in decks(9)], [1, 2, 3])
+        self.assertEqual(list(decks(4, ['cupid', 'hunter'])),
+                         [{'werewolf': 1, 'seer': 1, 'hunter': 1, 'cupid': 1, 'villager': 0}])
+
+    def test_sweep(self):
+        table = cells(5, 6, games=10)
+        self.assertEqual(len(table), 3)
+        results = sweep(table, self.cache, workers=2)
+        self.assertEqual([result['deck'] for result in results], [cell['deck'] for cell in table])
+        for result in results:
+            self.assertAlmostEqual(sum(result['win_rates'].values()), 1)
+
+        # a rerun only simulates the cells that are missing from the cache
+        with open(self.cache, 'a') as cache:
+            cache.write('{"players": 7, "de')
+        self.assertEqual(sweep(table, self.cache), results)
+        more_results = sweep(cells(5, 7, games=10), self.cache)
+        self.assertEqual(more_results[:3], results)
+        self.assertEqual(len(load_cache(self.cache)), 5)
+
+    def test_suggested_deck(self):
+        self.assertIsNone(balanced_werewolf_count(9, cache=self.cache))
+        with open(self.cache, 'w') as cache:
+            for werewolf_count, villager_rate in [(1, 0.9), (2, 0.6), (3, 0.3)]:
+                cell = cells(9, 9)[werewolf_count - 1]
+                cell['win_rates'] = {'villagers': villager_rate, 'werewolves': 1 - villager_rate}
+                cache.write(json.dumps(cell) + '\n')
+        self.assertEqual(balanced_werewolf_count(9, cache=self.cache), 2)
+        self.assertIsNone(balanced_werewolf_count(9, werewolf_cannot_eat_werewolf=True, cache=self.cache))
+
+        game = Game()
+        game.add_players([f'player{i}' for i in range(9)])
+        game.balance_table = self.cache
+        game.set_suggested_deck()
+        self.assertEqual(game.deck['werewolf'], 2)
+        game.balance_table = None
+        game.set_suggested_deck()
+        self.assertEqual(game.deck['werewolf'], 2)
+
+    def test_cli(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            cli(['--log-file', os.path.join(self.directory.name, 'debug.log'),
+                 'sweep', '--min-players', '6', '--max-players', '6', '--games', '5', '--workers', '1',
+                 '--cache', self.cache])
+        table = json.loads(output.getvalue())
+        self.assertEqual([cell['deck']['werewolf'] for cell in table], [1, 2])
+
+
+if __name__ == '__main__':
+    main()
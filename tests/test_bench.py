@@ -0,0 +1,31 @@
+from quantumwerewolf.bench import compare, run_case, sweep
+from unittest import TestCase, main
+
+
+class TestBench(TestCase):
+
+    def test_run_case(self):
+        result = run_case('game', 6, 'cupid+hunter', False, rounds=2)
+        self.assertEqual(result['permutations'], 360)
+        self.assertGreater(result['peak_memory'], 0)
+        self.assertIn('kill', result['timings'])
+        self.assertEqual(result['turns'], run_case('game', 6, 'cupid+hunter', False, rounds=2)['turns'])
+
+    def test_sweep(self):
+        results = sweep(['game'], 5, 6, max_permutations=100, rounds=1)
+        self.assertEqual(len(results), 12)
+        self.assertTrue(all(r['start_with_subset'] or r['max_permutations'] <= 100 for r in results))
+        # every engine that generates the game states is guarded
+        results = sweep(['symmetric', 'counting'], 5, 5, max_permutations=10, rounds=1)
+        self.assertEqual({(r['engine'], r['start_with_subset']) for r in results},
+                         {('symmetric', True), ('counting', True), ('counting', False)})
+
+    def test_compare(self):
+        baseline = sweep(['counting'], 5, 5, rounds=1)
+        self.assertEqual(compare(baseline, baseline), [])
+        slower = [dict(r, wall_time=2 * r['wall_time']) for r in baseline]
+        self.assertEqual(len(compare(slower, baseline)), len(baseline))
+
+
+if __name__ == '__main__':
+    main()
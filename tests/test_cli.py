@@ -0,0 +1,67 @@
+from quantumwerewolf.cli import CliGame, play
+from io import StringIO
+from os import path
+from unittest import TestCase, main
+import logging
+
+
+class TestCliGame(TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.WARNING)
+
+    def game(self, inputs):
+        game = CliGame(inputs, StringIO())
+        game.add_players(['Alice', 'Bob', 'Craig', 'David'])
+        game.start()
+        return game
+
+    def test_ask_yesno(self):
+        game = self.game(['maybe', 'perhaps', 'y', 'no'])
+        self.assertEqual(game.ask_yesno('?', 1, 0), 1)
+        self.assertEqual(game.ask_yesno('?', 1, lambda: 2), 2)
+        self.assertEqual(game.output.getvalue().count('invalid answer'), 2)
+
+    def test_ask_player(self):
+        game = self.game(['Eve'] * 1000 + ['Alice', '2', '2', '3'])
+        self.assertEqual(game.ask_player(''), 'Alice')
+        self.assertEqual(game.ask_player(''), 'Bob')
+        self.assertEqual(game.ask_player('', invalid_players=['Bob']), 'Craig')
+
+    def test_ask_number(self):
+        game = self.game(['two', '2'])
+        self.assertEqual(game.ask_number(''), 2)
+
+    def test_end_of_script(self):
+        game = self.game([])
+        self.assertRaises(EOFError, game.ask_number, '')
+
+    def test_buffered_output(self):
+        game = self.game(['Alice'])
+        game.print('screen one')
+        self.assertEqual(game.output.getvalue(), '')
+        game.clear()
+        game.print('screen two')
+        self.assertEqual(game.output.getvalue(), 'screen one\n')
+        game.ask_player('')
+        self.assertEqual(game.output.getvalue(), f'screen one\n{CliGame.clear_screen}screen two\nName: Alice\n')
+
+
+class TestPlay(TestCase):
+
+    def test_scripted_game(self):
+        with open(path.join(path.dirname(__file__), 'input.txt')) as script:
+            output = StringIO()
+            play(script, output)
+        self.assertIn('Night falls', output.getvalue())
+        self.assertRegex(output.getvalue(), 'WIN|TIE')
+
+    def test_stats(self):
+        with open(path.join(path.dirname(__file__), 'input.txt')) as script:
+            with self.assertLogs('quantumwerewolf', logging.INFO) as logs:
+                play(script, StringIO(), stats=True)
+        self.assertTrue(any('turn 1 process_night' in line for line in logs.output))
+
+
+if __name__ == '__main__':
+    main()
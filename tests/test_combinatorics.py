@@ -0,0 +1,46 @@
+from quantumwerewolf.combinatorics import multinomial, multiset_permutations, multiset_rank, multiset_unrank
+from itertools import permutations
+from unittest import TestCase, main
+
+
+class TestMultisetPermutations(TestCase):
+
+    def test_distinct_permutations(self):
+        roles = ['werewolf', 'villager', 'werewolf', 'seer', 'villager', 'villager']
+        result = list(multiset_permutations(roles))
+        self.assertEqual(len(result), len(set(result)))
+        self.assertEqual(set(result), set(permutations(roles)))
+        self.assertEqual(result, sorted(result))
+
+    def test_edge_cases(self):
+        self.assertEqual(list(multiset_permutations([])), [()])
+        self.assertEqual(list(multiset_permutations(['seer'])), [('seer',)])
+        self.assertEqual(list(multiset_permutations(['villager'] * 3)), [('villager',) * 3])
+
+
+class TestMultisetRank(TestCase):
+
+    roles = ['werewolf', 'werewolf', 'seer', 'cupid', 'villager', 'villager', 'villager']
+
+    def test_multinomial(self):
+        self.assertEqual(multinomial([2, 1, 1, 3]), 420)
+        self.assertEqual(multinomial([]), 1)
+
+    def test_rank_unrank(self):
+        for rank, permutation in enumerate(multiset_permutations(self.roles)):
+            self.assertEqual(multiset_rank(permutation), rank)
+            self.assertEqual(multiset_unrank(rank, self.roles), permutation)
+        self.assertEqual(rank + 1, multinomial([2, 1, 1, 3]))
+
+    def test_first(self):
+        all_permutations = list(multiset_permutations(self.roles))
+        first = multiset_unrank(100, self.roles)
+        self.assertEqual(list(multiset_permutations(self.roles, first)), all_permutations[100:])
+
+    def test_unrank_out_of_range(self):
+        self.assertRaises(ValueError, multiset_unrank, 420, self.roles)
+        self.assertRaises(ValueError, multiset_unrank, -1, self.roles)
+
+
+if __name__ == '__main__':
+    main()
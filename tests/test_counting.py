@@ -0,0 +1,51 @@
+from equivalence import EngineEquivalence
+from quantumwerewolf.backend import Game
+from quantumwerewolf.counting import ConstraintGame, CountingGame
+from unittest import TestCase, main
+
+
+class TestCountingGame(EngineEquivalence, TestCase):
+
+    engine = CountingGame
+    names = ['Alice', 'Bob', 'Craig', 'David', 'Eve', 'Frank', 'Gina']
+    deck = {'werewolf': 2, 'seer': 1, 'hunter': 1, 'cupid': 1}
+
+    def test_start(self):
+        self.assertEqual(self.engine_game._tally().total, self.game._max_permutations())
+        super().test_start()
+
+    def test_night_werewolves_eat_werewolves(self):
+        games = [self.start_game(Game(), werewolf_cannot_eat_werewolf=False),
+                 self.start_game(CountingGame(), werewolf_cannot_eat_werewolf=False)]
+        self.play_night(games)
+        self.assertSameState(*games)
+
+    def test_kill(self):
+        self.play_night([self.engine_game])
+        role = self.engine_game.kill('Alice')
+        probabilities = self.engine_game.role_probabilities()
+        self.assertEqual(probabilities[0][role], 1)
+        self.assertEqual(probabilities[0]['dead'], 1)
+        for permutation in self.engine_game.valid_permutations():
+            self.assertEqual(permutation[0], role)
+
+    def test_kill_impossible_role(self):
+        self.engine_game.kill('Alice', 'seer')
+        self.assertRaises(AssertionError, self.engine_game.kill, 'Bob', 'seer')
+        self.assertRaises(AssertionError, self.engine_game.kill, 'Bob', 'dead')
+        self.assertEqual(self.engine_game.killed[1], 0)
+        self.assertEqual(self.engine_game.kill('Bob', 'werewolf'), 'werewolf')
+
+    def test_abstract(self):
+        # an engine that does not count the game states can not be created
+        self.assertRaises(TypeError, ConstraintGame)
+
+        class Incomplete(ConstraintGame):
+            def _tally(self, condition=None, pairs=False):
+                return None
+
+        self.assertRaises(TypeError, Incomplete)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+from quantumwerewolf.logs import setup_logging, stop_logging
+from os import path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+import logging
+
+
+class Payload:
+
+    def __init__(self):
+        self.formatted = False
+
+    def __str__(self):
+        self.formatted = True
+        return 'payload'
+
+
+class TestLogging(TestCase):
+
+    def test_setup_logging(self):
+        logger = logging.getLogger('quantumwerewolf.backend')
+        package_logger = logging.getLogger('quantumwerewolf')
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, 'debug.log')
+            setup_logging(logging.INFO, filename)
+            hidden = Payload()
+            logger.debug('hidden %s', hidden)
+            # the records only go through the queue, not to the handlers of the root logger
+            with self.assertLogs(level=logging.INFO) as root_logs:
+                logger.info('shown %s', Payload())
+                logging.getLogger('other').info('root')
+            self.assertEqual(root_logs.output, ['INFO:other:root'])
+            stop_logging()
+            with open(filename) as log:
+                lines = log.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith('INFO quantumwerewolf.backend: shown payload\n'))
+        # records below the level are never formatted
+        self.assertFalse(hidden.formatted)
+        self.assertFalse(package_logger.handlers)
+        # the level and propagation are restored
+        self.assertEqual(package_logger.level, logging.NOTSET)
+        self.assertTrue(package_logger.propagate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+from equivalence import EngineEquivalence
+from os import chmod, listdir, path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main, skipIf
+import os
+
+try:
+    from quantumwerewolf.mapped import MappedGame
+except ImportError:
+    MappedGame = None
+
+
+@skipIf(MappedGame is None, 'numpy is not installed')
+class TestMappedGame(EngineEquivalence, TestCase):
+
+    engine = MappedGame
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.directory.cleanup()
+
+    def new_engine_game(self):
+        game = MappedGame()
+        game.directory = self.directory.name
+        game.chunk_size = 24
+        return game
+
+    def test_start(self):
+        self.assertEqual(len(self.engine_game.states), self.game._max_permutations())
+        super().test_start()
+
+    def test_kill(self):
+        role = self.engine_game.kill('Alice')
+        self.assertEqual(self.engine_game.role_probabilities()[0][role], 1)
+        for permutation in self.engine_game.valid_permutations():
+            self.assertEqual(permutation[0], role)
+        # the shared file is left as is and the valid rows are copied to a private one
+        self.assertEqual(len(self.engine_game.states), self.engine_game.valid_count)
+        self.assertEqual(len(listdir(self.directory.name)), 3)
+        self.assertEqual(self.start_game(self.new_engine_game()).valid_count, self.game._max_permutations())
+
+    def test_compact(self):
+        other_game = self.start_game(self.new_engine_game(), deck=self.compaction_deck)
+        self.games.append(other_game)
+        path = other_game.states.filename
+        with open(path, 'rb') as shared:
+            states = shared.read()
+        self.assertCompacts(self.new_engine_game(), lambda game: len(game.states))
+        # the compacted rows went to a private file, the states shared by all games with the deck are unchanged
+        with open(path, 'rb') as shared:
+            self.assertEqual(shared.read(), states)
+        self.assertNotEqual(self.games[-1].states.filename, path)
+        self.assertEqual(other_game.valid_count, other_game._max_permutations())
+
+    def test_shared_states(self):
+        other_game = self.start_game(self.new_engine_game())
+        self.assertEqual(other_game.states.filename, self.engine_game.states.filename)
+        self.assertEqual(len(listdir(self.directory.name)), 3)
+
+        # the games collapse independently
+        other_game.kill('Alice')
+        self.assertEqual(self.engine_game.valid_count, self.game._max_permutations())
+        other_game.stop()
+        self.assertEqual(len(listdir(self.directory.name)), 2)
+
+    def test_rewind(self):
+        for _ in range(3):
+            self.engine_game.kill('Alice', 'villager')
+            self.engine_game.kill('Bob', 'villager')
+            self.engine_game.rewind(2)
+            self.assertSameState()
+            # the files of the compacted rows and their bitmaps are removed once the rewind unmaps them
+            self.assertEqual(len(listdir(self.directory.name)), 2)
+
+    @skipIf(not hasattr(os, 'getuid'), 'files have no owner')
+    def test_untrusted_states(self):
+        self.engine_game.stop()
+        # only the shared states file is left
+        name, = [path.join(self.directory.name, name) for name in listdir(self.directory.name)]
+        # a shared states file that others can write to is written again
+        with open(name, 'r+b') as states:
+            states.write(bytes(path.getsize(name)))
+        chmod(name, 0o666)
+        self.engine_game.start()
+        self.assertSameState()
+
+    def test_chunk_size(self):
+        for chunk_size in (0, 12):
+            with self.assertRaises(AssertionError):
+                self.engine_game.chunk_size = chunk_size
+
+    def test_start_subset(self):
+        self.engine_game.stop()
+        self.engine_game.start_with_subset = True
+        self.engine_game.start()
+        self.assertEqual(len(self.engine_game.valid_permutations()), self.engine_game._subset_size())
+
+
+if __name__ == '__main__':
+    main()
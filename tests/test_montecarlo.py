@@ -0,0 +1,57 @@
+from equivalence import EngineEquivalence
+from quantumwerewolf.counting import CountingGame
+from quantumwerewolf.montecarlo import MonteCarloGame, SampleTally
+from time import perf_counter
+from unittest import TestCase, main
+
+
+class TestMonteCarloGame(EngineEquivalence, TestCase):
+
+    engine = MonteCarloGame
+    reference = CountingGame
+    seed = 42
+    names = ['Alice', 'Bob', 'Craig', 'David', 'Eve', 'Frank', 'Gina', 'Harry']
+
+    def assertSameState(self):
+        # the estimates are within a few standard errors of the exact probabilities
+        for exact, estimate in zip(self.game.role_probabilities(), self.engine_game.role_probabilities()):
+            for key, error in estimate['error'].items():
+                self.assertLessEqual(abs(exact[key] - estimate[key]), 5 * error + 0.01)
+
+    def test_kill(self):
+        role = self.engine_game.kill('Alice')
+        probabilities = self.engine_game.role_probabilities()
+        self.assertEqual(probabilities[0][role], 1)
+        self.assertEqual(probabilities[0]['dead'], 1)
+        self.assertEqual(probabilities[0]['error']['dead'], 0)
+
+    def test_kill_impossible_role(self):
+        self.engine_game.kill('Alice', 'seer')
+        self.assertRaises(AssertionError, self.engine_game.kill, 'Bob', 'seer')
+        self.assertEqual(self.engine_game.revealed, {0: 'seer'})
+
+    def test_budget(self):
+        self.engine_game.sample_count = 10
+        self.assertEqual(len(self.engine_game.death_errors()), len(self.names))
+        self.assertLessEqual(len(self.engine_game.valid_permutations()), 10)
+
+    def test_time_budget(self):
+        self.engine_game.sample_count = 10 ** 9
+        self.engine_game.time_budget = 0.05
+        start = perf_counter()
+        tally = self.engine_game._tally()
+        self.assertLess(perf_counter() - start, 5)
+        self.assertLess(tally.total, self.engine_game.sample_count)
+        self.assertGreater(tally.total, 0)
+
+    def test_check_win(self):
+        self.engine_game.kill('Alice', 'werewolf')
+        # samples that happen to miss the remaining werewolf do not end the game
+        missed = SampleTally(self.engine_game)
+        missed.total = 1
+        self.engine_game._tally = lambda condition=None, pairs=False: missed
+        self.assertEqual(self.engine_game.check_win(), (False, None))
+
+
+if __name__ == '__main__':
+    main()
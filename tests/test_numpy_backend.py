@@ -0,0 +1,43 @@
+from equivalence import EngineEquivalence
+from unittest import TestCase, main, skipIf
+
+try:
+    import numpy as np
+    from quantumwerewolf.numpy_backend import NumpyGame
+except ImportError:
+    NumpyGame = None
+
+
+@skipIf(NumpyGame is None, 'numpy is not installed')
+class TestNumpyGame(EngineEquivalence, TestCase):
+
+    engine = NumpyGame
+
+    def test_start(self):
+        self.assertEqual(len(self.engine_game.states), self.game._max_permutations())
+        super().test_start()
+
+    def test_kill(self):
+        role = self.engine_game.kill('Alice')
+        self.assertEqual(self.engine_game.role_probabilities()[0][role], 1)
+        self.assertEqual(self.engine_game.role_probabilities()[0]['dead'], 1)
+        self.assertEqual(len(self.engine_game.states), self.engine_game.valid_count)
+
+    def test_compact(self):
+        self.assertCompacts(NumpyGame(), lambda game: len(game.states))
+
+    def test_dump_load(self):
+        self.engine_game.seer('Alice', 'Bob', 'werewolf')
+        self.engine_game.kill('Craig')
+        data = bytearray(self.engine_game.dump())
+        game = NumpyGame.load(data)
+        # the states are read from the buffer without a copy
+        self.assertTrue(np.shares_memory(game.states, np.frombuffer(data, dtype=np.int8)))
+        self.assertEqual(game.valid_count, self.engine_game.valid_count)
+        self.assertEqual(game.role_probabilities(), self.engine_game.role_probabilities())
+        game.kill('David')
+        self.assertEqual(game.role_probabilities()[3]['dead'], 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+from quantumwerewolf.rng import GeneratorRandom, make_rng
+from unittest import TestCase, main, skipIf
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestRng(TestCase):
+
+    def test_make_rng(self):
+        rng = random.Random(3)
+        self.assertIs(make_rng(rng), rng)
+        self.assertEqual(make_rng(3).random(), random.Random(3).random())
+        self.assertIsInstance(make_rng(), random.Random)
+        self.assertRaises(TypeError, make_rng, 1.5)
+
+    @skipIf(np is None, 'numpy is not installed')
+    def test_generator(self):
+        rng = make_rng(np.random.default_rng(5))
+        self.assertIsInstance(rng, GeneratorRandom)
+        values = [rng.randrange(10 ** 30), rng.choice('abc'), rng.sample(range(100), 3), rng.random()]
+        same_rng = make_rng(np.random.default_rng(5))
+        self.assertEqual(values, [same_rng.randrange(10 ** 30), same_rng.choice('abc'), same_rng.sample(range(100), 3),
+                                  same_rng.random()])
+        self.assertTrue(all(0 <= rng.randrange(7) < 7 for _ in range(100)))
+        self.assertLess(rng.getrandbits(5), 32)
+
+        # the state is the state of the generator
+        state = rng.getstate()
+        value = rng.random()
+        rng.setstate(state)
+        self.assertEqual(rng.random(), value)
+
+
+if __name__ == '__main__':
+    main()
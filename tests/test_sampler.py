@@ -0,0 +1,38 @@
+from quantumwerewolf.sampler import FenwickSampler
+from collections import Counter
+from unittest import TestCase, main
+import random
+
+
+class TestFenwickSampler(TestCase):
+
+    weights = [3, 0, 1, 5, 0, 2, 4]
+
+    def test_find(self):
+        sampler = FenwickSampler(self.weights)
+        self.assertEqual(sampler.total, sum(self.weights))
+        expected = [i for i, weight in enumerate(self.weights) for _ in range(weight)]
+        self.assertEqual([sampler.find(value) for value in range(sampler.total)], expected)
+
+    def test_update(self):
+        sampler = FenwickSampler(self.weights)
+        sampler.update(3, 0)
+        sampler.update(4, 2)
+        weights = [3, 0, 1, 0, 2, 2, 4]
+        self.assertEqual(sampler.total, sum(weights))
+        expected = [i for i, weight in enumerate(weights) for _ in range(weight)]
+        self.assertEqual([sampler.find(value) for value in range(sampler.total)], expected)
+
+    def test_sample(self):
+        sampler = FenwickSampler(self.weights, random.Random(42))
+        counts = Counter(sampler.sample() for _ in range(15000))
+        for i, weight in enumerate(self.weights):
+            self.assertAlmostEqual(counts[i] / 15000, weight / sampler.total, delta=0.02)
+
+        for i in range(len(sampler)):
+            sampler.update(i, 0)
+        self.assertRaises(AssertionError, sampler.sample)
+
+
+if __name__ == '__main__':
+    main()
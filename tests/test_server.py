@@ -0,0 +1,136 @@
+from quantumwerewolf.server import GameServer
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase, main
+import asyncio
+import json
+import os
+
+
+class TestGameServer(IsolatedAsyncioTestCase):
+
+    names = ['Alice', 'Bob', 'Craig', 'David', 'Eve']
+    deck = {'werewolf': 1, 'seer': 1, 'hunter': 0, 'cupid': 0}
+
+    async def asyncSetUp(self):
+        self.server = GameServer(workers=4)
+        await self.server.listen()
+        self.reader, self.writer = await asyncio.open_connection(*self.server.address)
+        self.next_id = 0
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.server.close()
+
+    async def send(self, method, **params):
+        self.next_id += 1
+        self.writer.write(json.dumps({'id': self.next_id, 'method': method, 'params': params}).encode() + b'\n')
+        await self.writer.drain()
+        return self.next_id
+
+    async def call(self, method, **params):
+        request_id = await self.send(method, **params)
+        response = json.loads(await self.reader.readline())
+        self.assertEqual(response['id'], request_id)
+        return response
+
+    async def new_game(self, **params):
+        game = (await self.call('create', **params))['result']
+        await self.call('join', game=game, players=self.names)
+        await self.call('start', game=game, deck=self.deck)
+        return game
+
+    async def test_game(self):
+        game = (await self.call('create', start_with_subset=False))['result']
+        self.assertEqual((await self.call('join', game=game, players='Alice'))['result'], ['Alice'])
+        self.assertEqual((await self.call('join', game=game, players=self.names[1:]))['result'], self.names)
+        self.assertEqual((await self.call('start', game=game, deck=self.deck))['result'],
+                         ['werewolf', 'seer', 'villager'])
+
+        probabilities = (await self.call('query', game=game, query='role_probabilities'))['result']
+        self.assertEqual([row['name'] for row in probabilities], self.names)
+        self.assertAlmostEqual(probabilities[0]['werewolf'], 1 / 5)
+
+        role = (await self.call('action', game=game, action='seer', args=['Alice', 'Bob', None, False]))['result']
+        self.assertIn(role, ['werewolf', 'seer', 'villager'])
+        await self.call('action', game=game, action='process_night', args=[{'Alice': {'werewolf': 'Bob'}}])
+        kills, hunters = (await self.call('action', game=game, action='resolve_deaths', args=[['Craig']]))['result']
+        self.assertEqual(kills[0]['name'], 'Craig')
+        self.assertEqual((await self.call('query', game=game, query='living_players'))['result'],
+                         ['Alice', 'Bob', 'David', 'Eve'])
+
+        self.assertTrue((await self.call('delete', game=game))['result'])
+        self.assertEqual(self.server.games, {})
+
+    async def test_errors(self):
+        self.writer.write(b'not json\n')
+        self.assertEqual(json.loads(await self.reader.readline()), {'id': None, 'error': 'invalid JSON'})
+        self.assertIn('error', await self.call('shutdown'))
+        self.assertIn('error', await self.call('create', engine='quantum'))
+        self.assertIn('error', await self.call('query', game=42, query='check_win'))
+
+        game = await self.new_game()
+        self.assertIn('error', await self.call('action', game=game, action='stop'))
+        self.assertIn('error', await self.call('action', game=game, action='kill', args=['Zed']))
+        self.assertIn('error', await self.call('join', game=game, players='Zed'))
+        self.assertIn('result', await self.call('query', game=game, query='check_win'))
+
+    async def test_unexpected_error(self):
+        game = await self.new_game(start_with_subset=False)
+
+        def broken():
+            raise RuntimeError('broken')
+
+        self.server.games[game].check_win = broken
+        with self.assertLogs('quantumwerewolf.server', 'ERROR'):
+            response = await self.call('query', game=game, query='check_win')
+        self.assertEqual(response['error'], 'internal error: RuntimeError: broken')
+        self.assertIn('result', await self.call('query', game=game, query='living_players'))
+
+        # werewolves can not attack once they are all dead
+        await self.call('action', game=game, action='kill', args=['Alice', 'werewolf'])
+        response = await self.call('action', game=game, action='werewolf', args=['Bob', 'Craig'])
+        self.assertEqual(response['error'], 'ERROR: in werewolf() no werewolves are alive')
+
+    async def test_concurrent_requests(self):
+        game = (await self.call('create'))['result']
+        await self.call('join', game=game, players=self.names)
+        # a join sent together with the start is either in the started game or refused
+        join_id = await self.send('join', game=game, players='Zed')
+        start_id = await self.send('start', game=game, deck=self.deck)
+        responses = {}
+        for _ in range(2):
+            response = json.loads(await self.reader.readline())
+            responses[response['id']] = response
+        self.assertIn('result', responses[start_id])
+        g = self.server.games[game]
+        self.assertEqual(len(g.valid_permutations()[0]), len(g.players))
+        self.assertEqual('Zed' in g.players, 'result' in responses[join_id])
+        self.assertIn('error', await self.call('start', game=game))
+
+    async def test_concurrent_games(self):
+        games = [await self.new_game(engine=engine) for engine in ['game', 'counting', 'symmetric'] * 4]
+        self.assertEqual(len(set(games)), 12)
+
+        # answers to concurrent requests may arrive in any order
+        request_ids = {}
+        for game in games:
+            request_ids[await self.send('query', game=game, query='death_probabilities')] = game
+        for _ in games:
+            response = json.loads(await self.reader.readline())
+            self.assertEqual(response['result'], [0.0] * 5)
+            del request_ids[response['id']]
+        self.assertEqual(request_ids, {})
+
+    async def test_unix_socket(self):
+        with TemporaryDirectory() as directory:
+            server = GameServer()
+            await server.listen(path=os.path.join(directory, 'server.sock'))
+            reader, writer = await asyncio.open_unix_connection(server.address)
+            writer.write(b'{"id": 1, "method": "create", "params": {}}\n')
+            self.assertEqual(json.loads(await reader.readline()), {'id': 1, 'result': 1})
+            writer.close()
+            await server.close()
+
+
+if __name__ == '__main__':
+    main()
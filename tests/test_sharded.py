@@ -0,0 +1,62 @@
+from equivalence import EngineEquivalence
+from quantumwerewolf.backend import Game
+from quantumwerewolf.sharded import ShardedGame
+from unittest import TestCase, main
+
+
+class TestShardedGame(EngineEquivalence, TestCase):
+
+    engine = ShardedGame
+
+    def new_engine_game(self):
+        game = ShardedGame()
+        game.shard_count = 3
+        return game
+
+    def assertSameState(self, game=None, engine_game=None):
+        super().assertSameState(game, engine_game)
+        # the shards count the valid game states once the queries sent the constraints
+        self.assertEqual((game or self.game).valid_count, (engine_game or self.engine_game).valid_count)
+
+    def test_start(self):
+        self.assertEqual(self.engine_game.shard_sizes, [60, 60, 60])
+        super().test_start()
+
+        self.engine_game.stop()
+        self.assertEqual(self.engine_game.executors, [])
+
+    def test_start_subset(self):
+        game = self.start_game(Game(), start_with_subset=True)
+        sharded_game = self.start_game(self.new_engine_game(), start_with_subset=True)
+        self.games.append(sharded_game)
+        self.assertEqual(sharded_game._permutation_count(), game._subset_size())
+        self.assertEqual(len(set(sharded_game.valid_permutations())), game._subset_size())
+
+    def test_kill(self):
+        role = self.engine_game.kill('Alice')
+        self.assertEqual(self.engine_game.role_probabilities()[0][role], 1)
+        for permutation in self.engine_game.valid_permutations():
+            self.assertEqual(permutation[0], role)
+        self.assertEqual(self.engine_game.valid_count, len(self.engine_game.valid_permutations()))
+        self.assertEqual(self.engine_game._permutation_count(), self.engine_game.valid_count)
+
+    def test_rewind(self):
+        self.assertLessEqual(ShardedGame().shard_count, 2)
+        executors = list(self.engine_game.executors)
+        probabilities = self.engine_game.role_probabilities()
+        self.engine_game.kill('Alice')
+        self.engine_game.role_probabilities()
+        # undoing a constraint the shards applied creates the shards again in the same worker processes
+        self.engine_game.rewind()
+        self.assertEqual(self.engine_game.executors, executors)
+        self.assertSameTable(self.engine_game.role_probabilities(), probabilities)
+
+    def test_compact(self):
+        # a single shard compacts at the same threshold as the other engines
+        game = ShardedGame()
+        game.shard_count = 1
+        self.assertCompacts(game, ShardedGame._permutation_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+from quantumwerewolf.simulate import play_game, simulate, summary
+from unittest import TestCase, main
+
+
+class TestSimulate(TestCase):
+
+    deck = {'werewolf': 2, 'seer': 1, 'hunter': 1, 'cupid': 1}
+
+    def test_play_game(self):
+        for policy in ('random', 'informed'):
+            for seed in range(10):
+                result = play_game(8, self.deck, policy, seed)
+                self.assertIn(result['winner'], (None, 'villagers', 'werewolves', 'lovers'))
+                self.assertEqual(result['deck']['villager'], 3)
+                names = [kill['name'] for kill in result['kills']]
+                self.assertEqual(len(names), len(set(names)))
+                self.assertLessEqual(result['turns'], 8)
+                self.assertTrue(all(kill['cause'] in ('night', 'lynch', 'hunter', 'chain') for kill in result['kills']))
+
+    def test_seed(self):
+        result = play_game(7, seed=3, engine_name='counting', start_with_subset=False)
+        self.assertEqual(result['deck']['werewolf'], 1)
+        same_result = play_game(7, seed=3, engine_name='counting', start_with_subset=False)
+        self.assertEqual(result['kills'], same_result['kills'])
+
+    def test_simulate(self):
+        results = list(simulate(6, 6, seed=10, workers=2))
+        self.assertEqual([result['seed'] for result in results], list(range(10, 16)))
+        self.assertEqual([result['kills'] for result in results],
+                         [result['kills'] for result in simulate(6, 6, seed=10, workers=1)])
+        stats = summary(results, 1.0)
+        self.assertEqual(stats['games'], 6)
+        self.assertAlmostEqual(sum(stats['win_rates'].values()), 1)
+        self.assertEqual(stats['games_per_second'], 6)
+
+
+if __name__ == '__main__':
+    main()
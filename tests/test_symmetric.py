@@ -0,0 +1,40 @@
+from equivalence import EngineEquivalence
+from quantumwerewolf.symmetric import SymmetricGame
+from unittest import TestCase, main
+
+
+class TestSymmetricGame(EngineEquivalence, TestCase):
+
+    engine = SymmetricGame
+    names = ['Alice', 'Bob', 'Craig', 'David', 'Eve', 'Frank', 'Gina']
+    deck = {'werewolf': 2, 'seer': 1, 'hunter': 1, 'cupid': 1}
+
+    def assertSameState(self):
+        self.assertEqual(self.game.valid_count, self.engine_game.valid_count)
+        super().assertSameState()
+
+    def test_start(self):
+        self.assertEqual(self.engine_game._permutation_count(), 1)
+        super().test_start()
+
+    def test_partial_night(self):
+        # only the first players act, the others stay interchangeable
+        for game in self.games:
+            game.seer('Alice', 'Bob', 'werewolf')
+            game.werewolf('Bob', 'Craig')
+            game.werewolf('Craig', 'Alice')
+        self.assertEqual(self.engine_game.interchangeable, [3, 4, 5, 6])
+        self.assertLess(self.engine_game._permutation_count(), self.game.valid_count)
+        self.assertSameState()
+
+    def test_kill(self):
+        self.engine_game.seer('Alice', 'Bob', 'werewolf')
+        role = self.engine_game.kill('Craig')
+        self.assertEqual(self.engine_game.role_probabilities()[2][role], 1)
+        for permutation in self.engine_game.valid_permutations():
+            self.assertEqual(permutation[2], role)
+        self.assertEqual(self.engine_game.valid_count, len(self.engine_game.valid_permutations()))
+
+
+if __name__ == '__main__':
+    main()